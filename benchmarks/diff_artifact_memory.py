@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""差分アーティファクトの書き込み・読み込みのピークメモリを計測する
+
+legacy: 変更前と同じ処理（差分リスト全体を asdict + json.dumps + gzip.compress、読み込みは gzip.decompress + json.loads）
+ndjson: 現行の処理（common/diff_artifact.py。1件ずつ直列化してgzipストリームでマルチパートアップロード、1行ずつ読み込み）
+
+S3はメモリ上の簡易実装で置き換え、tracemalloc のピーク（アップロード済みのオブジェクト本体を除く）を出力する。
+読み込み結果はすべての差分について legacy と一致することを確認する。
+
+    python3 benchmarks/diff_artifact_memory.py
+    python3 benchmarks/diff_artifact_memory.py --diffs 500000
+"""
+import argparse
+import gzip
+import io
+import json
+import os
+import sys
+import tracemalloc
+from dataclasses import asdict
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'lambda')
+sys.path.insert(0, os.path.join(LAMBDA_DIR, 'zengin-diff-processor'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-1')
+
+import main  # noqa: E402
+from common.diff_artifact import open_diff_artifact, write_diff_artifact  # noqa: E402
+
+
+class InMemoryS3:
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[Key] = bytes(Body)
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        self.uploads[Key] = []
+        return {'UploadId': Key}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.uploads[Key].append(Body)
+        return {'ETag': str(PartNumber)}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.objects[Key] = b''.join(self.uploads.pop(Key))
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(Key, None)
+
+    def get_object(self, Bucket, Key):
+        return {'Body': io.BytesIO(self.objects[Key])}
+
+
+def _synthetic_diffs(count):
+    diffs = []
+    for i in range(count):
+        old = main.BankData('%04d' % (i // 500), 'テスト銀行%d' % (i // 500), 'ﾃｽﾄｷﾞﾝｺｳ',
+                            '%03d' % (i % 500), '第%d支店' % i, 'ﾀﾞｲ%dｼﾃﾝ' % i)
+        action = ('create', 'update', 'delete')[i % 3]
+        new = main.BankData(**dict(asdict(old), branch_name='新第%d支店' % i))
+        diffs.append(main.BankDiff(
+            action=action,
+            key=f"{old.swift_code}-{old.branch_code}",
+            old_data=None if action == 'create' else old,
+            new_data=None if action == 'delete' else new,
+            total_accounts=i % 7,
+            active_users=i % 3,
+        ))
+    return diffs
+
+
+def _measure(func):
+    tracemalloc.start()
+    result = func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, peak
+
+
+def main_():
+    parser = argparse.ArgumentParser(description='差分アーティファクトのピークメモリ')
+    parser.add_argument('--diffs', type=int, default=200000)
+    args = parser.parse_args()
+
+    diffs = _synthetic_diffs(args.diffs)
+    s3 = InMemoryS3()
+
+    def legacy_write():
+        data = json.dumps([asdict(diff) for diff in diffs], ensure_ascii=False)
+        s3.objects['legacy'] = gzip.compress(data.encode('utf-8'))
+
+    def legacy_read():
+        return json.loads(gzip.decompress(s3.objects['legacy']).decode('utf-8'))
+
+    def ndjson_write():
+        write_diff_artifact(s3, 'bench', 'ndjson', diffs)
+
+    def ndjson_read():
+        expected = iter(legacy_rows)
+        for row in open_diff_artifact(s3, 'bench', 'ndjson'):
+            row.pop('changed_mask')
+            legacy_row = dict(next(expected))
+            legacy_row.pop('changed_fields')
+            assert row == legacy_row, '読み込み結果が legacy と一致しません'
+
+    _, legacy_write_peak = _measure(legacy_write)
+    legacy_rows, legacy_read_peak = _measure(legacy_read)
+    _, ndjson_write_peak = _measure(ndjson_write)
+    _, ndjson_read_peak = _measure(ndjson_read)
+
+    print(f"diffs: {args.diffs}  legacy={len(s3.objects['legacy']) // 1024}KB  ndjson={len(s3.objects['ndjson']) // 1024}KB")
+    print('{0:>8} {1:>14} {2:>14}'.format('format', 'write_peak_KB', 'read_peak_KB'))
+    print('{0:>8} {1:>14} {2:>14}'.format('legacy', legacy_write_peak // 1024, legacy_read_peak // 1024))
+    print('{0:>8} {1:>14} {2:>14}'.format('ndjson', ndjson_write_peak // 1024, ndjson_read_peak // 1024))
+
+
+if __name__ == '__main__':
+    main_()
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""kana_normalizer の同値性チェックとマイクロベンチマーク
+
+同値性: 変更前の ZenginClient._convert_kana_to_hankaku（下記 legacy_convert）と
+kana_normalizer.to_hankaku / normalize_many の出力が UTF-8 バイト列で完全一致することを、
+BMP全コードポイント・ランダム文字列・zengin全データで検証する。
+
+ベンチマーク: zengin全データのカナ・名称フィールドを変換する時間を比較する。
+
+    python3 benchmarks/kana_normalizer.py
+    python3 benchmarks/kana_normalizer.py --check   # 同値性のみ（npm run check:kana-normalizer）
+
+デプロイ前の同値性テストは tests/test_kana_normalizer.py（npm run test:python）で実行する。
+
+不一致があれば非ゼロで終了する。
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import unicodedata
+
+PROCESSOR_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'lambda', 'zengin-diff-processor'
+)
+sys.path.insert(0, PROCESSOR_DIR)
+
+import kana_normalizer  # noqa: E402
+
+
+def legacy_convert(kana_text):
+    """変更前の実装（比較用にそのまま保持）"""
+    if not kana_text:
+        return kana_text
+
+    normalized = unicodedata.normalize('NFKC', kana_text)
+
+    kana_map = {
+        'ア': 'ｱ', 'イ': 'ｲ', 'ウ': 'ｳ', 'エ': 'ｴ', 'オ': 'ｵ',
+        'カ': 'ｶ', 'キ': 'ｷ', 'ク': 'ｸ', 'ケ': 'ｹ', 'コ': 'ｺ',
+        'サ': 'ｻ', 'シ': 'ｼ', 'ス': 'ｽ', 'セ': 'ｾ', 'ソ': 'ｿ',
+        'タ': 'ﾀ', 'チ': 'ﾁ', 'ツ': 'ﾂ', 'テ': 'ﾃ', 'ト': 'ﾄ',
+        'ナ': 'ﾅ', 'ニ': 'ﾆ', 'ヌ': 'ﾇ', 'ネ': 'ﾈ', 'ノ': 'ﾉ',
+        'ハ': 'ﾊ', 'ヒ': 'ﾋ', 'フ': 'ﾌ', 'ヘ': 'ﾍ', 'ホ': 'ﾎ',
+        'マ': 'ﾏ', 'ミ': 'ﾐ', 'ム': 'ﾑ', 'メ': 'ﾒ', 'モ': 'ﾓ',
+        'ヤ': 'ﾔ', 'ユ': 'ﾕ', 'ヨ': 'ﾖ',
+        'ラ': 'ﾗ', 'リ': 'ﾘ', 'ル': 'ﾙ', 'レ': 'ﾚ', 'ロ': 'ﾛ',
+        'ワ': 'ﾜ', 'ヲ': 'ｦ', 'ン': 'ﾝ',
+        'ァ': 'ｧ', 'ィ': 'ｨ', 'ゥ': 'ｩ', 'ェ': 'ｪ', 'ォ': 'ｫ',
+        'ッ': 'ｯ', 'ャ': 'ｬ', 'ュ': 'ｭ', 'ョ': 'ｮ',
+        'ガ': 'ｶﾞ', 'ギ': 'ｷﾞ', 'グ': 'ｸﾞ', 'ゲ': 'ｹﾞ', 'ゴ': 'ｺﾞ',
+        'ザ': 'ｻﾞ', 'ジ': 'ｼﾞ', 'ズ': 'ｽﾞ', 'ゼ': 'ｾﾞ', 'ゾ': 'ｿﾞ',
+        'ダ': 'ﾀﾞ', 'ヂ': 'ﾁﾞ', 'ヅ': 'ﾂﾞ', 'デ': 'ﾃﾞ', 'ド': 'ﾄﾞ',
+        'バ': 'ﾊﾞ', 'ビ': 'ﾋﾞ', 'ブ': 'ﾌﾞ', 'ベ': 'ﾍﾞ', 'ボ': 'ﾎﾞ',
+        'パ': 'ﾊﾟ', 'ピ': 'ﾋﾟ', 'プ': 'ﾌﾟ', 'ペ': 'ﾍﾟ', 'ポ': 'ﾎﾟ',
+        'ヴ': 'ｳﾞ',
+        '－': 'ｰ', 'ー': 'ｰ'
+    }
+
+    result = ""
+    for char in normalized:
+        result += kana_map.get(char, char)
+
+    return result
+
+
+def _encode(value):
+    return value if value is None else value.encode('utf-8', 'surrogatepass')
+
+
+def _assert_same(inputs, label):
+    expected = [_encode(legacy_convert(text)) for text in inputs]
+    single = [_encode(kana_normalizer.to_hankaku(text)) for text in inputs]
+    batch = [_encode(text) for text in kana_normalizer.normalize_many(inputs)]
+    for i, text in enumerate(inputs):
+        if single[i] != expected[i] or batch[i] != expected[i]:
+            raise AssertionError(f"{label}: 出力が一致しません: {text!r} -> {single[i]!r} / {batch[i]!r}, 期待値 {expected[i]!r}")
+    print(f"同値性OK: {label} ({len(inputs)}件)")
+
+
+def _dataset_strings():
+    import zengin_code
+    values = []
+    for row in zengin_code.iter_rows():
+        _, bank_name, bank_kana, _, branch_name, branch_kana = row
+        values.extend([bank_name, bank_kana, branch_name, branch_kana])
+    return values
+
+
+def _bench(label, func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<24} {best * 1000:8.1f} ms")
+    return best
+
+
+def check():
+    """同値性を検証し、zengin全データの文字列を返す"""
+    # 1. BMP全コードポイント（サロゲートを除く）
+    bmp = [chr(cp) for cp in range(0x10000) if not 0xD800 <= cp <= 0xDFFF]
+    _assert_same(bmp, 'BMP全コードポイント')
+
+    # 2. 空文字・None・半角/全角混在
+    edge_cases = [None, '', ' ', 'ｶﾞｷﾞ', 'ｶﾞ', 'ガギグ', 'ﾊﾟﾋﾟ', 'ヴァイオリン', 'ヷヸヹヺ',
+                  'トウキヨウ－ミナミ', 'ｳﾞ', 'ガ', 'パ', 'ABC１２３', '㍿', 'ｱｲｳ ｴｵ']
+    _assert_same(edge_cases, '境界ケース')
+
+    # 3. カタカナ・ひらがな・半角カナ・結合文字を含むランダム文字列
+    rng = random.Random(20250629)
+    alphabet = ([chr(cp) for cp in range(0x3041, 0x3100)] + [chr(cp) for cp in range(0xFF61, 0xFFA0)]
+                + ['゙', '゚', '－', 'ー', ' ', '(', ')', '1', 'A'])
+    random_strings = [''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 24))) for _ in range(50000)]
+    _assert_same(random_strings, 'ランダム文字列')
+
+    # 4. zengin全データ
+    dataset = _dataset_strings()
+    _assert_same(dataset, 'zengin全データ')
+    return dataset
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='kana_normalizer の同値性チェックとベンチマーク')
+    parser.add_argument('--check', action='store_true', help='同値性のみ検証（ベンチマークは実行しない）')
+    args = parser.parse_args(argv)
+
+    try:
+        dataset = check()
+    except AssertionError as e:
+        print(f"同値性NG: {e}", file=sys.stderr)
+        sys.exit(1)
+    if args.check:
+        return
+
+    print()
+    print(f"ベンチマーク: zengin全データ {len(dataset)}文字列（ユニーク {len(set(dataset))}）")
+    legacy = _bench('legacy', lambda: [legacy_convert(text) for text in dataset])
+    single = _bench('to_hankaku', lambda: [kana_normalizer.to_hankaku(text) for text in dataset])
+    batch = _bench('normalize_many', lambda: kana_normalizer.normalize_many(dataset))
+    print(f"速度比 to_hankaku: {legacy / single:.1f}x, normalize_many: {legacy / batch:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""並列差分検出（DIFF_WORKERS）のワーカー数ごとの実行時間を計測する
+
+合成データ（既定: 銀行 2,000 × 支店 150 = 300,000 行）に対して、MBank側は 2% の行を
+変更・削除した同じデータとし、DiffDetector を DIFF_WORKERS = 1（逐次のマージ結合）と
+各ワーカー数で実行して実行時間を比較する。結果の差分はすべて逐次実行と一致することを確認する。
+
+MBankの取得は --fetch-latency-ms（1,000行あたりの待ち時間）で DB 往復を模擬できる。
+ワーカーはCPUコアごとに並列化されるため、実行環境の vCPU 数も出力する。
+
+    python3 benchmarks/parallel_diff.py
+    python3 benchmarks/parallel_diff.py --banks 4000 --workers 1,2,4,6 --fetch-latency-ms 2
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+from dataclasses import asdict
+
+PROCESSOR_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'lambda', 'zengin-diff-processor'
+)
+sys.path.insert(0, PROCESSOR_DIR)
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-1')
+
+import main  # noqa: E402
+
+KANA = 'ｱｲｳｴｵｶｷｸｹｺｻｼｽｾｿﾀﾁﾂﾃﾄﾅﾆﾇﾈﾉﾊﾋﾌﾍﾎﾏﾐﾑﾒﾓﾔﾕﾖﾗﾘﾙﾚﾛﾜ'
+
+
+def _synthetic_latest(banks, branches):
+    rng = random.Random(1)
+    latest = []
+    for bank in range(banks):
+        bank_kana = ''.join(rng.choice(KANA) for _ in range(8))
+        for branch in range(branches):
+            latest.append(main.BankData(
+                swift_code='%04d' % bank,
+                bank_name='テスト銀行%d' % bank,
+                bank_name_kana=bank_kana,
+                branch_code='%03d' % branch,
+                branch_name='第%d支店' % (bank * branches + branch),
+                branch_name_kana=''.join(rng.choice(KANA) for _ in range(10)),
+            ))
+    return latest
+
+
+def _synthetic_mbank(latest):
+    rng = random.Random(2)
+    rows = []
+    for item in latest:
+        row = (item.swift_code, item.bank_name, item.bank_name_kana,
+               item.branch_code, item.branch_name, item.branch_name_kana)
+        x = rng.random()
+        if x < 0.01:
+            continue
+        if x < 0.02:
+            row = row[:4] + (row[4] + '出張所',) + row[5:]
+        rows.append(row)
+    return rows
+
+
+class SyntheticZenginClient:
+    def __init__(self, latest):
+        self.latest = latest
+
+    def get_all_banks(self):
+        return self.latest
+
+
+class SyntheticDatabaseClient:
+    def __init__(self, rows, fetch_latency):
+        self.rows = rows
+        self.fetch_latency = fetch_latency
+
+    def for_worker(self):
+        return self
+
+    def iter_mbank_rows(self, fetch_size=None, ordered=False, swift_code_range=None, swift_codes=None):
+        lower, upper = swift_code_range or (None, None)
+        for index, row in enumerate(self.rows):
+            if swift_codes is not None and row[0] not in swift_codes:
+                continue
+            if (lower is None or row[0] >= lower) and (upper is None or row[0] < upper):
+                if self.fetch_latency and index % 1000 == 0:
+                    time.sleep(self.fetch_latency)
+                yield row
+
+    def get_user_bank_account_impact_stats_batch(self, bank_branch_pairs):
+        return {f"{swift}-{branch}": {"total_accounts": 0, "active_users": 0} for swift, branch in bank_branch_pairs}
+
+
+def _run(latest, rows, workers, fetch_latency):
+    detector = main.DiffDetector(SyntheticDatabaseClient(rows, fetch_latency))
+    detector.zengin_client = SyntheticZenginClient(latest)
+    detector.diff_engine = 'merge'
+    detector.diff_mode = 'full'
+    detector.diff_workers = workers
+    started = time.perf_counter()
+    result = detector.detect_differences()
+    return time.perf_counter() - started, [asdict(diff) for diff in result.diffs]
+
+
+def main_():
+    parser = argparse.ArgumentParser(description='並列差分検出のワーカー数ごとの実行時間')
+    parser.add_argument('--banks', type=int, default=2000)
+    parser.add_argument('--branches', type=int, default=150)
+    parser.add_argument('--workers', default='1,2,4')
+    parser.add_argument('--fetch-latency-ms', type=float, default=0.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    latest = _synthetic_latest(args.banks, args.branches)
+    rows = _synthetic_mbank(latest)
+    fetch_latency = args.fetch_latency_ms / 1000
+    print(f"rows: zengin={len(latest)} mbank={len(rows)}  vCPU={os.cpu_count()}")
+
+    baseline = None
+    print('{0:>8} {1:>10} {2:>10} {3:>8}'.format('workers', 'best_s', 'diffs', 'speedup'))
+    for workers in [int(w) for w in args.workers.split(',')]:
+        timings = []
+        for _ in range(args.repeat):
+            elapsed, diffs = _run(latest, rows, workers, fetch_latency)
+            timings.append(elapsed)
+        if baseline is None:
+            baseline = (min(timings), diffs)
+        assert diffs == baseline[1], f"workers={workers} の結果が逐次実行と一致しません"
+        print('{0:>8} {1:>10.3f} {2:>10} {3:>8.2f}'.format(
+            workers, min(timings), len(diffs), baseline[0] / min(timings)))
+
+
+if __name__ == '__main__':
+    main_()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""zengin_code の全データをロードしたときのメモリ使用量を計測する
+
+legacy: 変更前と同じ構造（インスタンスごとの __dict__、OrderedDict、文字列の intern なし）
+current: 現行の zengin_code（__slots__ と intern 済み文字列）
+
+各モードは別プロセスで実行し、tracemalloc のピークとロード前後の RSS 差分を出力する。
+
+    python3 benchmarks/zengin_code_memory.py
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+
+PROCESSOR_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'lambda', 'zengin-diff-processor'
+)
+DATA_DIR = os.path.join(PROCESSOR_DIR, 'zengin_code', 'source-data', 'data')
+
+
+def _rss_kb():
+    """現在の RSS (KB) を /proc から取得"""
+    with open('/proc/self/statm') as fp:
+        pages = int(fp.read().split()[1])
+    return pages * os.sysconf('SC_PAGE_SIZE') // 1024
+
+
+class LegacyBank(object):
+    def __init__(self, code, name, kana, hira, roma):
+        self.code = code
+        self.name = name
+        self.kana = kana
+        self.hira = hira
+        self.roma = roma
+        self.branches = OrderedDict()
+
+
+class LegacyBranch(object):
+    def __init__(self, bank, code, name, kana, hira, roma):
+        self.bank = bank
+        self.code = code
+        self.name = name
+        self.kana = kana
+        self.hira = hira
+        self.roma = roma
+
+
+def _load_legacy():
+    with open(os.path.join(DATA_DIR, 'banks.json'), 'rb') as fp:
+        banks = json.loads(fp.read().decode('utf-8'))
+    result = OrderedDict()
+    for code, bank_dict in sorted(banks.items()):
+        bank = LegacyBank(**bank_dict)
+        with open(os.path.join(DATA_DIR, 'branches', '{0}.json'.format(code)), 'rb') as fp:
+            branches = json.loads(fp.read().decode('utf-8'))
+        for branch_code, branch_dict in sorted(branches.items()):
+            bank.branches[branch_code] = LegacyBranch(bank, **branch_dict)
+        result[code] = bank
+    return result
+
+
+def _load_current():
+    os.environ['ZENGIN_CODE_EAGER_LOAD'] = '1'
+    sys.path.insert(0, PROCESSOR_DIR)
+    from zengin_code import Bank
+    return Bank.all
+
+
+def _measure(mode):
+    """単一モードを計測して JSON で出力"""
+    loader = _load_legacy if mode == 'legacy' else _load_current
+
+    gc.collect()
+    rss_before = _rss_kb()
+    tracemalloc.start()
+    started = time.perf_counter()
+    banks = loader()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = _rss_kb()
+
+    print(json.dumps({
+        'mode': mode,
+        'banks': len(banks),
+        'branches': sum(len(bank.branches) for bank in banks.values()),
+        'retained_kb': current // 1024,
+        'peak_kb': peak // 1024,
+        'rss_delta_kb': rss_after - rss_before,
+        'load_seconds': round(elapsed, 3),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='zengin_code のメモリ使用量比較')
+    parser.add_argument('--mode', choices=['legacy', 'current'])
+    args = parser.parse_args()
+
+    if args.mode:
+        _measure(args.mode)
+        return
+
+    results = []
+    for mode in ('legacy', 'current'):
+        output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--mode', mode])
+        results.append(json.loads(output.decode('utf-8')))
+
+    print('{0:<8} {1:>6} {2:>9} {3:>12} {4:>9} {5:>13} {6:>8}'.format(
+        'mode', 'banks', 'branches', 'retained_kb', 'peak_kb', 'rss_delta_kb', 'load_s'))
+    for r in results:
+        print('{mode:<8} {banks:>6} {branches:>9} {retained_kb:>12} {peak_kb:>9} {rss_delta_kb:>13} {load_seconds:>8}'.format(**r))
+
+
+if __name__ == '__main__':
+    main()
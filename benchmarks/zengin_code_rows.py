@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""zengin_code の全件取得をオブジェクト走査と列指向APIで比較する
+
+objects: Bank.all と bank.branches を辿って行タプルを作る（従来の get_all_banks と同じ走査）
+iter_rows: zengin_code.iter_rows() のストリーミング行
+to_columns: zengin_code.to_columns() の並列リスト
+
+各モードは別プロセスでコールド計測（ロード込み）し、続けて同一プロセスで再実行したウォーム値も出力する。
+全モードの出力が一致することも検証する。
+
+    python3 benchmarks/zengin_code_rows.py
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+PROCESSOR_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'lambda', 'zengin-diff-processor'
+)
+
+
+def _objects(zengin_code):
+    rows = []
+    for bank_code, bank in zengin_code.Bank.all.items():
+        for branch_code, branch in bank.branches.items():
+            rows.append((bank_code, bank.name, bank.kana, branch_code, branch.name, branch.kana))
+    return rows
+
+
+def _iter_rows(zengin_code):
+    return list(zengin_code.iter_rows())
+
+
+def _to_columns(zengin_code):
+    columns = zengin_code.to_columns()
+    return list(zip(*(columns[field] for field in zengin_code.ROW_FIELDS)))
+
+
+MODES = {
+    'objects': _objects,
+    'iter_rows': _iter_rows,
+    'to_columns': _to_columns,
+}
+
+
+def _digest(rows):
+    return hashlib.sha256(json.dumps(rows, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _measure(mode):
+    """単一モードを計測して JSON で出力"""
+    started = time.perf_counter()
+    sys.path.insert(0, PROCESSOR_DIR)
+    import zengin_code
+    import_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    rows = MODES[mode](zengin_code)
+    cold_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    MODES[mode](zengin_code)
+    warm_seconds = time.perf_counter() - started
+
+    print(json.dumps({
+        'mode': mode,
+        'rows': len(rows),
+        'import_s': round(import_seconds, 3),
+        'cold_s': round(cold_seconds, 3),
+        'warm_s': round(warm_seconds, 3),
+        'digest': _digest(rows),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='zengin_code 全件取得のベンチマーク')
+    parser.add_argument('--mode', choices=sorted(MODES))
+    args = parser.parse_args()
+
+    if args.mode:
+        _measure(args.mode)
+        return
+
+    results = []
+    for mode in ('objects', 'iter_rows', 'to_columns'):
+        output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--mode', mode])
+        results.append(json.loads(output.decode('utf-8')))
+
+    digests = set(r['digest'] for r in results)
+    assert len(digests) == 1, '各モードの出力が一致しません: {0}'.format(digests)
+
+    print('{0:<11} {1:>7} {2:>9} {3:>7} {4:>7}'.format('mode', 'rows', 'import_s', 'cold_s', 'warm_s'))
+    for r in results:
+        print('{mode:<11} {rows:>7} {import_s:>9} {cold_s:>7} {warm_s:>7}'.format(**r))
+
+
+if __name__ == '__main__':
+    main()
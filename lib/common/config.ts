@@ -65,6 +65,10 @@ export interface DynamoDbConfig {
 
 export interface EventBridgeConfig {
   dailyScheduleExpression: string;
+  // 影響インデックス（UserBankAccountの影響件数）の再集計スケジュール
+  impactIndexScheduleExpression?: string;
+  // zengin-codeデータアーティファクトの公開スケジュール
+  artifactPublishScheduleExpression?: string;
   schedulerGroupName: string;
 }
 
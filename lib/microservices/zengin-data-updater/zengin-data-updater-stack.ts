@@ -128,6 +128,15 @@ export class ZenginDataUpdaterStack extends cdk.Stack {
             type: dynamodb.AttributeType.STRING,
           },
         },
+        {
+          // Slackのメッセージから差分を特定（キーのみ射影し、本体はGetItemで取得）
+          indexName: 'MessageTsIndex',
+          partitionKey: {
+            name: 'message_ts',
+            type: dynamodb.AttributeType.STRING,
+          },
+          projectionType: dynamodb.ProjectionType.KEYS_ONLY,
+        },
       ],
       billingMode:
         zenginConfig.dynamodb.billingMode === 'PROVISIONED'
@@ -220,11 +229,24 @@ export class ZenginDataUpdaterStack extends cdk.Stack {
       versioned: true,
       encryption: s3.BucketEncryption.S3_MANAGED,
       blockPublicAccess: s3.BlockPublicAccess.BLOCK_ALL,
+      // 期限切れで削除するのは差分データと重複解消計画のみ
+      // （zengin-artifacts/・bank-fingerprints/・impact-index/・normalized-cache/ は処理の前提となる状態のため削除しない）
       lifecycleRules: [
         {
           id: 'DeleteOldDiffs',
           enabled: true,
+          prefix: 'diffs/',
+          expiration: cdk.Duration.days(90), // 90日後に削除
+        },
+        {
+          id: 'DeleteOldDedupPlans',
+          enabled: true,
+          prefix: 'dedup-plans/',
           expiration: cdk.Duration.days(90), // 90日後に削除
+        },
+        {
+          id: 'DeleteNoncurrentVersions',
+          enabled: true,
           noncurrentVersionExpiration: cdk.Duration.days(30),
         },
       ],
@@ -373,6 +395,14 @@ export class ZenginDataUpdaterStack extends cdk.Stack {
       vpcSubnets: vpcConfig.vpcSubnets,
       environment: {
         ...commonEnvironment,
+        // 正規化済みzenginデータをS3で全コンテナ共有（normalized-cache/{env}/）
+        NORMALIZED_CACHE_S3_ENABLED: 'true',
+        // 変更のあった銀行のみ比較し、7日ごとに全件比較（bank-fingerprints/{env}/）
+        INCREMENTAL_DIFF_ENABLED: 'true',
+        FULL_RECONCILIATION_INTERVAL_DAYS: '7',
+        // 影響件数はスナップショットを参照し、24時間より古い場合のみDBで集計（impact-index/{env}/）
+        IMPACT_INDEX_ENABLED: 'true',
+        IMPACT_INDEX_MAX_AGE_HOURS: '24',
       },
       layers: [psycopg2Layer],
     });
@@ -452,6 +482,8 @@ export class ZenginDataUpdaterStack extends cdk.Stack {
 
     // Callback HandlerにExecutor Lambdaの参照を追加
     callbackHandler.addEnvironment('EXECUTE_LAMBDA_ARN', diffExecutor.function.functionArn);
+    // Executorから実行後に影響インデックスの再集計を依頼
+    diffExecutor.addEnvironment('DIFF_PROCESSOR_FUNCTION_NAME', diffProcessor.function.functionName);
 
     // Provisioned concurrency (keep warm)
     // NOTE: Provisioned concurrency is temporarily disabled due to deployment issues
@@ -481,6 +513,8 @@ export class ZenginDataUpdaterStack extends cdk.Stack {
     // S3アクセス権限
     this.diffDataBucket.grantReadWrite(this.diffProcessorFunction.function);
     this.diffDataBucket.grantRead(this.diffExecutorFunction.function);
+    // 実行成功時に銀行フィンガープリントを current.json へ昇格
+    this.diffDataBucket.grantPut(this.diffExecutorFunction.function, 'bank-fingerprints/*');
     this.diffDataBucket.grantReadWrite(this.callbackHandlerFunction.function);
 
     // Secrets Manager アクセス権限
@@ -491,6 +525,7 @@ export class ZenginDataUpdaterStack extends cdk.Stack {
 
     // Lambda間の呼び出し権限
     this.diffExecutorFunction.function.grantInvoke(this.callbackHandlerFunction.function);
+    this.diffProcessorFunction.function.grantInvoke(this.diffExecutorFunction.function);
     this.callbackHandlerFunction.function.grantInvoke(this.slackInteractiveFunction.function);
   }
 
@@ -605,6 +640,29 @@ export class ZenginDataUpdaterStack extends cdk.Stack {
         },
       });
     }
+
+    this.eventBridge.addSchedule({
+      scheduleName: `zengin-impact-index-refresh-${this.config.env}`,
+      scheduleExpression: zenginConfig?.eventbridge?.impactIndexScheduleExpression || 'cron(0 */6 * * ? *)',
+      targetFunction: this.diffProcessorFunction.function,
+      description: 'Refresh UserBankAccount impact index snapshot',
+      inputPayload: {
+        trigger: 'impact_index_refresh',
+        source: 'eventbridge-scheduler',
+      },
+    });
+
+    // PyPIの最新zengin-codeをアーティファクトとして公開（新しいリリースがなければ何もしない）
+    this.eventBridge.addSchedule({
+      scheduleName: `zengin-artifact-publish-${this.config.env}`,
+      scheduleExpression: zenginConfig?.eventbridge?.artifactPublishScheduleExpression || 'cron(30 * * * ? *)',
+      targetFunction: this.diffProcessorFunction.function,
+      description: 'Publish latest zengin-code data artifact',
+      inputPayload: {
+        trigger: 'zengin_artifact_publish',
+        source: 'eventbridge-scheduler',
+      },
+    });
   }
 
   /**
@@ -0,0 +1,373 @@
+"""
+差分データのS3アーティファクト（行区切りJSON + gzip）
+
+1行目がヘッダー、2行目以降が1行1差分のJSON。gzipはストリーミングで圧縮しながら
+S3のマルチパートアップロードに書き込み、読み込み時も1行ずつ展開するため、
+差分の件数によらずメモリ使用量はほぼ一定になる。
+
+    {"format": "zengin-diff-ndjson", "schema_version": 1, "counts": {...}, "mask_fields": [...]}
+    {"action": "update", "key": "0001-001", "old_data": {...}, "new_data": {...}, "total_accounts": 0, "active_users": 0, "changed_mask": 16}
+    ...
+
+changed_mask は更新差分で値が変わったフィールド（mask_fields の順のビット）。差分検出時の正規化済み比較で
+求めた BankDiff.changed_fields をそのまま符号化したもので、changed_fields 自体は行に含めない。
+旧形式（差分リスト全体を1つのJSON配列にした full_diffs.json.gz）も読み込める。
+
+シャード形式（layout=sharded）では、ヘッダーと shard_size 件ごとの差分をそれぞれ独立したgzipメンバーとして
+同じオブジェクトに連結し（全体を先頭から読めば単一ファイル形式と同じ内容になる）、次を併せて保存する。
+
+    manifest.json      シャードごとのバイト範囲・件数・キー範囲・sha256
+    key_index.json.gz  差分キー → シャード番号
+
+利用側はシャードをRange指定のGETで並行に取得したり、1つのキーを含むシャードだけを取得したりできる。
+"""
+import gzip
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, is_dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+ARTIFACT_FORMAT = 'zengin-diff-ndjson'
+SCHEMA_VERSION = 1
+ARTIFACT_FILENAME = 'full_diffs.ndjson.gz'
+MANIFEST_FILENAME = 'manifest.json'
+KEY_INDEX_FILENAME = 'key_index.json.gz'
+LAYOUTS = ('single', 'sharded')
+DEFAULT_SHARD_SIZE = 5000
+MASK_FIELDS = ('swift_code', 'bank_name', 'bank_name_kana', 'branch_code', 'branch_name', 'branch_name_kana')
+# マルチパートアップロードのパートサイズ（S3の下限は5MiB）
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+
+
+def changed_mask(fields: Iterable[str]) -> int:
+    """フィールド名のリストからビットマスク（mask_fields にないフィールドは無視）"""
+    mask = 0
+    for name in fields:
+        if name in MASK_FIELDS:
+            mask |= 1 << MASK_FIELDS.index(name)
+    return mask
+
+
+def changed_fields(mask: int) -> List[str]:
+    """ビットマスクからフィールド名のリスト"""
+    return [name for bit, name in enumerate(MASK_FIELDS) if mask & (1 << bit)]
+
+
+def build_header(actions: Iterable[str]) -> Dict[str, Any]:
+    """差分の種別ごとの件数を含むヘッダー"""
+    counts = {'total': 0, 'create': 0, 'update': 0, 'delete': 0}
+    for action in actions:
+        counts['total'] += 1
+        counts[action] = counts.get(action, 0) + 1
+    return {
+        'format': ARTIFACT_FORMAT,
+        'schema_version': SCHEMA_VERSION,
+        'counts': counts,
+        'mask_fields': list(MASK_FIELDS),
+    }
+
+
+def encode_row(diff: Any) -> bytes:
+    row = asdict(diff) if is_dataclass(diff) else dict(diff)
+    row['changed_mask'] = changed_mask(row.pop('changed_fields', None) or ())
+    return json.dumps(row, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+class S3MultipartWriter:
+    """書き込んだバイト列をパートサイズごとにマルチパートアップロードする（1パート未満なら put_object）"""
+
+    def __init__(self, s3_client, bucket: str, key: str, part_size: int = DEFAULT_PART_SIZE, **put_args):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.put_args = put_args
+        self.buffer = bytearray()
+        self.upload_id: Optional[str] = None
+        self.parts: List[Dict[str, Any]] = []
+        self.bytes_written = 0
+
+    def write(self, data: bytes) -> int:
+        self.buffer.extend(data)
+        self.bytes_written += len(data)
+        while len(self.buffer) >= self.part_size:
+            self._upload_part(bytes(self.buffer[:self.part_size]))
+            del self.buffer[:self.part_size]
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def _upload_part(self, body: bytes):
+        if self.upload_id is None:
+            self.upload_id = self.s3.create_multipart_upload(Bucket=self.bucket, Key=self.key, **self.put_args)['UploadId']
+        part_number = len(self.parts) + 1
+        response = self.s3.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, PartNumber=part_number, Body=body
+        )
+        self.parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+
+    def complete(self):
+        if self.upload_id is None:
+            self.s3.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer), **self.put_args)
+        else:
+            if self.buffer:
+                self._upload_part(bytes(self.buffer))
+            self.s3.complete_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, MultipartUpload={'Parts': self.parts}
+            )
+        self.buffer = bytearray()
+
+    def abort(self):
+        if self.upload_id is not None:
+            self.s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+            self.upload_id = None
+
+
+class _MemberWriter:
+    """1つのgzipメンバーの書き込み位置・長さ・sha256を記録する"""
+
+    def __init__(self, writer: S3MultipartWriter):
+        self.writer = writer
+        self.offset = writer.bytes_written
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data: bytes) -> int:
+        self.sha256.update(data)
+        return self.writer.write(data)
+
+    def flush(self):
+        pass
+
+    @property
+    def length(self) -> int:
+        return self.writer.bytes_written - self.offset
+
+
+def artifact_keys(prefix: str) -> Dict[str, str]:
+    """差分アーティファクトのS3キー（prefix は末尾の / を含む）"""
+    return {
+        'data': f"{prefix}{ARTIFACT_FILENAME}",
+        'manifest': f"{prefix}{MANIFEST_FILENAME}",
+        'key_index': f"{prefix}{KEY_INDEX_FILENAME}",
+    }
+
+
+def write_diff_artifact(s3_client, bucket: str, key: str, diffs: List[Any],
+                        metadata: Optional[Dict[str, str]] = None, part_size: int = DEFAULT_PART_SIZE) -> Dict[str, Any]:
+    """差分を1件ずつ直列化してgzipストリームでS3に書き込む（単一ファイル形式）
+
+    Returns:
+        Dict: ヘッダーと圧縮前後のサイズ
+    """
+    header = build_header(diff.action for diff in diffs)
+    writer = S3MultipartWriter(
+        s3_client, bucket, key, part_size=part_size,
+        ContentType='application/x-ndjson',
+        ContentEncoding='gzip',
+        Metadata={
+            **(metadata or {}),
+            'format': ARTIFACT_FORMAT,
+            'schema_version': str(SCHEMA_VERSION),
+            'diff_count': str(header['counts']['total']),
+        }
+    )
+    original_size = 0
+    try:
+        with gzip.GzipFile(fileobj=writer, mode='wb', mtime=0) as gz:
+            line = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+            gz.write(line)
+            original_size += len(line)
+            for diff in diffs:
+                line = encode_row(diff)
+                gz.write(line)
+                original_size += len(line)
+        writer.complete()
+    except Exception:
+        writer.abort()
+        raise
+    return {'header': header, 'original_size': original_size, 'compressed_size': writer.bytes_written}
+
+
+def write_sharded_diff_artifact(s3_client, bucket: str, prefix: str, diffs: List[Any],
+                                metadata: Optional[Dict[str, str]] = None, shard_size: int = DEFAULT_SHARD_SIZE,
+                                part_size: int = DEFAULT_PART_SIZE) -> Dict[str, Any]:
+    """差分をシャードごとのgzipメンバーとして書き込み、キーインデックスとマニフェストを保存する
+
+    マニフェストは最後に書き込むため、マニフェストがあればデータとキーインデックスは揃っている。
+
+    Returns:
+        Dict: マニフェストと圧縮前後のサイズ
+    """
+    keys = artifact_keys(prefix)
+    header = build_header(diff.action for diff in diffs)
+    writer = S3MultipartWriter(
+        s3_client, bucket, keys['data'], part_size=part_size,
+        ContentType='application/x-ndjson',
+        ContentEncoding='gzip',
+        Metadata={
+            **(metadata or {}),
+            'format': ARTIFACT_FORMAT,
+            'schema_version': str(SCHEMA_VERSION),
+            'diff_count': str(header['counts']['total']),
+            'layout': 'sharded',
+        }
+    )
+    shards = []
+    key_index: Dict[str, int] = {}
+    original_size = 0
+    try:
+        member = _MemberWriter(writer)
+        with gzip.GzipFile(fileobj=member, mode='wb', mtime=0) as gz:
+            line = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+            gz.write(line)
+            original_size += len(line)
+        header_range = {'offset': member.offset, 'length': member.length}
+
+        for start in range(0, len(diffs), max(1, shard_size)):
+            shard_diffs = diffs[start:start + max(1, shard_size)]
+            member = _MemberWriter(writer)
+            with gzip.GzipFile(fileobj=member, mode='wb', mtime=0) as gz:
+                for diff in shard_diffs:
+                    line = encode_row(diff)
+                    gz.write(line)
+                    original_size += len(line)
+            shard_keys = [diff.key for diff in shard_diffs]
+            for diff_key in shard_keys:
+                key_index[diff_key] = len(shards)
+            shards.append({
+                'index': len(shards),
+                'offset': member.offset,
+                'length': member.length,
+                'rows': len(shard_diffs),
+                'min_key': min(shard_keys),
+                'max_key': max(shard_keys),
+                'sha256': member.sha256.hexdigest(),
+            })
+        writer.complete()
+    except Exception:
+        writer.abort()
+        raise
+
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=keys['key_index'],
+        Body=gzip.compress(json.dumps({'shards': len(shards), 'keys': key_index}, separators=(',', ':')).encode('utf-8'), mtime=0),
+        ContentType='application/json',
+        ContentEncoding='gzip'
+    )
+    manifest = {
+        'format': ARTIFACT_FORMAT,
+        'schema_version': SCHEMA_VERSION,
+        'layout': 'sharded',
+        'data_key': keys['data'],
+        'key_index_key': keys['key_index'],
+        'counts': header['counts'],
+        'shard_size': shard_size,
+        'header': header_range,
+        'shards': shards,
+    }
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=keys['manifest'],
+        Body=json.dumps(manifest, ensure_ascii=False).encode('utf-8'),
+        ContentType='application/json'
+    )
+    return {'manifest': manifest, 'original_size': original_size, 'compressed_size': writer.bytes_written}
+
+
+class DiffArtifactReader:
+    """差分アーティファクトを1行ずつ読み込む（旧形式のJSON配列にも対応）"""
+
+    def __init__(self, body):
+        self._gz = gzip.GzipFile(fileobj=body, mode='rb')
+        first_line = self._gz.readline()
+        self._legacy_rows: Optional[List[Dict[str, Any]]] = None
+        if first_line.lstrip().startswith(b'['):
+            # 旧形式: 全体が1つのJSON配列
+            self._legacy_rows = json.loads(first_line + self._gz.read())
+            self.header = build_header(row['action'] for row in self._legacy_rows)
+            self.header['schema_version'] = 0
+        else:
+            self.header = json.loads(first_line) if first_line.strip() else build_header([])
+            if self.header.get('format') != ARTIFACT_FORMAT or self.header.get('schema_version') != SCHEMA_VERSION:
+                raise ValueError(f"未対応の差分アーティファクト: {self.header.get('format')} v{self.header.get('schema_version')}")
+
+    @property
+    def total(self) -> int:
+        return self.header['counts']['total']
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        if self._legacy_rows is not None:
+            yield from self._legacy_rows
+            return
+        for line in self._gz:
+            if line.strip():
+                yield json.loads(line)
+
+
+def open_diff_artifact(s3_client, bucket: str, key: str) -> DiffArtifactReader:
+    """S3の差分アーティファクトを開く（本文はストリーミングで読み込む）"""
+    response = s3_client.get_object(Bucket=bucket, Key=key)
+    return DiffArtifactReader(response['Body'])
+
+
+def load_manifest(s3_client, bucket: str, manifest_key: str) -> Dict[str, Any]:
+    """シャード形式のマニフェストを読み込む"""
+    response = s3_client.get_object(Bucket=bucket, Key=manifest_key)
+    manifest = json.loads(response['Body'].read().decode('utf-8'))
+    if manifest.get('format') != ARTIFACT_FORMAT or manifest.get('schema_version') != SCHEMA_VERSION:
+        raise ValueError(f"未対応の差分マニフェスト: {manifest.get('format')} v{manifest.get('schema_version')}")
+    return manifest
+
+
+def read_shard(s3_client, bucket: str, manifest: Dict[str, Any], index: int) -> List[Dict[str, Any]]:
+    """1つのシャードをRange指定のGETで取得して差分の行を返す（sha256を検証）"""
+    shard = manifest['shards'][index]
+    end = shard['offset'] + shard['length'] - 1
+    response = s3_client.get_object(Bucket=bucket, Key=manifest['data_key'], Range=f"bytes={shard['offset']}-{end}")
+    body = response['Body'].read()
+    if hashlib.sha256(body).hexdigest() != shard['sha256']:
+        raise ValueError(f"差分シャードのチェックサムが一致しません: {manifest['data_key']} shard={index}")
+    return [json.loads(line) for line in gzip.decompress(body).splitlines() if line.strip()]
+
+
+def iter_shards(s3_client, bucket: str, manifest: Dict[str, Any], max_workers: int = 4,
+                indexes: Optional[Iterable[int]] = None) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    """シャードを並行に取得し、シャード番号順に (番号, 行リスト) を返す
+
+    同時に保持するシャードは max_workers の2倍までに抑える。
+    """
+    indexes = list(range(len(manifest['shards'])) if indexes is None else indexes)
+    if max_workers <= 1:
+        for index in indexes:
+            yield index, read_shard(s3_client, bucket, manifest, index)
+        return
+    window = max_workers * 2
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = []
+        position = 0
+        while position < len(indexes) or futures:
+            while position < len(indexes) and len(futures) < window:
+                index = indexes[position]
+                futures.append((index, executor.submit(read_shard, s3_client, bucket, manifest, index)))
+                position += 1
+            index, future = futures.pop(0)
+            yield index, future.result()
+
+
+def iter_sharded_rows(s3_client, bucket: str, manifest: Dict[str, Any], max_workers: int = 4) -> Iterator[Dict[str, Any]]:
+    """全シャードの差分の行を書き込み順に返す"""
+    for _, rows in iter_shards(s3_client, bucket, manifest, max_workers):
+        yield from rows
+
+
+def find_diff(s3_client, bucket: str, manifest: Dict[str, Any], diff_key: str) -> Optional[Dict[str, Any]]:
+    """キーインデックスから1つの差分キーを含むシャードだけを取得して差分を返す"""
+    response = s3_client.get_object(Bucket=bucket, Key=manifest['key_index_key'])
+    key_index = json.loads(gzip.decompress(response['Body'].read()).decode('utf-8'))
+    index = key_index['keys'].get(diff_key)
+    if index is None:
+        return None
+    return next((row for row in read_shard(s3_client, bucket, manifest, index) if row['key'] == diff_key), None)
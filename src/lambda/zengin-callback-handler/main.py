@@ -10,12 +10,13 @@ import csv
 import io
 import tempfile
 from datetime import datetime, timezone, timedelta
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Iterable
 from urllib.parse import parse_qs
 from dataclasses import dataclass
 import base64
 import requests
-import gzip
+from common.diff_artifact import iter_sharded_rows, load_manifest, open_diff_artifact
+from common.diff_repository import DiffRepository
 
 # AWS clients setup
 dynamodb = boto3.resource('dynamodb')
@@ -37,6 +38,13 @@ SLACK_WEBHOOK_SECRET_ARN = os.getenv('SLACK_WEBHOOK_SECRET_ARN')
 SCHEDULER_ROLE_ARN = os.getenv('SCHEDULER_ROLE_ARN')
 ENVIRONMENT = os.getenv('ENVIRONMENT', 'dev')
 S3_BUCKET_NAME = os.getenv('S3_BUCKET_NAME', f'{ENVIRONMENT}-zengin-diff-data')
+# シャード形式の差分データを並行に取得するスレッド数
+DIFF_SHARD_READ_WORKERS = int(os.getenv('DIFF_SHARD_READ_WORKERS', '4'))
+# 承認・却下・CSV出力に必要な差分テーブルの属性（キー以外）
+CALLBACK_ATTRIBUTES = ('status', 'summary', 'total_changes', 'diffs_s3_key', 'diffs_manifest_s3_key')
+
+# 差分テーブル（呼び出し単位でアイテムをキャッシュ）
+DIFF_REPOSITORY = DiffRepository(dynamodb, DIFF_TABLE_NAME)
 
 # JST timezone
 JST = timezone(timedelta(hours=9))
@@ -55,23 +63,21 @@ def get_account_id():
         # Fallback to environment variable if available
         return os.getenv('AWS_ACCOUNT_ID', '')
 
-def load_diffs_from_s3(s3_key: str) -> List[Dict[str, Any]]:
-    """S3から差分データを読み込み"""
+def load_diffs_from_s3(s3_key: str, manifest_key: Optional[str] = None) -> Iterable[Dict[str, Any]]:
+    """S3の差分データを開く（シャード形式はシャードを並行に取得、単一ファイル形式は行ごとにストリーミング）"""
     try:
-        logger.info(f"S3から差分データを読み込み: s3://{S3_BUCKET_NAME}/{s3_key}")
-        
-        # S3からgzip圧縮されたデータを取得
-        response = s3.get_object(Bucket=S3_BUCKET_NAME, Key=s3_key)
-        compressed_data = response['Body'].read()
+        if manifest_key:
+            logger.info(f"S3から差分データを読み込み: s3://{S3_BUCKET_NAME}/{manifest_key}")
+            manifest = load_manifest(s3, S3_BUCKET_NAME, manifest_key)
+            logger.info(f"S3の差分データ: {manifest['counts']['total']}件 ({len(manifest['shards'])}シャード)")
+            return iter_sharded_rows(s3, S3_BUCKET_NAME, manifest, DIFF_SHARD_READ_WORKERS)
         
-        # gzipを解凍
-        json_data = gzip.decompress(compressed_data).decode('utf-8')
+        logger.info(f"S3から差分データを読み込み: s3://{S3_BUCKET_NAME}/{s3_key}")
         
-        # JSONをパース
-        diffs_data = json.loads(json_data)
+        reader = open_diff_artifact(s3, S3_BUCKET_NAME, s3_key)
         
-        logger.info(f"S3から{len(diffs_data)}件の差分データを読み込みました")
-        return diffs_data
+        logger.info(f"S3の差分データ: {reader.total}件 (形式バージョン: {reader.header['schema_version']})")
+        return reader
         
     except Exception as e:
         logger.error(f"S3からの差分データ読み込みエラー: {str(e)}")
@@ -290,7 +296,7 @@ class SlackInteractionHandler:
     """Slackインタラクション処理"""
     
     def __init__(self):
-        self.table = dynamodb.Table(DIFF_TABLE_NAME)
+        self.diff_repository = DIFF_REPOSITORY
         self.slack_client = SlackClient()
         self.csv_exporter = CSVExporter()
     
@@ -442,19 +448,11 @@ class SlackInteractionHandler:
                 return self._create_response(f"この差分は既に処理済みです (ステータス: {diff_item.get('status')})")
             
             # 却下処理
-            self.table.update_item(
-                Key={
-                    'id': diff_item['id'],
-                    'timestamp': diff_item['timestamp']  # Sort Keyも必要
-                },
-                UpdateExpression='SET #status = :status, rejected_by = :user, rejected_at = :timestamp',
-                ExpressionAttributeNames={'#status': 'status'},
-                ExpressionAttributeValues={
-                    ':status': 'rejected',
-                    ':user': user_name,
-                    ':timestamp': datetime.now(timezone.utc).isoformat()
-                }
-            )
+            self.diff_repository.update(diff_item['id'], {
+                'status': 'rejected',
+                'rejected_by': user_name,
+                'rejected_at': datetime.now(timezone.utc).isoformat()
+            })
             
             self.slack_client.update_message_with_result(message_ts, False, user_name)
             
@@ -485,7 +483,7 @@ class SlackInteractionHandler:
             if not diff_item.get('diffs_s3_key'):
                 return self._create_response("差分データのS3参照が見つかりません")
             
-            diffs_data = load_diffs_from_s3(diff_item['diffs_s3_key'])
+            diffs_data = load_diffs_from_s3(diff_item['diffs_s3_key'], diff_item.get('diffs_manifest_s3_key'))
             
             # BankUpdateRequestDataオブジェクトを復元
             diffs = []
@@ -531,51 +529,9 @@ class SlackInteractionHandler:
             return self._create_response("❌ CSV出力でエラーが発生しました")
     
     def _find_diff_by_timestamp(self, message_ts: str) -> Optional[Dict[str, Any]]:
-        """メッセージタイムスタンプで差分データを検索"""
+        """メッセージタイムスタンプで差分データを検索（MessageTsIndex でキーを取得し、本体を強い整合性で取得）"""
         try:
-            # タイムスタンプを直接使用してslack_tsで検索
-            response = self.table.scan(
-                FilterExpression='slack_ts = :ts',
-                ExpressionAttributeValues={':ts': message_ts}
-            )
-            
-            items = response.get('Items', [])
-            if items:
-                return items[0]  # 最初にマッチしたアイテムを返す
-            
-            # フォールバック: タイムスタンプベースの検索
-            try:
-                timestamp_float = float(message_ts)
-                message_time = datetime.fromtimestamp(timestamp_float, tz=timezone.utc)
-                
-                # 前後5分の範囲でスキャン
-                start_time = (message_time - timedelta(minutes=5)).isoformat()
-                end_time = (message_time + timedelta(minutes=5)).isoformat()
-                
-                response = self.table.scan(
-                    FilterExpression='#timestamp BETWEEN :start_time AND :end_time AND #status = :status',
-                    ExpressionAttributeNames={
-                        '#timestamp': 'timestamp',
-                        '#status': 'status'
-                    },
-                    ExpressionAttributeValues={
-                        ':start_time': start_time,
-                        ':end_time': end_time,
-                        ':status': 'pending'
-                    }
-                )
-                
-                items = response.get('Items', [])
-                if items:
-                    # 最も近いタイムスタンプのアイテムを返す
-                    return min(items, key=lambda x: abs(
-                        datetime.fromisoformat(x['timestamp'].replace('Z', '+00:00')).timestamp() - timestamp_float
-                    ))
-            except (ValueError, TypeError):
-                pass
-            
-            return None
-            
+            return self.diff_repository.find_by_message_ts(message_ts, attributes=CALLBACK_ATTRIBUTES)
         except Exception as e:
             logger.error(f"差分データ検索エラー: {str(e)}")
             return None
@@ -652,21 +608,13 @@ class SlackInteractionHandler:
             )
             
             # DynamoDBの状態を更新
-            self.table.update_item(
-                Key={
-                    'id': diff_id,
-                    'timestamp': diff_item['timestamp']  # Sort Keyも必要
-                },
-                UpdateExpression='SET #status = :status, approved_by = :user, approved_at = :timestamp, scheduled_at = :schedule_time, execution_type = :exec_type',
-                ExpressionAttributeNames={'#status': 'status'},
-                ExpressionAttributeValues={
-                    ':status': 'scheduled',
-                    ':user': user_name,
-                    ':timestamp': datetime.now(timezone.utc).isoformat(),
-                    ':schedule_time': schedule_time_utc.isoformat(),
-                    ':exec_type': execution_type
-                }
-            )
+            self.diff_repository.update(diff_id, {
+                'status': 'scheduled',
+                'approved_by': user_name,
+                'approved_at': datetime.now(timezone.utc).isoformat(),
+                'scheduled_at': schedule_time_utc.isoformat(),
+                'execution_type': execution_type
+            })
             
             logger.info(f"スケジュール実行を設定: {schedule_name} at {schedule_time_utc}")
             
@@ -697,20 +645,12 @@ class SlackInteractionHandler:
             )
             
             # DynamoDBの状態を更新
-            self.table.update_item(
-                Key={
-                    'id': diff_id,
-                    'timestamp': diff_item['timestamp']  # Sort Keyも必要
-                },
-                UpdateExpression='SET #status = :status, approved_by = :user, approved_at = :timestamp, execution_type = :exec_type',
-                ExpressionAttributeNames={'#status': 'status'},
-                ExpressionAttributeValues={
-                    ':status': 'approved',
-                    ':user': user_name,
-                    ':timestamp': datetime.now(timezone.utc).isoformat(),
-                    ':exec_type': 'immediate'
-                }
-            )
+            self.diff_repository.update(diff_id, {
+                'status': 'approved',
+                'approved_by': user_name,
+                'approved_at': datetime.now(timezone.utc).isoformat(),
+                'execution_type': 'immediate'
+            })
             
             logger.info(f"即時実行を開始: {diff_id}")
             
@@ -730,6 +670,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """Lambda関数のメインハンドラー"""
     try:
         logger.info(f"Slackコールバック処理を開始: {json.dumps(event, ensure_ascii=False)}")
+        DIFF_REPOSITORY.begin_invocation()
         
         # Check if this is a direct Lambda invocation from slack-interactive
         if 'interaction_type' in event and 'payload' in event:
@@ -779,6 +720,9 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'traceback': traceback.format_exc()
             }, ensure_ascii=False)
         }
+    
+    finally:
+        logger.info(f"差分テーブルの消費キャパシティ: {json.dumps(DIFF_REPOSITORY.consumed_capacity())}")
 
 def handle_direct_invocation(event: Dict[str, Any]) -> Dict[str, Any]:
     """Handle direct Lambda invocation from slack-interactive function"""
@@ -601,6 +601,41 @@ class SlackClient:
         file_path = self.create_csv_from_diffs(update_request)
         return self.upload_csv_to_slack(file_path, message_ts)
 
+    def send_dedup_plan(self, dedup_plan: Dict[str, Any], message_ts: str = None) -> str:
+        """MBank重複の解消計画（JSON）をスレッドにアップロード"""
+        if self.client is None:
+            return ""
+        temp_file = tempfile.NamedTemporaryFile(
+            mode="w",
+            suffix=".json",
+            delete=False,
+            encoding="utf-8",
+        )
+        json.dump(dedup_plan, temp_file, ensure_ascii=False, indent=2, default=str)
+        temp_file.close()
+        try:
+            response = self.client.files_upload_v2(
+                channel=self.channel_id,
+                file=temp_file.name,
+                filename=f"zengin_dedup_plan_{now_jst().strftime('%Y%m%d_%H%M%S')}.json",
+                title="MBank重複解消計画",
+                initial_comment=(
+                    f"🧹 MBankに重複行があります: {dedup_plan.get('total_groups', 0)}キー\n"
+                    f"承認すると各キーで1行を残し、{dedup_plan.get('total_delete_rows', 0)}行を論理削除します。"
+                ),
+                thread_ts=message_ts,
+            )
+            logger.info("Dedup plan uploaded to Slack")
+            return response["file"]["id"]
+        except SlackApiError as e:
+            logger.error(f"Slack dedup plan upload error: {str(e)}")
+            return ""
+        finally:
+            try:
+                os.unlink(temp_file.name)
+            except Exception:
+                pass
+
     def send_csv_notification(self, csv_s3_url: str, filename: str, message_ts: str = None) -> str:
         """CSV出力完了通知をスレッドで送信"""
         if self.client is None:
@@ -0,0 +1,52 @@
+"""
+重複解消計画の実行前検証
+
+計画は差分処理Lambdaがリードレプリカから読み込んだ行で作成されるため、プライマリで論理削除する前に
+計画の各行（残す行・削除する行）が存在し、論理削除されておらず、キーと updated_at が計画作成時と
+同じであることを確認する。1行でも変わっていた重複グループは論理削除しない。
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# 検証のためにプライマリから取得するカラム
+VERIFY_COLUMNS = ('id', 'swift_code', 'branch_code', 'updated_at', 'is_deleted')
+
+
+def _timestamp(value: Any) -> Optional[str]:
+    """計画に保存した形式（isoformat）に揃える"""
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def planned_ids(groups: Iterable[Dict[str, Any]]) -> List[int]:
+    """計画に含まれる全行のid（残す行と削除する行）"""
+    return sorted({row['id'] for group in groups for row in group['rows']})
+
+
+def changed_reason(group: Dict[str, Any], current_rows: Dict[int, Dict[str, Any]]) -> Optional[str]:
+    """重複グループの行が計画作成時から変わっていればその内容（変わっていなければ None）"""
+    for planned in group['rows']:
+        current = current_rows.get(planned['id'])
+        if current is None:
+            return f"id={planned['id']} が存在しません"
+        if current['is_deleted']:
+            return f"id={planned['id']} は論理削除済みです"
+        if (current['swift_code'], current['branch_code']) != (planned['swift_code'], planned['branch_code']):
+            return f"id={planned['id']} のキーが変更されています"
+        if _timestamp(current['updated_at']) != _timestamp(planned.get('updated_at')):
+            return f"id={planned['id']} の updated_at が変更されています"
+    return None
+
+
+def split_unchanged_groups(
+    groups: Iterable[Dict[str, Any]],
+    current_rows: Dict[int, Dict[str, Any]],
+) -> Tuple[List[Dict[str, Any]], List[Tuple[Dict[str, Any], str]]]:
+    """(実行できるグループ, [(変更のあったグループ, 理由)]) に分ける"""
+    unchanged = []
+    changed = []
+    for group in groups:
+        reason = changed_reason(group, current_rows)
+        if reason:
+            changed.append((group, reason))
+        else:
+            unchanged.append(group)
+    return unchanged, changed
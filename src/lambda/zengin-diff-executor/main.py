@@ -2,15 +2,16 @@ import json
 import os
 import logging
 import boto3
-import boto3.dynamodb.conditions
 import traceback
 import psycopg2
 import psycopg2.extras
 from datetime import datetime, timezone
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Set, Tuple
 from dataclasses import dataclass
 from common.slack_client import SlackClient
-import gzip
+from common.diff_artifact import iter_sharded_rows, load_manifest, open_diff_artifact
+from common.diff_repository import DiffRepository
+from dedup_verification import VERIFY_COLUMNS, planned_ids, split_unchanged_groups
 from urllib.parse import quote_plus
 
 # AWS clients setup
@@ -28,6 +29,19 @@ DATABASE_SECRET_ARN = os.getenv('DATABASE_SECRET_ARN')
 SLACK_WEBHOOK_SECRET_ARN = os.getenv('SLACK_WEBHOOK_SECRET_ARN')
 ENVIRONMENT = os.getenv('ENVIRONMENT', 'dev')
 S3_BUCKET_NAME = os.getenv('S3_BUCKET_NAME', f'{ENVIRONMENT}-zengin-diff-data')
+# 差分処理Lambdaが保存する銀行単位のフィンガープリント（実行成功時に pending から current へ昇格）
+BANK_FINGERPRINT_S3_PREFIX = f"bank-fingerprints/{ENVIRONMENT}/"
+# 実行後に影響インデックス（UserBankAccountの影響件数）の再集計を依頼する差分処理Lambda
+DIFF_PROCESSOR_FUNCTION_NAME = os.getenv('DIFF_PROCESSOR_FUNCTION_NAME')
+# シャード形式の差分データを並行に取得するスレッド数
+DIFF_SHARD_READ_WORKERS = int(os.getenv('DIFF_SHARD_READ_WORKERS', '4'))
+# これを超えるキー数は非同期呼び出しのペイロード上限（256KB）を避けるため全件の再集計を依頼する
+IMPACT_INDEX_REFRESH_MAX_KEYS = 10000
+# 実行に必要な差分テーブルの属性（キー以外）
+EXECUTION_ATTRIBUTES = ('diffs_s3_key', 'diffs_manifest_s3_key', 'dedup_plan_s3_key', 'message_ts')
+
+# 差分テーブル（呼び出し単位でアイテムをキャッシュ）
+DIFF_REPOSITORY = DiffRepository(dynamodb, DIFF_TABLE_NAME)
 
 @dataclass
 class BankData:
@@ -115,6 +129,91 @@ class DatabaseClient:
             except Exception as e:
                 logger.warning(f"データベース接続クローズエラー: {str(e)}")
     
+    def get_mbank_checksum(self) -> Dict[str, Any]:
+        """MBank（is_deleted = 0）の件数と行ハッシュの集約チェックサムを取得（差分処理Lambdaと同じ計算）"""
+        conn = self.connect()
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT
+                    COUNT(*) AS row_count,
+                    md5(COALESCE(string_agg(row_hash, '' ORDER BY row_hash), '')) AS checksum
+                FROM (
+                    SELECT md5(concat_ws(chr(31),
+                        COALESCE(swift_code, ''), COALESCE(bank_name, ''), COALESCE(bank_name_kana, ''),
+                        COALESCE(branch_code, ''), COALESCE(branch_name, ''), COALESCE(branch_name_kana, '')
+                    )) AS row_hash
+                    FROM m_bank
+                    WHERE is_deleted = 0
+                ) hashed
+                """
+            )
+            row_count, checksum = cursor.fetchone()
+        return {"row_count": int(row_count or 0), "checksum": checksum}
+    
+    def execute_dedup_plan(self, dedup_plan: Dict[str, Any]) -> int:
+        """重複解消計画を一括実行（残す行が有効な場合のみ、同じキーの削除対象行を論理削除）
+        
+        計画はリードレプリカの行から作成されるため、計画の行をプライマリでロックして計画作成時から
+        変わっていないことを確認し、変わっていた重複グループは実行しない。
+        """
+        groups = [group for group in dedup_plan.get('groups', []) if group['delete_ids']]
+        if not groups:
+            return 0
+        
+        conn = self.connect()
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+            cursor.execute(
+                f"""
+                SELECT {', '.join(VERIFY_COLUMNS)}
+                FROM m_bank
+                WHERE id = ANY(%s::bigint[])
+                FOR UPDATE
+                """,
+                (planned_ids(groups),)
+            )
+            current_rows = {row['id']: row for row in cursor.fetchall()}
+        
+        groups, changed = split_unchanged_groups(groups, current_rows)
+        for group, reason in changed:
+            logger.warning(f"重複解消計画をスキップ（計画作成後に変更あり）: {group['key']} - {reason}")
+        
+        delete_ids = []
+        keep_ids = []
+        for group in groups:
+            for delete_id in group['delete_ids']:
+                delete_ids.append(delete_id)
+                keep_ids.append(group['keep_id'])
+        if not delete_ids:
+            return 0
+        
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE m_bank m SET
+                    is_deleted = 1,
+                    updated_at = NOW(),
+                    updated_user = 'zengin-updater'
+                FROM unnest(%s::bigint[], %s::bigint[]) AS plan(delete_id, keep_id)
+                WHERE m.id = plan.delete_id
+                  AND m.is_deleted = 0
+                  AND EXISTS (
+                      SELECT 1 FROM m_bank k
+                      WHERE k.id = plan.keep_id
+                        AND k.is_deleted = 0
+                        AND k.swift_code = m.swift_code
+                        AND k.branch_code = m.branch_code
+                  )
+                """,
+                (delete_ids, keep_ids)
+            )
+            deleted_count = cursor.rowcount
+        
+        if deleted_count < len(delete_ids):
+            logger.warning(f"重複解消計画の一部をスキップ（計画作成後に変更あり）: {len(delete_ids) - deleted_count}件")
+        logger.info(f"重複解消（論理削除）: {deleted_count}件")
+        return deleted_count
+    
     def execute_diff(self, diff: BankDiff) -> bool:
         """単一の差分を実行"""
         try:
@@ -294,14 +393,14 @@ class BankUpdater:
     def __init__(self):
         self.db_client = DatabaseClient()
         self.slack_client = SlackClient()
-        self.table = dynamodb.Table(DIFF_TABLE_NAME)
+        self.diff_repository = DIFF_REPOSITORY
     
     def execute_update(self, diff_id: str, approved_by: str = None) -> ExecutionResult:
         """差分更新メイン処理"""
         try:
             logger.info(f"銀行データ更新を開始: {diff_id}")
             
-            # DynamoDBから差分データを取得
+            # DynamoDBから差分データを取得（以降の状態更新・Slack通知はキャッシュしたキーと属性を使う）
             diff_data = self._get_diff_data(diff_id)
             if not diff_data:
                 raise ValueError(f"差分データが見つかりません: {diff_id}")
@@ -310,9 +409,14 @@ class BankUpdater:
             if not diff_data.get('diffs_s3_key'):
                 raise ValueError(f"S3キーが見つかりません: {diff_id}")
             
-            # S3から完全なデータを読み込み
-            diffs_data = self._load_diffs_from_s3(diff_data['diffs_s3_key'])
-            diffs = self._restore_diffs(diffs_data)
+            # S3の差分データを1件ずつ読み込みながら実行する
+            total_diffs, diff_rows = self._load_diffs_from_s3(diff_data['diffs_s3_key'],
+                                                              diff_data.get('diffs_manifest_s3_key'))
+            
+            # 重複解消計画（差分検出時にMBankの重複が見つかった場合のみ）
+            dedup_plan = None
+            if diff_data.get('dedup_plan_s3_key'):
+                dedup_plan = self._load_json_from_s3(diff_data['dedup_plan_s3_key'])
             
             # トランザクション開始
             conn = self.db_client.connect()
@@ -320,13 +424,20 @@ class BankUpdater:
             success_count = 0
             error_count = 0
             errors = []
+            # 影響インデックスの再集計対象（更新・削除したキー）
+            refresh_keys = set()
             
             try:
+                # 重複を先に解消し、以降の更新・削除が残す行だけに適用されるようにする
+                dedup_count = self.db_client.execute_dedup_plan(dedup_plan) if dedup_plan else 0
+                
                 # 各差分を処理
-                for diff in diffs:
+                for diff in self._restore_diffs(diff_rows):
                     try:
                         self.db_client.execute_diff(diff)
                         success_count += 1
+                        if diff.action in ("update", "delete"):
+                            refresh_keys.add(diff.key)
                     except Exception as e:
                         error_count += 1
                         error_msg = f"{diff.key}: {str(e)}"
@@ -340,7 +451,7 @@ class BankUpdater:
                 
                 # 結果に基づいてコミットまたはロールバック
                 # エラー率が50%を超える場合はロールバック
-                error_rate = error_count / len(diffs) if len(diffs) > 0 else 0
+                error_rate = error_count / total_diffs if total_diffs > 0 else 0
                 overall_success = error_count == 0 or (error_count <= 10 and error_rate < 0.1)
                 
                 if overall_success:
@@ -357,6 +468,8 @@ class BankUpdater:
                 details = f"成功: {success_count}件"
                 if error_count > 0:
                     details += f", エラー: {error_count}件"
+                if dedup_plan:
+                    details += f", 重複解消: {dedup_count}件"
                 
                 result = ExecutionResult(
                     success=overall_success,
@@ -369,11 +482,17 @@ class BankUpdater:
                 # DynamoDBの状態を更新
                 self._update_execution_status(diff_id, result, approved_by)
                 
-                # DynamoDBからmessage_tsを取得してSlack通知を送信
-                diff_data = self._get_diff_data(diff_id)
-                message_ts = diff_data.get('message_ts') if diff_data else None
+                # エラーなく反映できた場合のみ、差分検出時の銀行フィンガープリントをベースラインに昇格
+                if overall_success and error_count == 0:
+                    self._promote_bank_fingerprints(diff_id)
+                
+                # コミットした場合は実行対象のキーの影響件数を再集計
+                if overall_success:
+                    self._request_impact_index_refresh(refresh_keys, dedup_plan)
+                
+                # 差分データのmessage_tsでSlack通知を送信
                 try:
-                    self.slack_client.send_completion_notification(result, diff_id, approved_by, message_ts)
+                    self.slack_client.send_completion_notification(result, diff_id, approved_by, diff_data.get('message_ts'))
                 except Exception as slack_error:
                     logger.warning(f"Slack通知送信失敗（処理は成功）: {str(slack_error)}")
                 
@@ -405,7 +524,7 @@ class BankUpdater:
             except:
                 pass  # DynamoDB更新エラーは無視
             
-            # DynamoDBからmessage_tsを取得してSlack通知を送信
+            # DynamoDBからmessage_tsを取得してSlack通知を送信（取得済みの場合はキャッシュを使う）
             diff_data = self._get_diff_data(diff_id)
             message_ts = diff_data.get('message_ts') if diff_data else None
             try:
@@ -420,49 +539,51 @@ class BankUpdater:
             self.db_client.close()
     
     def _get_diff_data(self, diff_id: str) -> Optional[Dict[str, Any]]:
-        """DynamoDBから差分データを取得"""
+        """DynamoDBから差分データを取得（実行に必要な属性とキーのみ）"""
         try:
-            # まず、指定されたidのアイテムを検索（timestampが不明なため）
-            response = self.table.query(
-                KeyConditionExpression=boto3.dynamodb.conditions.Key('id').eq(diff_id),
-                ScanIndexForward=False,  # 最新のアイテムを取得
-                Limit=1
-            )
-            
-            if response.get('Items'):
-                return response['Items'][0]
-            else:
+            diff_data = self.diff_repository.get(diff_id, attributes=EXECUTION_ATTRIBUTES)
+            if not diff_data:
                 logger.warning(f"差分データが見つかりません: {diff_id}")
-                return None
+            return diff_data
         except Exception as e:
             logger.error(f"差分データ取得エラー: {str(e)}")
             return None
     
-    def _load_diffs_from_s3(self, s3_key: str) -> List[Dict[str, Any]]:
-        """S3から差分データを読み込み"""
+    def _load_diffs_from_s3(self, s3_key: str, manifest_key: Optional[str] = None) -> Tuple[int, Iterable[Dict[str, Any]]]:
+        """S3の差分データを開く（シャード形式はシャードを並行に取得、単一ファイル形式は行ごとにストリーミング）
+        
+        Returns:
+            Tuple: (差分の件数, 差分の行のイテレータ)
+        """
         try:
-            logger.info(f"S3から差分データを読み込み: s3://{S3_BUCKET_NAME}/{s3_key}")
-            
-            # S3からgzip圧縮されたデータを取得
-            response = s3.get_object(Bucket=S3_BUCKET_NAME, Key=s3_key)
-            compressed_data = response['Body'].read()
+            if manifest_key:
+                logger.info(f"S3から差分データを読み込み: s3://{S3_BUCKET_NAME}/{manifest_key}")
+                manifest = load_manifest(s3, S3_BUCKET_NAME, manifest_key)
+                logger.info(f"S3の差分データ: {manifest['counts']['total']}件 ({len(manifest['shards'])}シャード)")
+                return manifest['counts']['total'], iter_sharded_rows(s3, S3_BUCKET_NAME, manifest, DIFF_SHARD_READ_WORKERS)
             
-            # gzipを解凍
-            json_data = gzip.decompress(compressed_data).decode('utf-8')
+            logger.info(f"S3から差分データを読み込み: s3://{S3_BUCKET_NAME}/{s3_key}")
             
-            # JSONをパース
-            diffs_data = json.loads(json_data)
+            reader = open_diff_artifact(s3, S3_BUCKET_NAME, s3_key)
             
-            logger.info(f"S3から{len(diffs_data)}件の差分データを読み込みました")
-            return diffs_data
+            logger.info(f"S3の差分データ: {reader.total}件 (形式バージョン: {reader.header['schema_version']})")
+            return reader.total, reader
             
         except Exception as e:
             logger.error(f"S3からの差分データ読み込みエラー: {str(e)}")
             raise
     
-    def _restore_diffs(self, diffs_data: List[Dict[str, Any]]) -> List[BankDiff]:
-        """差分データを復元"""
-        diffs = []
+    def _load_json_from_s3(self, s3_key: str) -> Dict[str, Any]:
+        """S3からJSONを読み込み"""
+        try:
+            response = s3.get_object(Bucket=S3_BUCKET_NAME, Key=s3_key)
+            return json.loads(response['Body'].read().decode('utf-8'))
+        except Exception as e:
+            logger.error(f"S3からのJSON読み込みエラー: {s3_key}: {str(e)}")
+            raise
+    
+    def _restore_diffs(self, diffs_data: Iterable[Dict[str, Any]]) -> Iterator[BankDiff]:
+        """差分データを1件ずつ復元"""
         for diff_data in diffs_data:
             # BankDataオブジェクトを復元
             old_data = None
@@ -481,30 +602,64 @@ class BankUpdater:
                 total_accounts=diff_data.get('total_accounts', 0),
                 active_users=diff_data.get('active_users', 0)
             )
-            diffs.append(diff)
-        
-        return diffs
+            yield diff
     
-    def _update_execution_status(self, diff_id: str, result: ExecutionResult, approved_by: str = None):
-        """DynamoDBの実行状態を更新"""
+    def _promote_bank_fingerprints(self, diff_id: str):
+        """承認待ちの銀行フィンガープリントを反映済みの状態（current.json）として保存"""
+        pending_key = f"{BANK_FINGERPRINT_S3_PREFIX}pending/{diff_id}.json"
         try:
-            # まず該当するアイテムのtimestampを取得
-            diff_data = self._get_diff_data(diff_id)
-            if not diff_data:
-                logger.error(f"実行状態更新エラー: 差分データが見つかりません: {diff_id}")
-                return
-            
-            # DynamoDBテーブルは id (partition key) + timestamp (sort key) の複合キー
-            diff_timestamp = diff_data.get('timestamp')
-            if not diff_timestamp:
-                logger.error(f"実行状態更新エラー: timestampが見つかりません: {diff_id}")
+            try:
+                response = s3.get_object(Bucket=S3_BUCKET_NAME, Key=pending_key)
+            except s3.exceptions.NoSuchKey:
+                logger.info(f"銀行フィンガープリントなし（全件比較のみの運用）: {diff_id}")
                 return
-            
-            update_expression = 'SET #status = :status, executed_at = :executed_at, execution_result = :result'
-            expression_values = {
-                ':status': 'completed' if result.success else 'failed',
-                ':executed_at': datetime.now(timezone.utc).isoformat(),
-                ':result': {
+            baseline = json.loads(response['Body'].read().decode('utf-8'))
+            # 反映後のMBankの状態を記録（次回の差分検出でMBank側の変更有無を判定する）
+            baseline['mbank_checksum'] = self.db_client.get_mbank_checksum()
+            baseline['promoted_at'] = datetime.now(timezone.utc).isoformat()
+            s3.put_object(
+                Bucket=S3_BUCKET_NAME,
+                Key=f"{BANK_FINGERPRINT_S3_PREFIX}current.json",
+                Body=json.dumps(baseline, ensure_ascii=False, sort_keys=True).encode('utf-8'),
+                ContentType='application/json'
+            )
+            logger.info(f"銀行フィンガープリントを昇格: {pending_key}")
+        except Exception as e:
+            # 昇格できなくても次回はMBankチェックサムの不一致で全件比較になるだけなので処理は継続
+            logger.warning(f"銀行フィンガープリント昇格エラー: {str(e)}")
+    
+    def _request_impact_index_refresh(self, keys: Set[str], dedup_plan: Optional[Dict[str, Any]] = None):
+        """差分処理Lambdaに実行対象キー（更新・削除・重複解消）の影響インデックス更新を非同期で依頼"""
+        if not DIFF_PROCESSOR_FUNCTION_NAME:
+            return
+        keys = sorted(set(keys) | {group['key'] for group in (dedup_plan or {}).get('groups', [])})
+        if not keys:
+            return
+        try:
+            payload = {
+                "trigger": "impact_index_refresh",
+                "source": "zengin-diff-executor",
+            }
+            if len(keys) <= IMPACT_INDEX_REFRESH_MAX_KEYS:
+                payload["keys"] = keys
+            lambda_client = boto3.client('lambda')
+            lambda_client.invoke(
+                FunctionName=DIFF_PROCESSOR_FUNCTION_NAME,
+                InvocationType='Event',  # 非同期呼び出し
+                Payload=json.dumps(payload)
+            )
+            logger.info(f"影響インデックスの更新を依頼: {len(keys)}キー{'' if 'keys' in payload else '（全件を再集計）'}")
+        except Exception as e:
+            # 更新できなくても差分処理Lambdaは古いスナップショットを使わずDBで集計するため処理は継続
+            logger.warning(f"影響インデックス更新依頼エラー: {str(e)}")
+    
+    def _update_execution_status(self, diff_id: str, result: ExecutionResult, approved_by: str = None):
+        """DynamoDBの実行状態を更新（キーは取得済みの差分データから）"""
+        try:
+            values = {
+                'status': 'completed' if result.success else 'failed',
+                'executed_at': datetime.now(timezone.utc).isoformat(),
+                'execution_result': {
                     'success': result.success,
                     'processed_count': result.processed_count,
                     'error_count': result.error_count,
@@ -513,15 +668,10 @@ class BankUpdater:
             }
             
             if approved_by:
-                update_expression += ', executed_by = :executed_by'
-                expression_values[':executed_by'] = approved_by
-            
-            self.table.update_item(
-                Key={'id': diff_id, 'timestamp': diff_timestamp},
-                UpdateExpression=update_expression,
-                ExpressionAttributeNames={'#status': 'status'},
-                ExpressionAttributeValues=expression_values
-            )
+                values['executed_by'] = approved_by
+            
+            if not self.diff_repository.update(diff_id, values):
+                logger.error(f"実行状態更新エラー: 差分データが見つかりません: {diff_id}")
             
         except Exception as e:
             logger.error(f"実行状態更新エラー: {str(e)}")
@@ -540,8 +690,10 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             raise ValueError("diff_idが指定されていません")
         
         # 銀行データ更新を実行
+        DIFF_REPOSITORY.begin_invocation()
         updater = BankUpdater()
         result = updater.execute_update(diff_id, approved_by)
+        logger.info(f"差分テーブルの消費キャパシティ: {json.dumps(DIFF_REPOSITORY.consumed_capacity())}")
         
         logger.info(f"差分実行処理完了: success={result.success}, processed={result.processed_count}")
         
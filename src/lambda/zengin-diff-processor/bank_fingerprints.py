@@ -0,0 +1,141 @@
+"""
+銀行単位のフィンガープリントによる差分検出範囲の絞り込み
+
+zengin-code側の正規化済みデータから銀行ごとのフィンガープリントを計算し、
+前回承認・実行済みの状態（ベースライン）と比較して変更のあった銀行だけを差分検出の対象にする。
+
+ベースラインはS3に保存する:
+    bank-fingerprints/{env}/current.json            DBに反映済みの状態
+    bank-fingerprints/{env}/pending/{diff_id}.json  承認待ちの差分に対応する状態（実行成功時にexecutorが current.json へ昇格）
+
+MBank側の変更（ベースライン保存時のMBankチェックサムとの不一致）、比較ルールの変更、
+前回の全件比較から FULL_RECONCILIATION_INTERVAL_DAYS 日以上経過した場合は全件比較を行う。
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Optional, Set
+
+BASELINE_VERSION = 1
+FIELD_SEPARATOR = '\x1f'
+ROW_SEPARATOR = '\x1e'
+
+
+def compute_bank_fingerprints(bank_data_list: Iterable[Any]) -> Dict[str, str]:
+    """銀行コードごとに正規化済みの全行（支店コード順）のハッシュを計算"""
+    fingerprints: Dict[str, str] = {}
+    rows_by_bank: Dict[str, list] = {}
+    for data in bank_data_list:
+        rows_by_bank.setdefault(data.swift_code, []).append((
+            data.branch_code, data.bank_name, data.bank_name_kana, data.branch_name, data.branch_name_kana
+        ))
+    for swift_code, rows in rows_by_bank.items():
+        hasher = hashlib.sha256()
+        for row in sorted(rows, key=lambda r: r[0] or ''):
+            hasher.update(FIELD_SEPARATOR.join('' if v is None else str(v) for v in row).encode('utf-8'))
+            hasher.update(ROW_SEPARATOR.encode('utf-8'))
+        fingerprints[swift_code] = hasher.hexdigest()[:32]
+    return fingerprints
+
+
+def changed_bank_codes(previous: Dict[str, str], current: Dict[str, str]) -> Set[str]:
+    """追加・削除・内容が変わった銀行コード"""
+    return {code for code in previous.keys() | current.keys() if previous.get(code) != current.get(code)}
+
+
+def build_scope(components: Dict[str, Any]) -> str:
+    """比較ルール（正規化・接尾辞グループなど）のハッシュ（変わった場合は全件比較）"""
+    return hashlib.sha256(json.dumps(components, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class BankFingerprintStore:
+    """S3上のベースライン（current.json / pending/{diff_id}.json）"""
+
+    def __init__(self, s3_client, bucket: str, prefix: str):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    @property
+    def current_key(self) -> str:
+        return f"{self.prefix}current.json"
+
+    def pending_key(self, diff_id: str) -> str:
+        return f"{self.prefix}pending/{diff_id}.json"
+
+    def load_current(self) -> Optional[Dict[str, Any]]:
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=self.current_key)
+        except self.s3.exceptions.NoSuchKey:
+            return None
+        baseline = json.loads(response['Body'].read().decode('utf-8'))
+        if baseline.get('version') != BASELINE_VERSION:
+            return None
+        return baseline
+
+    def save_current(self, baseline: Dict[str, Any]) -> str:
+        return self._put(self.current_key, baseline)
+
+    def save_pending(self, diff_id: str, baseline: Dict[str, Any]) -> str:
+        return self._put(self.pending_key(diff_id), dict(baseline, diff_id=diff_id))
+
+    def _put(self, key: str, baseline: Dict[str, Any]) -> str:
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=key,
+            Body=json.dumps(baseline, ensure_ascii=False, sort_keys=True).encode('utf-8'),
+            ContentType='application/json'
+        )
+        return key
+
+
+def plan_scope(
+    baseline: Optional[Dict[str, Any]],
+    fingerprints: Dict[str, str],
+    scope: str,
+    mbank_checksum: Optional[Dict[str, Any]],
+    full_interval_days: int,
+    force_full: bool = False,
+    now: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """差分検出の範囲を決定
+
+    Returns:
+        Dict: bank_codes（None は全件比較）、reason、保存用の新しいベースライン
+    """
+    now = now or datetime.now(timezone.utc)
+    reason = None
+    if force_full:
+        reason = 'force'
+    elif baseline is None:
+        reason = 'no_baseline'
+    elif baseline.get('scope') != scope:
+        reason = 'scope_changed'
+    elif mbank_checksum is None or baseline.get('mbank_checksum') != mbank_checksum:
+        reason = 'mbank_changed'
+    else:
+        full_checked_at = baseline.get('full_checked_at')
+        if not full_checked_at or now - datetime.fromisoformat(full_checked_at) >= timedelta(days=full_interval_days):
+            reason = 'full_reconciliation'
+
+    if reason:
+        bank_codes = None
+        full_checked_at = now.isoformat()
+    else:
+        bank_codes = changed_bank_codes(baseline['banks'], fingerprints)
+        reason = 'incremental'
+        full_checked_at = baseline['full_checked_at']
+
+    return {
+        'bank_codes': bank_codes,
+        'reason': reason,
+        'baseline': {
+            'version': BASELINE_VERSION,
+            'scope': scope,
+            'banks': fingerprints,
+            'mbank_checksum': mbank_checksum,
+            'full_checked_at': full_checked_at,
+            'created_at': now.isoformat(),
+            'mode': 'full' if bank_codes is None else 'incremental',
+        },
+    }
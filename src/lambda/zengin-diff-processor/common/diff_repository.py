@@ -0,0 +1,196 @@
+"""
+差分テーブル（zengin-data-diff-{env}）の読み書き
+
+- 読み込んだアイテムは呼び出し単位でキャッシュし、同じ差分を何度も Query しない
+  （キャッシュ済みの属性で足りる場合はDynamoDBにアクセスしない）
+- attributes を指定すると必要な属性だけを ProjectionExpression で取得する
+- 読み込み結果には常にキー（id + timestamp）を含め、キーが分かっている差分の更新・再取得は GetItem / UpdateItem で行う
+- 消費したキャパシティユニットを読み込み・書き込み別に集計する（consumed_capacity）
+
+Lambdaの呼び出しごとに begin_invocation() でキャッシュと集計をリセットする。
+"""
+import boto3.dynamodb.conditions
+from typing import Any, Dict, Iterable, Iterator, Optional, Set
+
+KEY_ATTRIBUTES = ('id', 'timestamp')
+STATUS_INDEX = 'StatusIndex'
+MESSAGE_TS_INDEX = 'MessageTsIndex'
+
+
+def _projection(attributes: Optional[Iterable[str]]) -> Dict[str, Any]:
+    """ProjectionExpression と属性名のプレースホルダー（キーは常に含める）"""
+    if attributes is None:
+        return {}
+    names = list(KEY_ATTRIBUTES) + [name for name in attributes if name not in KEY_ATTRIBUTES]
+    placeholders = {f"#p{i}": name for i, name in enumerate(names)}
+    return {
+        'ProjectionExpression': ', '.join(placeholders),
+        'ExpressionAttributeNames': placeholders,
+    }
+
+
+class DiffRepository:
+    """差分テーブルのアクセス（呼び出し単位のアイテムキャッシュ付き）"""
+
+    def __init__(self, dynamodb_resource, table_name: str):
+        self.dynamodb = dynamodb_resource
+        self.table_name = table_name
+        self._table = None
+        self.begin_invocation()
+
+    @property
+    def table(self):
+        if self._table is None:
+            self._table = self.dynamodb.Table(self.table_name)
+        return self._table
+
+    def begin_invocation(self):
+        """キャッシュとキャパシティの集計をリセット"""
+        # diff_id → {'item': 取得済みの属性, 'attributes': 取得済みの属性名（None は全属性）}
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._stats = {'read_capacity_units': 0.0, 'write_capacity_units': 0.0, 'requests': 0, 'cache_hits': 0}
+
+    def consumed_capacity(self) -> Dict[str, Any]:
+        """この呼び出しで消費したキャパシティユニットとリクエスト数"""
+        return dict(self._stats)
+
+    def get(self, diff_id: str, attributes: Optional[Iterable[str]] = None,
+            consistent: bool = False) -> Optional[Dict[str, Any]]:
+        """差分を取得（attributes 指定時はその属性とキーのみ。キャッシュで足りる場合は再取得しない）"""
+        attributes = None if attributes is None else set(attributes)
+        cached = self._cache.get(diff_id)
+        if cached and (cached['attributes'] is None or (attributes is not None and attributes <= cached['attributes'])):
+            self._stats['cache_hits'] += 1
+            return dict(cached['item'])
+
+        projection = _projection(attributes)
+        if cached:
+            # キーが分かっているため GetItem で取得
+            response = self._call(
+                'read', self.table.get_item,
+                Key=self.key_of(cached['item']), ConsistentRead=consistent, **projection
+            )
+            item = response.get('Item')
+        else:
+            # timestamp が不明なため id で最新のアイテムを取得
+            response = self._call(
+                'read', self.table.query,
+                KeyConditionExpression=boto3.dynamodb.conditions.Key('id').eq(diff_id),
+                ScanIndexForward=False,
+                Limit=1,
+                ConsistentRead=consistent,
+                **projection
+            )
+            items = response.get('Items', [])
+            item = items[0] if items else None
+
+        if item is None:
+            return None
+        return self._remember(diff_id, item, attributes)
+
+    def key(self, diff_id: str) -> Optional[Dict[str, str]]:
+        """差分のキー（id + timestamp）"""
+        item = self.get(diff_id, attributes=())
+        return self.key_of(item) if item else None
+
+    @staticmethod
+    def key_of(item: Dict[str, Any]) -> Dict[str, str]:
+        return {name: item[name] for name in KEY_ATTRIBUTES}
+
+    def find_by_message_ts(self, message_ts: str, attributes: Optional[Iterable[str]] = None,
+                           consistent: bool = True) -> Optional[Dict[str, Any]]:
+        """Slackメッセージのタイムスタンプから差分を取得（MessageTsIndex でキーを取得し、本体は GetItem）
+
+        インデックスは結果整合性のため、承認状態などは既定で強い整合性の読み込みで本体から取得する。
+        """
+        response = self._call(
+            'read', self.table.query,
+            IndexName=MESSAGE_TS_INDEX,
+            KeyConditionExpression=boto3.dynamodb.conditions.Key('message_ts').eq(message_ts),
+            Limit=1,
+            **_projection(())
+        )
+        items = response.get('Items', [])
+        if not items:
+            return None
+        key = self.key_of(items[0])
+        self._cache.setdefault(key['id'], {'item': key, 'attributes': set()})
+        return self.get(key['id'], attributes=attributes, consistent=consistent)
+
+    def query_by_status(self, status: str, since: Optional[str] = None, attributes: Optional[Iterable[str]] = None,
+                        filter_expression=None, newest_first: bool = True,
+                        page_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """StatusIndex から状態ごとの差分を取得（since 指定時はその時刻より後に作成されたもの）
+
+        インデックスは結果整合性のため、結果はキャッシュしない。
+        """
+        key_condition = boto3.dynamodb.conditions.Key('status').eq(status)
+        if since:
+            key_condition = key_condition & boto3.dynamodb.conditions.Key('timestamp').gt(since)
+        query_args = {
+            'IndexName': STATUS_INDEX,
+            'KeyConditionExpression': key_condition,
+            'ScanIndexForward': not newest_first,
+            **_projection(attributes),
+        }
+        if filter_expression is not None:
+            query_args['FilterExpression'] = filter_expression
+        if page_size:
+            query_args['Limit'] = page_size
+        while True:
+            response = self._call('read', self.table.query, **query_args)
+            yield from response.get('Items', [])
+            if 'LastEvaluatedKey' not in response:
+                return
+            query_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def put(self, item: Dict[str, Any]):
+        """差分を保存（保存したアイテムをキャッシュ）"""
+        self._call('write', self.table.put_item, Item=item)
+        self._cache[item['id']] = {'item': dict(item), 'attributes': None}
+
+    def update(self, diff_id: str, values: Dict[str, Any], key: Optional[Dict[str, str]] = None) -> bool:
+        """差分の属性を更新（キーはキャッシュから取得し、不明な場合のみ Query）
+
+        Returns:
+            bool: 更新したか（差分が見つからない場合は False）
+        """
+        key = key or self.key(diff_id)
+        if not key:
+            return False
+        names = {f"#u{i}": name for i, name in enumerate(values)}
+        self._call(
+            'write', self.table.update_item,
+            Key=key,
+            UpdateExpression='SET ' + ', '.join(f"{placeholder} = :u{i}" for i, placeholder in enumerate(names)),
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues={f":u{i}": value for i, value in enumerate(values.values())}
+        )
+        cached = self._cache.get(diff_id)
+        if cached:
+            cached['item'].update(values)
+            if cached['attributes'] is not None:
+                cached['attributes'] |= set(values)
+        else:
+            self._cache[diff_id] = {'item': dict(key, **values), 'attributes': set(values)}
+        return True
+
+    def _remember(self, diff_id: str, item: Dict[str, Any], attributes: Optional[Set[str]]) -> Dict[str, Any]:
+        cached = self._cache.get(diff_id)
+        if attributes is None or not cached:
+            self._cache[diff_id] = {'item': dict(item), 'attributes': attributes}
+        else:
+            # 取得した属性のうち存在しないものはキャッシュからも除く
+            for name in attributes - set(item):
+                cached['item'].pop(name, None)
+            cached['item'].update(item)
+            if cached['attributes'] is not None:
+                cached['attributes'] |= attributes
+        return dict(self._cache[diff_id]['item'])
+
+    def _call(self, kind: str, operation, **kwargs) -> Dict[str, Any]:
+        response = operation(ReturnConsumedCapacity='TOTAL', **kwargs)
+        self._stats['requests'] += 1
+        capacity = response.get('ConsumedCapacity') or {}
+        self._stats[f"{kind}_capacity_units"] += float(capacity.get('CapacityUnits', 0))
+        return response
@@ -0,0 +1,136 @@
+"""
+差分判定用の正規化済み比較キー
+
+MBankの行とzengin-codeの行をそれぞれ1回だけ ComparisonKey に変換し、
+差分判定はタプルの等価比較で行う。支店名の接尾辞（支店/支所/出張所 など）は
+同義グループごとにまとめた SuffixMatcher で分離し、接尾辞が同じグループに属するか
+どちらか一方に接尾辞がない場合は同一とみなす。
+"""
+import os
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional, Sequence, Tuple
+
+import kana_normalizer
+
+# 比較対象フィールド（BankDataのフィールド名）
+COMPARED_FIELDS = ('bank_name', 'bank_name_kana', 'branch_name', 'branch_name_kana')
+
+# 支店名の同義接尾辞グループ（環境変数 BRANCH_SUFFIX_GROUPS で上書き可能）
+# 形式: グループを ';'、グループ内の接尾辞を ',' で区切る 例: "支店,支所,出張所;営業部,営業所"
+DEFAULT_SUFFIX_GROUPS: Tuple[Tuple[str, ...], ...] = (('支店', '支所', '出張所'),)
+SUFFIX_GROUPS_ENV = 'BRANCH_SUFFIX_GROUPS'
+
+
+class ComparisonKey(NamedTuple):
+    """正規化済みの比較キー（branch_suffix_class が None の場合は接尾辞なし）"""
+    bank_name: str
+    bank_name_kana: str
+    branch_base: str
+    branch_suffix_class: Optional[FrozenSet[str]]
+    branch_name_kana: str
+
+
+def parse_suffix_groups(value: Optional[str]) -> Tuple[Tuple[str, ...], ...]:
+    """環境変数の文字列から接尾辞グループを生成（空の場合は既定値）"""
+    if not value or not value.strip():
+        return DEFAULT_SUFFIX_GROUPS
+    groups = []
+    for group in value.split(';'):
+        suffixes = tuple(s.strip() for s in group.split(',') if s.strip())
+        if suffixes:
+            groups.append(suffixes)
+    return tuple(groups) or DEFAULT_SUFFIX_GROUPS
+
+
+class SuffixMatcher:
+    """支店名の接尾辞を分離し、同義グループ（frozenset）を返す"""
+
+    def __init__(self, suffix_groups: Sequence[Sequence[str]] = DEFAULT_SUFFIX_GROUPS):
+        # 接尾辞を共有するグループは1つの同値類にまとめる
+        classes: List[set] = []
+        for group in suffix_groups:
+            merged = set(group)
+            for existing in [c for c in classes if c & merged]:
+                merged |= existing
+                classes.remove(existing)
+            classes.append(merged)
+
+        self.suffix_groups = tuple(tuple(group) for group in suffix_groups)
+        self._class_of: Dict[str, FrozenSet[str]] = {}
+        for members in classes:
+            frozen = frozenset(members)
+            for suffix in members:
+                self._class_of[suffix] = frozen
+        # 長い接尾辞から順に判定する（例: "出張所" を "所" より優先）
+        self._suffixes = sorted(self._class_of, key=len, reverse=True)
+        self._cache: Dict[str, Tuple[str, Optional[FrozenSet[str]]]] = {}
+
+    @classmethod
+    def from_env(cls) -> 'SuffixMatcher':
+        return cls(parse_suffix_groups(os.getenv(SUFFIX_GROUPS_ENV)))
+
+    def split(self, name: str) -> Tuple[str, Optional[FrozenSet[str]]]:
+        """(接尾辞を除いた名称, 接尾辞の同義グループ) を返す"""
+        cached = self._cache.get(name)
+        if cached is not None:
+            return cached
+        result = (name.strip(), None)
+        for suffix in self._suffixes:
+            if name.endswith(suffix):
+                result = (name[:-len(suffix)].strip(), self._class_of[suffix])
+                break
+        self._cache[name] = result
+        return result
+
+
+class ComparisonKeyBuilder:
+    """行データから ComparisonKey を生成（文字列単位の変換結果を再利用）"""
+
+    def __init__(self, suffix_matcher: Optional[SuffixMatcher] = None):
+        self.suffix_matcher = suffix_matcher or SuffixMatcher()
+        self._kana_cache: Dict[str, str] = {}
+
+    def _kana(self, value: str) -> str:
+        converted = self._kana_cache.get(value)
+        if converted is None:
+            converted = kana_normalizer.to_hankaku(value).strip()
+            self._kana_cache[value] = converted
+        return converted
+
+    def build(self, bank_name: Any, bank_name_kana: Any, branch_name: Any, branch_name_kana: Any) -> ComparisonKey:
+        branch_base, branch_suffix_class = self.suffix_matcher.split('' if branch_name is None else str(branch_name))
+        return ComparisonKey(
+            bank_name='' if bank_name is None else str(bank_name).strip(),
+            bank_name_kana=self._kana('' if bank_name_kana is None else str(bank_name_kana)),
+            branch_base=branch_base,
+            branch_suffix_class=branch_suffix_class,
+            branch_name_kana=self._kana('' if branch_name_kana is None else str(branch_name_kana)),
+        )
+
+    def from_row(self, row: Dict[str, Any]) -> ComparisonKey:
+        """MBankの行（dict）から生成"""
+        return self.build(row.get('bank_name'), row.get('bank_name_kana'),
+                          row.get('branch_name'), row.get('branch_name_kana'))
+
+    def from_bank_data(self, data: Any) -> ComparisonKey:
+        """BankData から生成"""
+        return self.build(data.bank_name, data.bank_name_kana, data.branch_name, data.branch_name_kana)
+
+
+def changed_fields(current: ComparisonKey, new: ComparisonKey) -> List[str]:
+    """差分のあるフィールド名（COMPARED_FIELDS の順）を返す"""
+    if current == new:
+        return []
+    fields = []
+    if current.bank_name != new.bank_name:
+        fields.append('bank_name')
+    if current.bank_name_kana != new.bank_name_kana:
+        fields.append('bank_name_kana')
+    if current.branch_base != new.branch_base or (
+        current.branch_suffix_class is not None
+        and new.branch_suffix_class is not None
+        and current.branch_suffix_class != new.branch_suffix_class
+    ):
+        fields.append('branch_name')
+    if current.branch_name_kana != new.branch_name_kana:
+        fields.append('branch_name_kana')
+    return fields
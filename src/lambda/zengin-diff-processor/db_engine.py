@@ -0,0 +1,186 @@
+"""
+SQLAlchemyエンジンとデータベース認証情報のウォームコンテナ間での再利用
+
+モジュールレベルで1つの EngineManager を保持し、同じコンテナの後続の呼び出しでは
+Secrets Managerの取得・create_engine・TLSハンドシェイクを繰り返さない。
+
+- 認証情報は credentials_check_seconds ごとにシークレットのバージョンを確認し、ローテーションされた場合のみエンジンを作り直す
+- 接続時に認証エラーになった場合は認証情報を取り直して1回だけ再接続する
+- プールモード（DB_POOL_MODE）
+    queue: QueuePool（pool_pre_ping で取り出し時に軽量に検証、pool_recycle で古い接続を破棄）
+    null:  NullPool（呼び出しをまたいで接続を保持しない）
+    proxy: NullPool でRDS Proxyのエンドポイント（シークレットの proxy_host）に接続（プールはProxy側に任せる）
+- フォークした子プロセスでは親の接続を使わないようにプールを作り直す
+- host_keys で接続先のキーを指定できる（リードレプリカ用のマネージャーはシークレットの replica_host など）
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import NullPool
+
+POOL_MODES = ('queue', 'null', 'proxy')
+PRIMARY_HOST_KEYS = ('host', 'endpoint')
+# PostgreSQLの認証エラー（invalid_password / invalid_authorization_specification）
+AUTH_ERROR_CODES = ('28P01', '28000')
+
+
+def is_auth_error(error: Exception) -> bool:
+    """接続時の認証エラーか"""
+    orig = getattr(error, 'orig', error)
+    if getattr(orig, 'pgcode', None) in AUTH_ERROR_CODES:
+        return True
+    return 'authentication failed' in str(orig)
+
+
+class EngineManager:
+    """ウォームコンテナで再利用するエンジンと認証情報"""
+
+    def __init__(
+        self,
+        load_secret: Callable[[], Tuple[Dict[str, Any], Optional[str]]],
+        pool_mode: str = 'queue',
+        pool_size: int = 5,
+        pool_recycle: int = 1800,
+        credentials_check_seconds: int = 900,
+        engine_factory: Callable[..., Any] = create_engine,
+        host_keys: Tuple[str, ...] = PRIMARY_HOST_KEYS,
+    ):
+        if pool_mode not in POOL_MODES:
+            raise ValueError(f"DB_POOL_MODE は {', '.join(POOL_MODES)} のいずれか: {pool_mode}")
+        self.load_secret = load_secret
+        self.pool_mode = pool_mode
+        self.pool_size = pool_size
+        self.pool_recycle = pool_recycle
+        self.credentials_check_seconds = credentials_check_seconds
+        self.engine_factory = engine_factory
+        self.host_keys = host_keys
+        self._lock = threading.Lock()
+        self._credentials: Optional[Dict[str, Any]] = None
+        self._secret_version: Optional[str] = None
+        self._checked_at = 0.0
+        self._engine = None
+        self._stats = self._empty_stats(engine_reused=False)
+
+    @staticmethod
+    def _empty_stats(engine_reused: bool) -> Dict[str, Any]:
+        return {
+            'engine_reused': engine_reused,
+            'credentials_refreshed': False,
+            'new_connections': 0,
+            'checkouts': 0,
+        }
+
+    def begin_invocation(self):
+        """呼び出しごとの再利用状況の集計を開始"""
+        self._stats = self._empty_stats(engine_reused=self._engine is not None)
+
+    def invocation_stats(self) -> Dict[str, Any]:
+        """この呼び出しでエンジン・接続を再利用したか"""
+        stats = dict(self._stats)
+        stats['pool_mode'] = self.pool_mode
+        stats['connection_reused'] = stats['checkouts'] > stats['new_connections']
+        return stats
+
+    def get_credentials(self) -> Dict[str, Any]:
+        """認証情報（確認間隔を過ぎていればシークレットのバージョンを確認）"""
+        with self._lock:
+            self._refresh_credentials_locked()
+            return self._credentials
+
+    def host(self, creds: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """接続先ホスト（host_keys の最初に設定されているもの）"""
+        creds = creds if creds is not None else self.get_credentials()
+        return next((creds[key] for key in self.host_keys if creds.get(key)), None)
+
+    def get_engine(self):
+        with self._lock:
+            self._refresh_credentials_locked()
+            if self._engine is None:
+                self._engine = self._create_engine(self._credentials)
+            return self._engine
+
+    def invalidate(self):
+        """認証情報とエンジンを破棄（次回の取得で作り直す）"""
+        with self._lock:
+            self._dispose_locked()
+            self._credentials = None
+            self._secret_version = None
+
+    @contextmanager
+    def connect(self):
+        """接続を取得（認証エラーの場合は認証情報を取り直して1回だけ再接続）"""
+        try:
+            conn = self.get_engine().connect()
+        except OperationalError as e:
+            if not is_auth_error(e):
+                raise
+            self.invalidate()
+            conn = self.get_engine().connect()
+        with conn:
+            yield conn
+
+    def reset_after_fork(self):
+        """フォーク後の子プロセスで親の接続を閉じずにプールを作り直す"""
+        self._lock = threading.Lock()
+        if self._engine is not None:
+            self._engine.dispose(close=False)
+
+    def _refresh_credentials_locked(self):
+        now = time.monotonic()
+        if self._credentials is not None and now - self._checked_at < self.credentials_check_seconds:
+            return
+        credentials, version = self.load_secret()
+        self._checked_at = now
+        if self._credentials is not None:
+            # バージョンが取れない場合は内容で比較する
+            unchanged = version == self._secret_version if version is not None else credentials == self._credentials
+            if unchanged:
+                return
+        self._dispose_locked()
+        self._credentials = credentials
+        self._secret_version = version
+        self._stats['credentials_refreshed'] = True
+
+    def _dispose_locked(self):
+        if self._engine is not None:
+            self._engine.dispose()
+            self._engine = None
+
+    def _create_engine(self, creds: Dict[str, Any]):
+        host = self.host(creds)
+        if self.pool_mode == 'proxy':
+            host = os.getenv('DB_PROXY_HOST') or creds.get("proxy_host") or host
+        port = creds.get("port", 5432)
+        dbname = creds.get("name") or creds.get("dbname") or creds.get("database")
+        user = creds.get("username") or creds.get("user")
+        password = creds.get("password") or creds.get("secret")
+
+        # URLエンコードを行わず、connect_argsで直接渡す
+        db_url = f"postgresql+psycopg2://{host}:{port}/{dbname}"
+        if self.pool_mode == 'queue':
+            pool_args = {'pool_pre_ping': True, 'pool_size': self.pool_size, 'pool_recycle': self.pool_recycle}
+        else:
+            pool_args = {'poolclass': NullPool}
+        engine = self.engine_factory(
+            db_url,
+            connect_args={
+                "user": user,
+                "password": password,
+                "sslmode": "require"
+            },
+            **pool_args
+        )
+        event.listen(engine, 'connect', self._on_connect)
+        event.listen(engine, 'checkout', self._on_checkout)
+        return engine
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        self._stats['new_connections'] += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self._stats['checkouts'] += 1
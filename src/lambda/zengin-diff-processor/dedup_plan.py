@@ -0,0 +1,81 @@
+"""
+MBankの重複行 (swift_code, branch_code) の解消計画
+
+重複キーの検出は PostgreSQL 側の GROUP BY ... HAVING count(*) > 1 で行い、該当する行だけを受け取る。
+重複グループごとに残す行（keep_id）と論理削除する行（delete_ids）を次の優先順で決める。
+
+1. zengin-codeの最新データと比較キーが一致する行（matches_zengin）
+2. updated_at が最も新しい行（latest_updated）
+3. id が最小の行（lowest_id）
+
+計画はJSONとしてS3に保存し、差分の承認時にexecutorが一括で論理削除する。
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from comparison_keys import ComparisonKeyBuilder, changed_fields
+
+PLAN_VERSION = 1
+
+# get_mbank_duplicates が返す行のカラム順
+DUPLICATE_COLUMNS = (
+    'id', 'swift_code', 'bank_name', 'bank_name_kana', 'branch_code', 'branch_name', 'branch_name_kana', 'updated_at'
+)
+
+
+def _choose_keep_row(rows: List[Dict[str, Any]], new_item: Optional[Any], key_builder: ComparisonKeyBuilder):
+    """(残す行, 理由) を返す"""
+    if new_item is not None:
+        new_key = key_builder.from_bank_data(new_item)
+        matching = [row for row in rows if not changed_fields(key_builder.from_row(row), new_key)]
+        if matching:
+            return min(matching, key=lambda row: row['id']), 'matches_zengin'
+
+    updated = [row for row in rows if row.get('updated_at')]
+    if updated:
+        latest = max(row['updated_at'] for row in updated)
+        candidates = [row for row in updated if row['updated_at'] == latest]
+        if len(candidates) < len(rows):
+            return min(candidates, key=lambda row: row['id']), 'latest_updated'
+
+    return min(rows, key=lambda row: row['id']), 'lowest_id'
+
+
+def build_dedup_plan(
+    duplicate_rows: List[tuple],
+    latest_dict: Dict[str, Any],
+    key_builder: ComparisonKeyBuilder,
+    now: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """重複行（DUPLICATE_COLUMNS順のタプル）から解消計画を生成"""
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for values in duplicate_rows:
+        row = dict(zip(DUPLICATE_COLUMNS, values))
+        groups.setdefault(f"{row['swift_code']}-{row['branch_code']}", []).append(row)
+
+    plan_groups = []
+    for key, rows in groups.items():
+        if len(rows) < 2:
+            continue
+        keep_row, reason = _choose_keep_row(rows, latest_dict.get(key), key_builder)
+        plan_groups.append({
+            'key': key,
+            'swift_code': keep_row['swift_code'],
+            'branch_code': keep_row['branch_code'],
+            'keep_id': keep_row['id'],
+            'delete_ids': sorted(row['id'] for row in rows if row['id'] != keep_row['id']),
+            'reason': reason,
+            'rows': [
+                dict(row, updated_at=row['updated_at'].isoformat() if hasattr(row['updated_at'], 'isoformat') else row['updated_at'])
+                for row in sorted(rows, key=lambda r: r['id'])
+            ],
+        })
+
+    plan_groups.sort(key=lambda group: (group['swift_code'], group['branch_code']))
+    return {
+        'version': PLAN_VERSION,
+        'generated_at': (now or datetime.now(timezone.utc)).isoformat(),
+        'total_groups': len(plan_groups),
+        'total_delete_rows': sum(len(group['delete_ids']) for group in plan_groups),
+        'groups': plan_groups,
+    }
@@ -0,0 +1,41 @@
+"""
+差分内容のハッシュ（内容アドレス）
+
+差分リストと重複解消計画を正規化したJSONの sha256 を差分の内容ハッシュとする。
+UserBankAccountの影響件数（total_accounts / active_users）は実行日によって変わるが
+承認対象の変更内容ではないため含めない。差分の並びはキーと種別でソートする。
+"""
+import hashlib
+import json
+from dataclasses import asdict, is_dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+# 内容ハッシュに含めないフィールド
+VOLATILE_FIELDS = ('total_accounts', 'active_users')
+
+
+def _canonical_diff(diff: Any) -> Dict[str, Any]:
+    data = asdict(diff) if is_dataclass(diff) else dict(diff)
+    for name in VOLATILE_FIELDS:
+        data.pop(name, None)
+    return data
+
+
+def canonicalize(diffs: Iterable[Any], dedup_plan: Optional[Dict[str, Any]] = None) -> bytes:
+    """差分リスト（と重複解消計画）を正規化したJSON"""
+    canonical_diffs: List[Dict[str, Any]] = sorted(
+        (_canonical_diff(diff) for diff in diffs),
+        key=lambda d: (d['key'], d['action'])
+    )
+    payload: Dict[str, Any] = {'diffs': canonical_diffs}
+    if dedup_plan:
+        payload['dedup_plan'] = [
+            {'key': group['key'], 'keep_id': group['keep_id'], 'delete_ids': sorted(group['delete_ids'])}
+            for group in sorted(dedup_plan['groups'], key=lambda g: g['key'])
+        ]
+    return json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8')
+
+
+def content_hash(diffs: Iterable[Any], dedup_plan: Optional[Dict[str, Any]] = None) -> str:
+    """差分の内容ハッシュ（sha256の16進文字列）"""
+    return hashlib.sha256(canonicalize(diffs, dedup_plan)).hexdigest()
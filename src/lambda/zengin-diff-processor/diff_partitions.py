@@ -0,0 +1,95 @@
+"""
+swift_code の範囲による差分検出の分割と並列実行
+
+zengin-codeのデータ（キー順）を行数がほぼ均等になるよう swift_code の境界で分割し、
+各範囲をワーカープロセスで処理する。Lambdaには /dev/shm がなく multiprocessing.Pool / Queue
+（セマフォを使用）が動作しないため、multiprocessing.Process と Pipe で結果を受け取る。
+結果は範囲の順に返すので、結合した結果は逐次処理と同じ並びになる。
+"""
+import multiprocessing
+import traceback
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence
+
+
+class SwiftCodePartition(NamedTuple):
+    """swift_code の半開区間 [lower, upper) とその範囲のzengin-codeデータ（None は上限・下限なし）"""
+    lower: Optional[str]
+    upper: Optional[str]
+    items: Sequence[Any]
+
+
+class PartitionWorkerError(RuntimeError):
+    """ワーカープロセスでの処理失敗"""
+
+
+def partition_by_swift_code(items: Sequence[Any], partitions: int) -> List[SwiftCodePartition]:
+    """キー順のデータを swift_code の境界で最大 partitions 個に分割
+
+    同じ swift_code の行は必ず同じ範囲に入る。最初の範囲は下限なし、最後の範囲は上限なしとし、
+    zengin-codeにない swift_code のMBank行（削除候補）もいずれかの範囲に含まれるようにする。
+    """
+    partitions = max(1, min(partitions, len(items) or 1))
+    target = len(items) / partitions
+    bounds = []  # 各範囲の先頭インデックス（0 を除く）
+    index = 1
+    while index < len(items) and len(bounds) < partitions - 1:
+        if items[index].swift_code != items[index - 1].swift_code and index >= target * (len(bounds) + 1):
+            bounds.append(index)
+        index += 1
+
+    result = []
+    starts = [0] + bounds
+    ends = bounds + [len(items)]
+    for number, (start, end) in enumerate(zip(starts, ends)):
+        lower = items[start].swift_code if number > 0 else None
+        upper = items[end].swift_code if end < len(items) else None
+        result.append(SwiftCodePartition(lower, upper, items[start:end]))
+    return result
+
+
+def _run_worker(target: Callable[[SwiftCodePartition], Any], partition: SwiftCodePartition, conn) -> None:
+    try:
+        conn.send(('ok', target(partition)))
+    except Exception as e:
+        conn.send(('error', f"{type(e).__name__}: {str(e)}\n{traceback.format_exc()}"))
+    finally:
+        conn.close()
+
+
+def run_partitions(target: Callable[[SwiftCodePartition], Any], partitions: Sequence[SwiftCodePartition]) -> List[Any]:
+    """各範囲を別プロセスで処理し、結果を範囲の順に返す
+
+    ワーカーはforkで起動するため、target とデータは pickle されずに引き継がれる（戻り値のみ pickle される）。
+    """
+    context = multiprocessing.get_context('fork')
+    workers = []
+    for partition in partitions:
+        parent_conn, child_conn = context.Pipe(duplex=False)
+        process = context.Process(target=_run_worker, args=(target, partition, child_conn))
+        process.start()
+        child_conn.close()
+        workers.append((partition, process, parent_conn))
+
+    results = []
+    errors = []
+    # Pipeのバッファが一杯になるとワーカーが終了できないため、join の前に受信する
+    for partition, process, conn in workers:
+        try:
+            status, payload = conn.recv()
+        except EOFError:
+            status, payload = 'error', 'ワーカーが結果を返さずに終了しました'
+        finally:
+            conn.close()
+        if status == 'ok':
+            results.append(payload)
+        else:
+            errors.append(f"[{partition.lower}, {partition.upper}) {payload}")
+
+    for _, process, _ in workers:
+        process.join()
+        if process.exitcode not in (0, None) and not errors:
+            errors.append(f"ワーカーが異常終了しました: exitcode={process.exitcode}")
+
+    if errors:
+        raise PartitionWorkerError("; ".join(errors))
+    return results
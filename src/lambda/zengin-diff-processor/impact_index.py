@@ -0,0 +1,124 @@
+"""
+UserBankAccountの影響件数スナップショット（影響インデックス）
+
+(bank_swift_code, branch_code) ごとの有効な口座数と稼働ユーザー数をS3に保存し、
+差分検出のたびに user_bank_account と "user" を結合して集計する代わりに参照する。
+
+    impact-index/{env}/snapshot.json.gz
+
+generated_at はスナップショットに反映済みの変更の時点（ウォーターマーク）。定期実行（impact_index_refresh）では
+generated_at 以降に user_bank_account / "user" の行が更新されたキーだけを再集計して generated_at を進め、
+スナップショットがない・generated_at または最後に全件を再集計した時点（full_built_at）から
+IMPACT_INDEX_MAX_AGE_HOURS 時間以上経過している場合は全件を再集計する。
+変更のあったキーの再集計では、口座の銀行支店コードの変更や物理削除で件数が減った元のキーを検出できないため、
+full_built_at は進めず、全件の再集計で定期的に補正する。
+差分の実行後は実行対象のキーだけを再集計して更新する（generated_at は進めない）。
+generated_at から IMPACT_INDEX_MAX_AGE_HOURS 時間以上経過したものは使用しない（DBで集計する）。
+"""
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Optional
+
+SNAPSHOT_VERSION = 1
+ZERO_STATS = {"total_accounts": 0, "active_users": 0}
+# 更新中のトランザクションがウォーターマークの前後でコミットされた行を取りこぼさないよう、再集計の対象を重ねて取得する
+WATERMARK_OVERLAP = timedelta(minutes=10)
+
+
+def is_fresh(snapshot: Optional[Dict[str, Any]], max_age_hours: float, now: Optional[datetime] = None) -> bool:
+    """スナップショットが有効期限内か"""
+    if not snapshot or not snapshot.get('generated_at'):
+        return False
+    now = now or datetime.now(timezone.utc)
+    return now - datetime.fromisoformat(snapshot['generated_at']) < timedelta(hours=max_age_hours)
+
+
+def needs_full_rebuild(snapshot: Optional[Dict[str, Any]], max_age_hours: float, now: Optional[datetime] = None) -> bool:
+    """全件の再集計が必要か（スナップショットがない・古い、または最後の全件集計から max_age_hours 以上経過）"""
+    if not is_fresh(snapshot, max_age_hours, now) or not snapshot.get('full_built_at'):
+        return True
+    now = now or datetime.now(timezone.utc)
+    return now - datetime.fromisoformat(snapshot['full_built_at']) >= timedelta(hours=max_age_hours)
+
+
+def lookup(snapshot: Dict[str, Any], bank_branch_pairs: Iterable[tuple]) -> Dict[str, Dict[str, int]]:
+    """キーごとの影響統計（スナップショットにないキーは0件）"""
+    stats = snapshot['stats']
+    result = {}
+    for swift, branch in bank_branch_pairs:
+        key = f"{swift}-{branch}"
+        values = stats.get(key)
+        result[key] = {"total_accounts": values[0], "active_users": values[1]} if values else dict(ZERO_STATS)
+    return result
+
+
+def build_snapshot(stats: Dict[str, Dict[str, int]], now: Optional[datetime] = None) -> Dict[str, Any]:
+    """全件集計の結果からスナップショットを作成（0件のキーは保存しない）"""
+    now = now or datetime.now(timezone.utc)
+    return {
+        'version': SNAPSHOT_VERSION,
+        'generated_at': now.isoformat(),
+        'full_built_at': now.isoformat(),
+        'stats': {
+            key: [value['total_accounts'], value['active_users']]
+            for key, value in stats.items() if value['total_accounts']
+        },
+    }
+
+
+def changes_since(snapshot: Dict[str, Any]) -> datetime:
+    """定期実行で再集計の対象とする変更の起点（ウォーターマークから WATERMARK_OVERLAP 分さかのぼる）"""
+    return datetime.fromisoformat(snapshot['generated_at']) - WATERMARK_OVERLAP
+
+
+def merge_snapshot(snapshot: Dict[str, Any], stats: Dict[str, Dict[str, int]], now: Optional[datetime] = None,
+                   generated_at: Optional[datetime] = None) -> Dict[str, Any]:
+    """一部のキーを再集計した結果をスナップショットに反映
+
+    generated_at を指定した場合（定期実行で変更のあったキーをすべて再集計した場合）はウォーターマークを進める。
+    指定しない場合（差分の実行対象のキーのみ）は更新しない。いずれの場合も full_built_at は更新しない。
+    """
+    merged = dict(snapshot['stats'])
+    for key, value in stats.items():
+        if value['total_accounts']:
+            merged[key] = [value['total_accounts'], value['active_users']]
+        else:
+            merged.pop(key, None)
+    merged_snapshot = dict(snapshot, stats=merged, updated_at=(now or datetime.now(timezone.utc)).isoformat())
+    if generated_at is not None:
+        merged_snapshot['generated_at'] = generated_at.isoformat()
+    return merged_snapshot
+
+
+class ImpactIndexStore:
+    """S3上の影響件数スナップショット"""
+
+    def __init__(self, s3_client, bucket: str, prefix: str):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    @property
+    def key(self) -> str:
+        return f"{self.prefix}snapshot.json.gz"
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=self.key)
+        except self.s3.exceptions.NoSuchKey:
+            return None
+        snapshot = json.loads(gzip.decompress(response['Body'].read()).decode('utf-8'))
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            return None
+        return snapshot
+
+    def save(self, snapshot: Dict[str, Any]) -> str:
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=self.key,
+            Body=gzip.compress(json.dumps(snapshot, separators=(',', ':')).encode('utf-8')),
+            ContentType='application/json',
+            ContentEncoding='gzip'
+        )
+        return self.key
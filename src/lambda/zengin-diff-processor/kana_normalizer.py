@@ -0,0 +1,72 @@
+"""
+全角カタカナ → 半角カタカナ変換
+
+NFKC正規化の後、起動時に一度だけ構築した str.translate テーブルで変換する。
+濁点・半濁点付きの文字は半角の基底文字 + ﾞ/ﾟ に分解する（例: ガ → ｶﾞ）。
+"""
+import unicodedata
+from typing import Dict, Iterable, List, Optional
+
+# 清音・小書き・長音（1文字 → 1文字）
+_BASE_KANA = {
+    'ア': 'ｱ', 'イ': 'ｲ', 'ウ': 'ｳ', 'エ': 'ｴ', 'オ': 'ｵ',
+    'カ': 'ｶ', 'キ': 'ｷ', 'ク': 'ｸ', 'ケ': 'ｹ', 'コ': 'ｺ',
+    'サ': 'ｻ', 'シ': 'ｼ', 'ス': 'ｽ', 'セ': 'ｾ', 'ソ': 'ｿ',
+    'タ': 'ﾀ', 'チ': 'ﾁ', 'ツ': 'ﾂ', 'テ': 'ﾃ', 'ト': 'ﾄ',
+    'ナ': 'ﾅ', 'ニ': 'ﾆ', 'ヌ': 'ﾇ', 'ネ': 'ﾈ', 'ノ': 'ﾉ',
+    'ハ': 'ﾊ', 'ヒ': 'ﾋ', 'フ': 'ﾌ', 'ヘ': 'ﾍ', 'ホ': 'ﾎ',
+    'マ': 'ﾏ', 'ミ': 'ﾐ', 'ム': 'ﾑ', 'メ': 'ﾒ', 'モ': 'ﾓ',
+    'ヤ': 'ﾔ', 'ユ': 'ﾕ', 'ヨ': 'ﾖ',
+    'ラ': 'ﾗ', 'リ': 'ﾘ', 'ル': 'ﾙ', 'レ': 'ﾚ', 'ロ': 'ﾛ',
+    'ワ': 'ﾜ', 'ヲ': 'ｦ', 'ン': 'ﾝ',
+    'ァ': 'ｧ', 'ィ': 'ｨ', 'ゥ': 'ｩ', 'ェ': 'ｪ', 'ォ': 'ｫ',
+    'ッ': 'ｯ', 'ャ': 'ｬ', 'ュ': 'ｭ', 'ョ': 'ｮ',
+    '－': 'ｰ', 'ー': 'ｰ',
+}
+
+# 濁音・半濁音（基底文字 + ﾞ/ﾟ に分解）
+_DAKUTEN = 'ｶﾞ'[1]
+_HANDAKUTEN = 'ﾊﾟ'[1]
+_VOICED_KANA = {
+    'ガ': 'カ', 'ギ': 'キ', 'グ': 'ク', 'ゲ': 'ケ', 'ゴ': 'コ',
+    'ザ': 'サ', 'ジ': 'シ', 'ズ': 'ス', 'ゼ': 'セ', 'ゾ': 'ソ',
+    'ダ': 'タ', 'ヂ': 'チ', 'ヅ': 'ツ', 'デ': 'テ', 'ド': 'ト',
+    'バ': 'ハ', 'ビ': 'ヒ', 'ブ': 'フ', 'ベ': 'ヘ', 'ボ': 'ホ',
+    'ヴ': 'ウ',
+}
+_SEMI_VOICED_KANA = {
+    'パ': 'ハ', 'ピ': 'ヒ', 'プ': 'フ', 'ペ': 'ヘ', 'ポ': 'ホ',
+}
+
+
+def _build_table() -> Dict[int, str]:
+    table = {ord(src): dst for src, dst in _BASE_KANA.items()}
+    table.update({ord(src): _BASE_KANA[base] + _DAKUTEN for src, base in _VOICED_KANA.items()})
+    table.update({ord(src): _BASE_KANA[base] + _HANDAKUTEN for src, base in _SEMI_VOICED_KANA.items()})
+    return table
+
+
+HANKAKU_TABLE = _build_table()
+
+
+def to_hankaku(kana_text: Optional[str]) -> Optional[str]:
+    """全角カタカナを半角カタカナに変換（空文字・Noneはそのまま返す）"""
+    if not kana_text:
+        return kana_text
+    return unicodedata.normalize('NFKC', kana_text).translate(HANKAKU_TABLE)
+
+
+def normalize_many(kana_texts: Iterable[Optional[str]]) -> List[Optional[str]]:
+    """複数の文字列を一括変換（同じ文字列は1回だけ変換する）"""
+    converted: Dict[str, str] = {}
+    result = []
+    for kana_text in kana_texts:
+        if not kana_text:
+            result.append(kana_text)
+            continue
+        value = converted.get(kana_text)
+        if value is None:
+            value = unicodedata.normalize('NFKC', kana_text).translate(HANKAKU_TABLE)
+            converted[kana_text] = value
+        result.append(value)
+    return result
@@ -2,21 +2,37 @@ import json
 import os
 import logging
 import boto3
+import boto3.dynamodb.conditions
 import traceback
-from datetime import datetime, timezone
-from typing import Dict, List, Any, Optional
-from dataclasses import dataclass, asdict
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Any, Optional, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from common.slack_client import SlackClient
 from common.monitoring_utils import lambda_handler_wrapper, performance_timer
-import unicodedata
+from common.diff_artifact import artifact_keys, write_diff_artifact, write_sharded_diff_artifact
+from common.diff_repository import DiffRepository
 import hashlib
-from sqlalchemy import create_engine, text
-import gzip
+from sqlalchemy import text
 import base64
 from urllib.parse import quote_plus
 
-# zengin-codeの動的管理
-from package_manager import ZenginCodeManager
+import kana_normalizer
+import diff_content
+from row_digest import DIGEST_SQL, digest_bank_data
+from mbank_rows import MBANK_COLUMNS, compact_mbank_row, group_mbank_rows, mbank_row_key
+from merge_join import merge_join
+from diff_partitions import SwiftCodePartition, partition_by_swift_code, run_partitions
+from bank_fingerprints import BankFingerprintStore, build_scope, compute_bank_fingerprints, plan_scope
+from dedup_plan import build_dedup_plan
+from db_engine import EngineManager
+from impact_index import ImpactIndexStore, build_snapshot, changes_since, is_fresh, lookup as lookup_impact_stats, merge_snapshot, needs_full_rebuild
+from comparison_keys import ComparisonKeyBuilder, SuffixMatcher, SUFFIX_GROUPS_ENV, changed_fields, parse_suffix_groups
+from normalized_cache import NormalizedDatasetCache, build_cache_key
+# zengin-codeデータは別ジョブで公開されたアーティファクトから取得（pipは使用しない）
+from zengin_artifact import S3ArtifactStore, ArtifactNotFoundError, ensure_local_artifact, publish_latest, read_pointer
 
 
 # Configure logging - will be replaced by monitoring wrapper
@@ -31,46 +47,89 @@ except Exception as e:
     logger.warning(f"更新通知用SlackClient初期化スキップ: {str(e)}")
     slack_client_for_update = None
 
-# zengin-codeを動的にインポート
-zengin_manager = ZenginCodeManager(slack_client=slack_client_for_update)
-success, error_message = zengin_manager.ensure_latest_version()
+# 最新のzenginデータアーティファクトを/tmpに展開し、zengin_codeの読み込み先にする
+ZENGIN_ARTIFACT_PREFIX = os.getenv('ZENGIN_ARTIFACT_PREFIX', f"zengin-artifacts/{os.getenv('ENVIRONMENT', 'dev')}")
+ZENGIN_ARTIFACT_STORE = S3ArtifactStore(
+    boto3.client('s3'),
+    os.getenv('S3_BUCKET_NAME', f"{os.getenv('ENVIRONMENT', 'dev')}-zengin-diff-data"),
+    ZENGIN_ARTIFACT_PREFIX
+)
+# 現在使用しているアーティファクトのポインタ（未公開で同梱データを使用している場合は None）
+zengin_artifact_pointer = None
+# 前回展開したバージョンからの変更内容（ログ出力用。changed_bank_codesがNoneの場合は全銀行が対象）
+# 差分検出の対象銀行は銀行ごとのフィンガープリント（plan_bank_scope）で決める
+zengin_artifact_changes = None
 
-if success:
+
+def sync_zengin_artifact() -> Optional[str]:
+    """latest.json を確認し、新しいバージョンがあれば /tmp に同期してzengin_codeを読み込み直す
+
+    ウォームコンテナでは展開済みのバージョンから変更のあったファイルだけを取得する（差分同期）。
+
+    Returns:
+        Optional[str]: ポインタ・アーティファクトを読めなかった場合のエラー内容
+        （latest.json が未公開の場合は同梱データを使用し None）
+    """
+    global zengin_artifact_pointer, zengin_artifact_changes
+    try:
+        pointer = read_pointer(ZENGIN_ARTIFACT_STORE)
+    except ArtifactNotFoundError:
+        # 同梱データにフォールバックするのはポインタが未公開の場合のみ
+        if zengin_artifact_pointer is None:
+            logger.warning("公開済みのzenginデータアーティファクトがないため、同梱データを使用します")
+        return None
+    except Exception as e:
+        return f"latest.json の読み込みに失敗: {str(e)}"
+
+    if zengin_artifact_pointer and zengin_artifact_pointer['sha256'] == pointer['sha256']:
+        return None
+    try:
+        data_dir, pointer, changes = ensure_local_artifact(ZENGIN_ARTIFACT_STORE, pointer=pointer)
+    except Exception as e:
+        return f"アーティファクト {pointer.get('version')} の取得に失敗: {str(e)}"
+
+    if os.environ.get('ZENGIN_CODE_DATA_DIR') != data_dir:
+        os.environ['ZENGIN_CODE_DATA_DIR'] = data_dir
+        if 'zengin_code' in sys.modules:
+            sys.modules['zengin_code'].reload()
+    zengin_artifact_pointer, zengin_artifact_changes = pointer, changes
+    logger.info(f"zenginデータアーティファクトを使用: {pointer['version']} ({changes['mode']})")
+    if changes['changed_bank_codes']:
+        logger.info(f"変更のあった銀行: {changes['changed_bank_codes']}")
+    return None
+
+
+# コールドスタート時はzengin_codeの読み込み前に最新のアーティファクトを展開する
+# （ポインタ・アーティファクトを読めなかった場合、差分処理は古いデータで差分を作らないよう失敗させる）
+zengin_artifact_error = sync_zengin_artifact()
+
+try:
     from zengin_code import Bank
     logger.info("zengin-codeのインポートに成功しました")
-else:
-    # エラーメッセージがある場合は詳細を記録
-    if error_message:
-        logger.error(f"zengin-code管理エラー: {error_message}")
+except ImportError as e:
+    # クリティカルエラー: zengin-codeが全く利用できない
+    error_msg = f"zengin-codeのインポートに失敗しました: {str(e)}"
+    logger.critical(error_msg)
     
-    # 既存バージョンで継続を試みる
-    try:
-        from zengin_code import Bank
-        logger.warning("既存のzengin-codeバージョンで処理を継続します")
-    except ImportError as e:
-        # クリティカルエラー: zengin-codeが全く利用できない
-        error_msg = f"zengin-codeのインポートに失敗しました: {str(e)}"
-        logger.critical(error_msg)
-        
-        # Slack通知を試みる
-        if slack_client_for_update:
-            try:
-                slack_client_for_update.post_message(
-                    text="🚨 クリティカルエラー: zengin-codeが利用できません",
-                    blocks=[
-                        {
-                            "type": "section",
-                            "text": {
-                                "type": "mrkdwn",
-                                "text": f"Lambda関数の実行を継続できません:\n```{error_msg}```"
-                            }
+    # Slack通知を試みる
+    if slack_client_for_update:
+        try:
+            slack_client_for_update.post_message(
+                text="🚨 クリティカルエラー: zengin-codeが利用できません",
+                blocks=[
+                    {
+                        "type": "section",
+                        "text": {
+                            "type": "mrkdwn",
+                            "text": f"Lambda関数の実行を継続できません:\n```{error_msg}```"
                         }
-                    ]
-                )
-            except:
-                pass
-        
-        raise ImportError(error_msg)
+                    }
+                ]
+            )
+        except:
+            pass
+    
+    raise ImportError(error_msg)
 
 # AWS clients setup
 dynamodb = boto3.resource('dynamodb')
@@ -83,6 +142,90 @@ DATABASE_SECRET_ARN = os.getenv('DATABASE_SECRET_ARN')
 ENVIRONMENT = os.getenv('ENVIRONMENT', 'dev')
 S3_BUCKET_NAME = os.getenv('S3_BUCKET_NAME', f'{ENVIRONMENT}-zengin-diff-data')
 
+# 入力フィンガープリント（前回完了時の入力と同一なら差分検出をスキップ）
+FINGERPRINT_ITEM_ID = 'processor-fingerprint'
+FINGERPRINT_ITEM_TIMESTAMP = 'latest'
+# 比較・正規化ロジックを変更した場合はインクリメントして再計算を強制する
+FINGERPRINT_VERSION = 1
+# 同じ入力で再通知しない差分の状態（pending は期限内のみ。rejected / failed は再通知する）
+FINGERPRINT_SETTLED_STATUSES = ('approved', 'scheduled', 'completed')
+
+# 正規化済みデータセットキャッシュ（正規化ルールを変更した場合はインクリメント）
+NORMALIZATION_RULES_VERSION = 1
+NORMALIZED_CACHE_S3_ENABLED = os.getenv('NORMALIZED_CACHE_S3_ENABLED', 'false').lower() == 'true'
+NORMALIZED_CACHE_S3_PREFIX = f"normalized-cache/{ENVIRONMENT}/"
+# S3に残すキャッシュエントリ数（ロールアウト中など複数バージョンが同時に稼働しても互いに削除しない）
+NORMALIZED_CACHE_S3_KEEP_ENTRIES = int(os.getenv('NORMALIZED_CACHE_S3_KEEP_ENTRIES', '3'))
+
+# 差分検出モード: full（全カラム取得）/ digest（DB側で行ダイジェストを計算し、差分のあるキーのみ全カラム取得）
+DIFF_MODE = os.getenv('DIFF_MODE', 'full').lower()
+DIGEST_FETCH_CHUNK_SIZE = int(os.getenv('DIGEST_FETCH_CHUNK_SIZE', '5000'))
+# MBank読み込み時のサーバーサイドカーソルの取得件数
+MBANK_FETCH_SIZE = int(os.getenv('MBANK_FETCH_SIZE', '5000'))
+# 差分検出エンジン: hash（両側をdictにまとめて比較）/ merge（キー順のマージ結合で差分を逐次生成）
+DIFF_ENGINE = os.getenv('DIFF_ENGINE', 'hash').lower()
+# mergeエンジンで影響統計を一括取得する件数
+IMPACT_STATS_BATCH_SIZE = int(os.getenv('IMPACT_STATS_BATCH_SIZE', '1000'))
+# 影響統計クエリの1チャンクのキー数と並行実行数（接続プールの pool_size 以下にする）
+IMPACT_STATS_CHUNK_SIZE = int(os.getenv('IMPACT_STATS_CHUNK_SIZE', '500'))
+IMPACT_STATS_CONCURRENCY = int(os.getenv('IMPACT_STATS_CONCURRENCY', '4'))
+# 接続プール: queue（既定）/ null（接続を保持しない）/ proxy（RDS Proxy経由、NullPool）
+DB_POOL_MODE = os.getenv('DB_POOL_MODE', 'queue').lower()
+DB_POOL_RECYCLE_SECONDS = int(os.getenv('DB_POOL_RECYCLE_SECONDS', '1800'))
+# データベースシークレットのローテーションを確認する間隔（認証エラー時は即時に取り直す）
+DB_CREDENTIALS_CHECK_SECONDS = int(os.getenv('DB_CREDENTIALS_CHECK_SECONDS', '900'))
+# リードレプリカ（シークレットの replica_host）への読み取りの振り分けと、許容するレプリケーション遅延
+DB_READ_REPLICA_ENABLED = os.getenv('DB_READ_REPLICA_ENABLED', 'true').lower() == 'true'
+DB_REPLICA_MAX_LAG_SECONDS = float(os.getenv('DB_REPLICA_MAX_LAG_SECONDS', '30'))
+# 並列差分検出のワーカープロセス数（2以上で swift_code の範囲ごとに別プロセスで取得・比較）
+DIFF_WORKERS = int(os.getenv('DIFF_WORKERS', '1'))
+
+# 銀行単位のフィンガープリントで差分検出を変更のあった銀行に限定（承認・実行済みの状態と比較）
+INCREMENTAL_DIFF_ENABLED = os.getenv('INCREMENTAL_DIFF_ENABLED', 'false').lower() == 'true'
+# 前回の全件比較からこの日数が経過したら全件比較を行う（ドリフト対策）
+FULL_RECONCILIATION_INTERVAL_DAYS = int(os.getenv('FULL_RECONCILIATION_INTERVAL_DAYS', '7'))
+BANK_FINGERPRINT_S3_PREFIX = f"bank-fingerprints/{ENVIRONMENT}/"
+# MBank重複行の解消計画（差分の承認時にexecutorが一括で論理削除）
+DEDUP_PLAN_S3_PREFIX = f"dedup-plans/{ENVIRONMENT}/"
+# 差分データの保存形式: sharded（シャード + マニフェスト + キーインデックス）/ single（単一ファイル、互換用）
+DIFF_ARTIFACT_LAYOUT = os.getenv('DIFF_ARTIFACT_LAYOUT', 'sharded').lower()
+DIFF_ARTIFACT_SHARD_SIZE = int(os.getenv('DIFF_ARTIFACT_SHARD_SIZE', '5000'))
+# UserBankAccountの影響件数スナップショット（古い場合はDBで集計）
+IMPACT_INDEX_ENABLED = os.getenv('IMPACT_INDEX_ENABLED', 'false').lower() == 'true'
+IMPACT_INDEX_MAX_AGE_HOURS = float(os.getenv('IMPACT_INDEX_MAX_AGE_HOURS', '24'))
+IMPACT_INDEX_S3_PREFIX = f"impact-index/{ENVIRONMENT}/"
+
+
+def _load_db_secret():
+    """データベースシークレット（認証情報とバージョンID）"""
+    response = secrets_manager.get_secret_value(SecretId=DATABASE_SECRET_ARN)
+    return json.loads(response['SecretString']), response.get('VersionId')
+
+
+# ウォームコンテナで再利用するエンジン（フォークしたワーカーでは接続プールを作り直す）
+ENGINE_MANAGER = EngineManager(
+    _load_db_secret,
+    pool_mode=DB_POOL_MODE,
+    pool_size=max(5, IMPACT_STATS_CONCURRENCY),
+    pool_recycle=DB_POOL_RECYCLE_SECONDS,
+    credentials_check_seconds=DB_CREDENTIALS_CHECK_SECONDS,
+)
+# リードレプリカ用（RDS Proxyはプライマリ用のため、proxyモードではNullPoolで直接接続）
+REPLICA_ENGINE_MANAGER = EngineManager(
+    _load_db_secret,
+    pool_mode='queue' if DB_POOL_MODE == 'queue' else 'null',
+    pool_size=max(5, IMPACT_STATS_CONCURRENCY),
+    pool_recycle=DB_POOL_RECYCLE_SECONDS,
+    credentials_check_seconds=DB_CREDENTIALS_CHECK_SECONDS,
+    host_keys=('replica_host', 'reader_endpoint'),
+)
+os.register_at_fork(after_in_child=ENGINE_MANAGER.reset_after_fork)
+os.register_at_fork(after_in_child=REPLICA_ENGINE_MANAGER.reset_after_fork)
+
+# 差分テーブル（呼び出し単位でアイテムをキャッシュ）
+DIFF_REPOSITORY = DiffRepository(dynamodb, DIFF_TABLE_NAME)
+
+
 @dataclass
 class BankData:
     """銀行データモデル"""
@@ -102,6 +245,7 @@ class BankDiff:
     new_data: Optional[BankData] = None
     total_accounts: int = 0
     active_users: int = 0
+    changed_fields: List[str] = field(default_factory=list)  # updateで差分のあったフィールド
 
 @dataclass
 class BankUpdateRequestData:
@@ -109,13 +253,11 @@ class BankUpdateRequestData:
     diffs: List[BankDiff]
     summary: str
     total_changes: int
+    dedup_plan: Optional[Dict[str, Any]] = None
 
 class ZenginClient:
     """全銀協データ取得クライアント"""
     
-    def __init__(self):
-        self.bank_class = Bank
-    
     def _normalize_bank_name(self, bank_name: str) -> str:
         """銀行名を正規化"""
         if not bank_name:
@@ -150,76 +292,26 @@ class ZenginClient:
 
     def _convert_kana_to_hankaku(self, kana_text: str) -> str:
         """全角カタカナを半角カタカナに変換"""
-        if not kana_text:
-            return kana_text
-            
-        # NFKC正規化
-        normalized = unicodedata.normalize('NFKC', kana_text)
-        
-        # 全角カタカナ → 半角カタカナの変換マップ
-        kana_map = {
-            'ア': 'ｱ', 'イ': 'ｲ', 'ウ': 'ｳ', 'エ': 'ｴ', 'オ': 'ｵ',
-            'カ': 'ｶ', 'キ': 'ｷ', 'ク': 'ｸ', 'ケ': 'ｹ', 'コ': 'ｺ',
-            'サ': 'ｻ', 'シ': 'ｼ', 'ス': 'ｽ', 'セ': 'ｾ', 'ソ': 'ｿ',
-            'タ': 'ﾀ', 'チ': 'ﾁ', 'ツ': 'ﾂ', 'テ': 'ﾃ', 'ト': 'ﾄ',
-            'ナ': 'ﾅ', 'ニ': 'ﾆ', 'ヌ': 'ﾇ', 'ネ': 'ﾈ', 'ノ': 'ﾉ',
-            'ハ': 'ﾊ', 'ヒ': 'ﾋ', 'フ': 'ﾌ', 'ヘ': 'ﾍ', 'ホ': 'ﾎ',
-            'マ': 'ﾏ', 'ミ': 'ﾐ', 'ム': 'ﾑ', 'メ': 'ﾒ', 'モ': 'ﾓ',
-            'ヤ': 'ﾔ', 'ユ': 'ﾕ', 'ヨ': 'ﾖ',
-            'ラ': 'ﾗ', 'リ': 'ﾘ', 'ル': 'ﾙ', 'レ': 'ﾚ', 'ロ': 'ﾛ',
-            'ワ': 'ﾜ', 'ヲ': 'ｦ', 'ン': 'ﾝ',
-            'ァ': 'ｧ', 'ィ': 'ｨ', 'ゥ': 'ｩ', 'ェ': 'ｪ', 'ォ': 'ｫ',
-            'ッ': 'ｯ', 'ャ': 'ｬ', 'ュ': 'ｭ', 'ョ': 'ｮ',
-            'ガ': 'ｶﾞ', 'ギ': 'ｷﾞ', 'グ': 'ｸﾞ', 'ゲ': 'ｹﾞ', 'ゴ': 'ｺﾞ',
-            'ザ': 'ｻﾞ', 'ジ': 'ｼﾞ', 'ズ': 'ｽﾞ', 'ゼ': 'ｾﾞ', 'ゾ': 'ｿﾞ',
-            'ダ': 'ﾀﾞ', 'ヂ': 'ﾁﾞ', 'ヅ': 'ﾂﾞ', 'デ': 'ﾃﾞ', 'ド': 'ﾄﾞ',
-            'バ': 'ﾊﾞ', 'ビ': 'ﾋﾞ', 'ブ': 'ﾌﾞ', 'ベ': 'ﾍﾞ', 'ボ': 'ﾎﾞ',
-            'パ': 'ﾊﾟ', 'ピ': 'ﾋﾟ', 'プ': 'ﾌﾟ', 'ペ': 'ﾍﾟ', 'ポ': 'ﾎﾟ',
-            'ヴ': 'ｳﾞ',
-            '－': 'ｰ', 'ー': 'ｰ'
-        }
-        
-        result = ""
-        for char in normalized:
-            result += kana_map.get(char, char)
-        
-        return result
+        return kana_normalizer.to_hankaku(kana_text)
 
     def get_all_banks(self) -> List[BankData]:
-        """zengin-codeから全ての銀行データを取得（模擬実装）"""
+        """zengin-codeから全ての銀行データを取得"""
         try:
-            all_banks = self.bank_class.all
+            cache = self._get_normalized_cache()
+            if cache:
+                rows, tier = cache.get()
+                if rows is not None:
+                    bank_data_list = [BankData(*row) for row in rows]
+                    logger.info(f"正規化済みデータをキャッシュから取得 ({tier}): {len(bank_data_list)}件")
+                    return bank_data_list
             
-            bank_data_list = []
-            for bank_code, bank_info in all_banks.items():
-                # 銀行の基本情報を正規化
-                bank_name = self._normalize_bank_name(bank_info.name)
-                bank_name_kana = self._convert_kana_to_hankaku(bank_info.kana)
-                
-                # 各支店のデータを取得
-                if hasattr(bank_info, 'branches') and bank_info.branches:
-                    for branch_code, branch_info in bank_info.branches.items():
-                        branch_name = self._normalize_branch_name(branch_info.name)
-                        bank_data = BankData(
-                            swift_code=bank_code,
-                            bank_name=bank_name,
-                            bank_name_kana=bank_name_kana,
-                            branch_code=branch_code,
-                            branch_name=branch_name,
-                            branch_name_kana=self._convert_kana_to_hankaku(branch_info.kana)
-                        )
-                        bank_data_list.append(bank_data)
-                else:
-                    # 支店情報がない場合は銀行本体のデータのみ
-                    bank_data = BankData(
-                        swift_code=bank_code,
-                        bank_name=bank_name,
-                        bank_name_kana=bank_name_kana,
-                        branch_code="001",  # デフォルトの本店コード
-                        branch_name="本店",
-                        branch_name_kana=self._convert_kana_to_hankaku("ホンテン")
-                    )
-                    bank_data_list.append(bank_data)
+            bank_data_list = self._get_all_banks_from_rows()
+            
+            if cache:
+                cache.put([
+                    (d.swift_code, d.bank_name, d.bank_name_kana, d.branch_code, d.branch_name, d.branch_name_kana)
+                    for d in bank_data_list
+                ])
             
             logger.info(f"取得した銀行データ件数: {len(bank_data_list)}")
             return bank_data_list
@@ -228,76 +320,301 @@ class ZenginClient:
             logger.error(f"zengin_codeからのデータ取得エラー: {str(e)}")
             raise
 
+    def _get_normalized_cache(self) -> Optional[NormalizedDatasetCache]:
+        """zengin-codeのバージョンに対応する正規化済みデータキャッシュを取得"""
+        try:
+            import zengin_code
+            data_version = get_zengin_data_version()
+            cache_key = build_cache_key(
+                getattr(zengin_code, '__version__', 'unknown'),
+                data_version['md5'],
+                NORMALIZATION_RULES_VERSION
+            )
+        except Exception as e:
+            logger.warning(f"正規化キャッシュを使用しません: {str(e)}")
+            return None
+        return NormalizedDatasetCache(
+            cache_key,
+            s3_client=s3 if NORMALIZED_CACHE_S3_ENABLED else None,
+            s3_bucket=S3_BUCKET_NAME,
+            s3_prefix=NORMALIZED_CACHE_S3_PREFIX,
+            s3_keep_entries=NORMALIZED_CACHE_S3_KEEP_ENTRIES
+        )
+
+    def _get_all_banks_from_rows(self) -> List[BankData]:
+        """zengin_code.to_columns（列ごとのリスト）から銀行データを生成"""
+        import zengin_code
+        columns = zengin_code.to_columns(include_empty_banks=True)
+        # カナは列ごとに一括変換（同じ文字列は1回だけ変換される）
+        bank_kanas = kana_normalizer.normalize_many(columns['bank_kana'])
+        branch_kanas = kana_normalizer.normalize_many(columns['branch_kana'])
+        bank_name_cache: Dict[str, str] = {}
+        branch_name_cache: Dict[str, str] = {}
+        default_branch_kana = self._convert_kana_to_hankaku("ホンテン")
+        
+        bank_data_list = []
+        for bank_code, bank_name, bank_kana, branch_code, branch_name, branch_kana in zip(
+            columns['bank_code'], columns['bank_name'], bank_kanas,
+            columns['branch_code'], columns['branch_name'], branch_kanas
+        ):
+            # 銀行名は銀行ごとに1回だけ正規化
+            normalized_bank_name = bank_name_cache.get(bank_code)
+            if normalized_bank_name is None:
+                normalized_bank_name = self._normalize_bank_name(bank_name)
+                bank_name_cache[bank_code] = normalized_bank_name
+            
+            if branch_code is None:
+                # 支店情報がない場合は銀行本体のデータのみ
+                bank_data_list.append(BankData(
+                    swift_code=bank_code,
+                    bank_name=normalized_bank_name,
+                    bank_name_kana=bank_kana,
+                    branch_code="001",  # デフォルトの本店コード
+                    branch_name="本店",
+                    branch_name_kana=default_branch_kana
+                ))
+                continue
+            
+            # 支店名は重複が多いため変換結果を再利用
+            normalized_branch_name = branch_name_cache.get(branch_name)
+            if normalized_branch_name is None:
+                normalized_branch_name = self._normalize_branch_name(branch_name)
+                branch_name_cache[branch_name] = normalized_branch_name
+            
+            bank_data_list.append(BankData(
+                swift_code=bank_code,
+                bank_name=normalized_bank_name,
+                bank_name_kana=bank_kana,
+                branch_code=branch_code,
+                branch_name=normalized_branch_name,
+                branch_name_kana=branch_kana
+            ))
+        
+        return bank_data_list
+
 class DatabaseClient:
-    """データベースクライアント - PostgreSQL via SQLAlchemy"""
+    """データベースクライアント - PostgreSQL via SQLAlchemy
+    
+    差分処理のクエリはすべて読み取り専用のため、シークレットにリードレプリカのエンドポイント（replica_host）があり、
+    レプリケーション遅延が DB_REPLICA_MAX_LAG_SECONDS 以内の場合はレプリカに接続する（それ以外はプライマリ）。
+    """
     
-    def __init__(self):
-        self.db_credentials: Optional[Dict[str, Any]] = None
-        self._engine = None
+    def __init__(self, engine_manager: Optional[EngineManager] = None,
+                 replica_manager: Optional[EngineManager] = None):
+        # エンジンと認証情報はモジュールレベルで共有し、ウォームコンテナの後続の呼び出しでも再利用する
+        self.engine_manager = engine_manager or ENGINE_MANAGER
+        self.replica_manager = replica_manager or (REPLICA_ENGINE_MANAGER if DB_READ_REPLICA_ENABLED else None)
+        # レプリカを使うか（None は未判定、クライアントごとに1回だけ遅延を確認）
+        self._use_replica: Optional[bool] = None
+    
+    def for_worker(self) -> 'DatabaseClient':
+        """ワーカープロセス用のクライアント（フォーク後は接続プールを作り直すため、親の接続は共有しない）"""
+        client = DatabaseClient(self.engine_manager, self.replica_manager)
+        client._use_replica = self._use_replica
+        return client
     
     def _get_db_credentials(self) -> Dict[str, Any]:
         """データベース認証情報を取得"""
-        if self.db_credentials:
-            return self.db_credentials
-            
         try:
-            response = secrets_manager.get_secret_value(SecretId=DATABASE_SECRET_ARN)
-            self.db_credentials = json.loads(response['SecretString'])
-            return self.db_credentials
+            return self.engine_manager.get_credentials()
         except Exception as e:
             logger.error(f"データベース認証情報取得エラー: {str(e)}")
             raise
     
     def _get_engine(self):
         """Create or return cached SQLAlchemy engine"""
-        if self._engine:
-            return self._engine
-        creds = self._get_db_credentials()
-        host = creds.get("host") or creds.get("endpoint")
-        port = creds.get("port", 5432)
-        dbname = creds.get("name") or creds.get("dbname") or creds.get("database")
-        user = creds.get("username") or creds.get("user")
-        password = creds.get("password") or creds.get("secret")
-        
-        # URLエンコードを行わず、connect_argsで直接渡す
-        db_url = f"postgresql+psycopg2://{host}:{port}/{dbname}"
-        self._engine = create_engine(
-            db_url,
-            pool_pre_ping=True,
-            connect_args={
-                "user": user,
-                "password": password,
-                "sslmode": "require"
-            }
-        )
-        return self._engine
+        return self.engine_manager.get_engine()
+    
+    def _connect(self):
+        """接続を取得（レプリカが使用可能ならレプリカ。認証エラー時は認証情報を取り直して再接続）"""
+        if self._use_replica is None:
+            self._use_replica = self._check_replica()
+        return (self.replica_manager if self._use_replica else self.engine_manager).connect()
+    
+    def _check_replica(self) -> bool:
+        """リードレプリカが設定されていて、レプリケーション遅延が許容範囲内か"""
+        if self.replica_manager is None or not self.replica_manager.host(self._get_db_credentials()):
+            return False
+        try:
+            with self.replica_manager.connect() as conn:
+                lag_seconds = conn.execute(text("""
+                    SELECT CASE
+                        WHEN NOT pg_is_in_recovery() THEN 0
+                        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+                    END
+                """)).scalar()
+        except Exception as e:
+            logger.warning(f"リードレプリカに接続できないためプライマリを使用: {str(e)}")
+            return False
+        if lag_seconds is None or float(lag_seconds) > DB_REPLICA_MAX_LAG_SECONDS:
+            logger.warning(f"リードレプリカの遅延が大きいためプライマリを使用: {lag_seconds}秒（上限 {DB_REPLICA_MAX_LAG_SECONDS}秒）")
+            return False
+        logger.info(f"リードレプリカを使用: 遅延 {float(lag_seconds):.1f}秒")
+        return True
 
-    def get_mbank_data(self) -> List[Dict[str, Any]]:
-        """現在のMBankデータを取得"""
+    def iter_mbank_rows(self, fetch_size: Optional[int] = None, ordered: bool = False,
+                        swift_code_range: Optional[tuple] = None,
+                        swift_codes: Optional[List[str]] = None) -> Iterator[tuple]:
+        """MBankデータをサーバーサイドカーソルで順次取得（MBANK_COLUMNS順のタプル）
+        
+        Args:
+            fetch_size: 1回の取得件数（省略時は MBANK_FETCH_SIZE）
+            ordered: True の場合は (swift_code, branch_code) のバイト順で取得
+            swift_code_range: (下限, 上限) の半開区間で swift_code を絞り込む（None は制限なし）
+            swift_codes: 取得対象の swift_code（None は全件）
+        """
+        fetch_size = fetch_size or MBANK_FETCH_SIZE
+        # NULLは空文字として並べる（mbank_row_key と同じ順序）
+        order_by = ('ORDER BY COALESCE(swift_code, \'\') COLLATE "C", COALESCE(branch_code, \'\') COLLATE "C"'
+                    if ordered else '')
+        range_filter = ''
+        params = {}
+        if swift_code_range:
+            lower, upper = swift_code_range
+            if lower is not None:
+                range_filter += ' AND COALESCE(swift_code, \'\') COLLATE "C" >= :lower'
+                params['lower'] = lower
+            if upper is not None:
+                range_filter += ' AND COALESCE(swift_code, \'\') COLLATE "C" < :upper'
+                params['upper'] = upper
+        if swift_codes is not None:
+            range_filter += ' AND swift_code = ANY(:swift_codes)'
+            params['swift_codes'] = list(swift_codes)
         try:
-            engine = self._get_engine()
-            with engine.connect() as conn:
-                result = conn.execute(
+            with self._connect() as conn:
+                result = conn.execution_options(stream_results=True, yield_per=fetch_size).execute(
                     text(
-                        """
+                        f"""
                         SELECT swift_code, bank_name, bank_name_kana, branch_code, branch_name, branch_name_kana
                         FROM m_bank
-                        WHERE is_deleted = 0
+                        WHERE is_deleted = 0{range_filter}
+                        {order_by}
+                        """
+                    ),
+                    params
+                )
+                for row in result:
+                    yield compact_mbank_row(row)
+        except Exception as e:
+            logger.error(f"MBankデータ取得エラー: {str(e)}")
+            raise
+    
+    def get_mbank_digests(self, swift_codes: Optional[List[str]] = None) -> List[tuple]:
+        """MBankの (swift_code, branch_code, 行ダイジェスト) を取得（swift_codes 指定時はその銀行のみ）"""
+        try:
+            with self._connect() as conn:
+                swift_code_filter = ' AND swift_code = ANY(:swift_codes)' if swift_codes is not None else ''
+                result = conn.execute(
+                    text(
+                        f"""
+                        SELECT swift_code, branch_code, {DIGEST_SQL} AS row_digest
+                        FROM m_bank
+                        WHERE is_deleted = 0{swift_code_filter}
+                        """
+                    ),
+                    {'swift_codes': list(swift_codes)} if swift_codes is not None else {}
+                )
+                data = [tuple(row) for row in result]
+                logger.info(f"MBankダイジェスト件数: {len(data)}")
+                return data
+        except Exception as e:
+            logger.error(f"MBankダイジェスト取得エラー: {str(e)}")
+            raise
+    
+    def get_mbank_duplicates(self) -> List[tuple]:
+        """(swift_code, branch_code) が重複しているMBankの行のみ取得（dedup_plan.DUPLICATE_COLUMNS順のタプル）"""
+        try:
+            with self._connect() as conn:
+                result = conn.execute(
+                    text(
+                        """
+                        SELECT m.id, m.swift_code, m.bank_name, m.bank_name_kana,
+                               m.branch_code, m.branch_name, m.branch_name_kana, m.updated_at
+                        FROM m_bank m
+                        JOIN (
+                            SELECT swift_code, branch_code
+                            FROM m_bank
+                            WHERE is_deleted = 0
+                            GROUP BY swift_code, branch_code
+                            HAVING count(*) > 1
+                        ) dup ON dup.swift_code = m.swift_code AND dup.branch_code = m.branch_code
+                        WHERE m.is_deleted = 0
+                        ORDER BY m.swift_code, m.branch_code, m.id
                         """
                     )
                 )
-                data = [dict(row._mapping) for row in result]
-                logger.info(f"MBankデータ件数: {len(data)}")
+                data = [tuple(row) for row in result]
+                logger.info(f"MBank重複行件数: {len(data)}")
                 return data
         except Exception as e:
-            logger.error(f"MBankデータ取得エラー: {str(e)}")
+            logger.error(f"MBank重複行取得エラー: {str(e)}")
+            raise
+    
+    def get_mbank_rows_by_keys(self, keys: List[tuple]) -> List[tuple]:
+        """指定した (swift_code, branch_code) のMBankデータを取得（MBANK_COLUMNS順のタプル）"""
+        if not keys:
+            return []
+        try:
+            data = []
+            with self._connect() as conn:
+                for i in range(0, len(keys), DIGEST_FETCH_CHUNK_SIZE):
+                    chunk = keys[i:i + DIGEST_FETCH_CHUNK_SIZE]
+                    result = conn.execute(
+                        text(
+                            """
+                            SELECT mb.swift_code, mb.bank_name, mb.bank_name_kana, mb.branch_code, mb.branch_name, mb.branch_name_kana
+                            FROM m_bank mb
+                            JOIN unnest(CAST(:swift_codes AS text[]), CAST(:branch_codes AS text[])) AS k(swift_code, branch_code)
+                              ON mb.swift_code = k.swift_code AND mb.branch_code = k.branch_code
+                            WHERE mb.is_deleted = 0
+                            """
+                        ),
+                        {
+                            "swift_codes": [swift for swift, _ in chunk],
+                            "branch_codes": [branch for _, branch in chunk],
+                        },
+                    )
+                    data.extend(compact_mbank_row(row) for row in result)
+            logger.info(f"MBankデータ件数（キー指定）: {len(data)} (キー数: {len(keys)})")
+            return data
+        except Exception as e:
+            logger.error(f"MBankデータ取得エラー（キー指定）: {str(e)}")
+            raise
+    
+    def get_mbank_checksum(self) -> Dict[str, Any]:
+        """MBank（is_deleted = 0）の件数と行ハッシュの集約チェックサムを取得"""
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    text(
+                        """
+                        SELECT
+                            COUNT(*) AS row_count,
+                            md5(COALESCE(string_agg(row_hash, '' ORDER BY row_hash), '')) AS checksum
+                        FROM (
+                            SELECT md5(concat_ws(chr(31),
+                                COALESCE(swift_code, ''), COALESCE(bank_name, ''), COALESCE(bank_name_kana, ''),
+                                COALESCE(branch_code, ''), COALESCE(branch_name, ''), COALESCE(branch_name_kana, '')
+                            )) AS row_hash
+                            FROM m_bank
+                            WHERE is_deleted = 0
+                        ) hashed
+                        """
+                    )
+                ).fetchone()
+                return {
+                    "row_count": int(row.row_count or 0),
+                    "checksum": row.checksum,
+                }
+        except Exception as e:
+            logger.error(f"MBankチェックサム取得エラー: {str(e)}")
             raise
     
     def get_user_bank_account_impact_stats(self, swift_code: str, branch_code: str) -> Dict[str, int]:
         """指定された銀行支店コードに紐づくUserBankAccountの影響統計を取得"""
-        engine = self._get_engine()
         try:
-            with engine.connect() as conn:
+            with self._connect() as conn:
                 result = conn.execute(
                     text(
                         """
@@ -326,273 +643,560 @@ class DatabaseClient:
             logger.error(f"影響統計取得エラー: {str(e)}")
             return {"total_accounts": 0, "active_users": 0}
     
-    def get_user_bank_account_impact_stats_batch(self, bank_branch_pairs: List[tuple]) -> Dict[str, Dict[str, int]]:
-        """複数の銀行支店コードに紐づくUserBankAccountの影響統計を一括取得"""
+    def _query_impact_stats_chunk(self, bank_branch_pairs: List[tuple]) -> Dict[str, Dict[str, int]]:
+        """影響統計を1チャンク分取得（キーは配列パラメータで渡す）"""
+        with self._connect() as conn:
+            result = conn.execute(
+                text("""
+                    SELECT 
+                        uba.bank_swift_code,
+                        uba.branch_code,
+                        COUNT(uba.id) AS total_accounts,
+                        COUNT(DISTINCT uba.user_id) AS total_users,
+                        COUNT(CASE WHEN u.use_status = 1 THEN 1 END) AS active_user_accounts,
+                        COUNT(DISTINCT CASE WHEN u.use_status = 1 THEN uba.user_id END) AS active_users
+                    FROM unnest(CAST(:swift_codes AS text[]), CAST(:branch_codes AS text[])) AS bc(swift_code, branch_code)
+                    JOIN user_bank_account uba 
+                        ON uba.bank_swift_code = bc.swift_code 
+                        AND uba.branch_code = bc.branch_code
+                        AND uba.is_deleted = 0
+                    LEFT JOIN "user" u ON uba.user_id = u.id
+                    GROUP BY uba.bank_swift_code, uba.branch_code
+                """),
+                {
+                    'swift_codes': [swift for swift, _ in bank_branch_pairs],
+                    'branch_codes': [branch for _, branch in bank_branch_pairs],
+                }
+            )
+            stats_dict = {}
+            for row in result:
+                if row.bank_swift_code and row.branch_code:
+                    stats_dict[f"{row.bank_swift_code}-{row.branch_code}"] = {
+                        "total_accounts": row.total_accounts or 0,
+                        "active_users": row.active_users or 0,
+                    }
+            return stats_dict
+
+    def get_user_bank_account_impact_stats_all(self) -> Dict[str, Dict[str, int]]:
+        """全銀行支店コードのUserBankAccount影響統計を集計（影響インデックスの再作成用）"""
+        with self._connect() as conn:
+            result = conn.execute(
+                text("""
+                    SELECT 
+                        uba.bank_swift_code,
+                        uba.branch_code,
+                        COUNT(uba.id) AS total_accounts,
+                        COUNT(DISTINCT CASE WHEN u.use_status = 1 THEN uba.user_id END) AS active_users
+                    FROM user_bank_account uba
+                    LEFT JOIN "user" u ON uba.user_id = u.id
+                    WHERE uba.is_deleted = 0
+                    GROUP BY uba.bank_swift_code, uba.branch_code
+                """)
+            )
+            return {
+                f"{row.bank_swift_code}-{row.branch_code}": {
+                    "total_accounts": row.total_accounts or 0,
+                    "active_users": row.active_users or 0,
+                }
+                for row in result if row.bank_swift_code and row.branch_code
+            }
+
+    def get_user_bank_account_keys_changed_since(self, since: datetime) -> List[tuple]:
+        """指定時刻以降に user_bank_account または紐づく "user" が更新された銀行支店コード（影響インデックスの差分再集計用）
+
+        論理削除（is_deleted）も updated_at を更新するため、削除された口座のキーも含む。
+        """
+        with self._connect() as conn:
+            result = conn.execute(
+                text("""
+                    SELECT uba.bank_swift_code, uba.branch_code
+                    FROM user_bank_account uba
+                    WHERE uba.updated_at >= :since
+                    UNION
+                    SELECT uba.bank_swift_code, uba.branch_code
+                    FROM "user" u
+                    JOIN user_bank_account uba ON uba.user_id = u.id
+                    WHERE u.updated_at >= :since
+                """),
+                {'since': since}
+            )
+            return [(row.bank_swift_code, row.branch_code) for row in result if row.bank_swift_code and row.branch_code]
+
+    def get_user_bank_account_impact_stats_batch(self, bank_branch_pairs: List[tuple], strict: bool = False) -> Dict[str, Dict[str, int]]:
+        """複数の銀行支店コードに紐づくUserBankAccountの影響統計を一括取得
+        
+        キーを IMPACT_STATS_CHUNK_SIZE 件ごとのチャンクに分け、最大 IMPACT_STATS_CONCURRENCY 本の接続で並行に取得する。
+        取得に失敗したチャンクのキーは0件として扱う（strict=True の場合は例外を送出）。
+        """
         if not bank_branch_pairs:
             return {}
         
-        engine = self._get_engine()
-        try:
-            with engine.connect() as conn:
-                # Create a temporary table for the batch query
-                values_clause = ", ".join([f"('{swift}', '{branch}')" for swift, branch in bank_branch_pairs])
-                
-                result = conn.execute(
-                    text(f"""
-                        WITH bank_codes AS (
-                            SELECT * FROM (VALUES {values_clause}) AS t(swift_code, branch_code)
-                        )
-                        SELECT 
-                            uba.bank_swift_code,
-                            uba.branch_code,
-                            COUNT(uba.id) AS total_accounts,
-                            COUNT(DISTINCT uba.user_id) AS total_users,
-                            COUNT(CASE WHEN u.use_status = 1 THEN 1 END) AS active_user_accounts,
-                            COUNT(DISTINCT CASE WHEN u.use_status = 1 THEN uba.user_id END) AS active_users
-                        FROM bank_codes bc
-                        LEFT JOIN user_bank_account uba 
-                            ON uba.bank_swift_code = bc.swift_code 
-                            AND uba.branch_code = bc.branch_code
-                            AND uba.is_deleted = 0
-                        LEFT JOIN "user" u ON uba.user_id = u.id
-                        GROUP BY uba.bank_swift_code, uba.branch_code
-                    """)
-                )
-                
-                # Build result dictionary
-                stats_dict = {}
-                for row in result:
-                    if row.bank_swift_code and row.branch_code:
-                        key = f"{row.bank_swift_code}-{row.branch_code}"
-                        stats_dict[key] = {
-                            "total_accounts": row.total_accounts or 0,
-                            "active_users": row.active_users or 0,
-                        }
-                
-                # Fill in zeros for any missing entries
-                for swift, branch in bank_branch_pairs:
-                    key = f"{swift}-{branch}"
-                    if key not in stats_dict:
-                        stats_dict[key] = {"total_accounts": 0, "active_users": 0}
-                
-                return stats_dict
-                
-        except Exception as e:
-            logger.error(f"一括影響統計取得エラー: {str(e)}")
-            # Return zeros for all entries on error
-            return {f"{swift}-{branch}": {"total_accounts": 0, "active_users": 0} 
-                    for swift, branch in bank_branch_pairs}
+        # 同じキーが重複して渡されても件数が重複計上されないようにする
+        unique_pairs = list(dict.fromkeys((swift, branch) for swift, branch in bank_branch_pairs))
+        chunk_size = max(1, IMPACT_STATS_CHUNK_SIZE)
+        chunks = [unique_pairs[i:i + chunk_size] for i in range(0, len(unique_pairs), chunk_size)]
+        
+        def run_chunk(index: int, chunk: List[tuple]):
+            started = time.perf_counter()
+            try:
+                stats = self._query_impact_stats_chunk(chunk)
+            except Exception as e:
+                logger.error(f"一括影響統計取得エラー（チャンク {index + 1}/{len(chunks)}、{len(chunk)}件）: {str(e)}")
+                if strict:
+                    raise
+                stats = {}
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            logger.info(f"影響統計チャンク {index + 1}/{len(chunks)}: {len(chunk)}件 {elapsed_ms:.1f}ms")
+            return stats, elapsed_ms
+        
+        started = time.perf_counter()
+        workers = max(1, min(IMPACT_STATS_CONCURRENCY, len(chunks)))
+        if workers == 1:
+            results = [run_chunk(index, chunk) for index, chunk in enumerate(chunks)]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(run_chunk, range(len(chunks)), chunks))
+        
+        stats_dict = {}
+        for stats, _ in results:
+            stats_dict.update(stats)
+        
+        # Fill in zeros for any missing entries
+        for swift, branch in bank_branch_pairs:
+            key = f"{swift}-{branch}"
+            if key not in stats_dict:
+                stats_dict[key] = {"total_accounts": 0, "active_users": 0}
+        
+        logger.info(
+            f"影響統計取得完了: {len(unique_pairs)}件 / {len(chunks)}チャンク（並行数 {workers}）"
+            f" 合計 {(time.perf_counter() - started) * 1000:.1f}ms、最大チャンク {max(ms for _, ms in results):.1f}ms"
+        )
+        return stats_dict
 
 class DiffDetector:
     """差分検出サービス"""
     
-    def __init__(self):
+    def __init__(self, db_client: Optional[DatabaseClient] = None):
         self.zengin_client = ZenginClient()
-        self.db_client = DatabaseClient()
+        self.db_client = db_client or DatabaseClient()
+        # 支店名の同義接尾辞は BRANCH_SUFFIX_GROUPS で設定可能
+        self.key_builder = ComparisonKeyBuilder(SuffixMatcher.from_env())
+        self.diff_mode = DIFF_MODE
+        self.diff_engine = DIFF_ENGINE
+        self.diff_workers = DIFF_WORKERS
+        # 差分検出対象の銀行コード（None は全件）
+        self.bank_codes: Optional[set] = None
+        self._latest_data: Optional[List[BankData]] = None
+        # 影響件数スナップショット（未読み込みは False）と、使用した場合の集計時点
+        self.impact_index_enabled = IMPACT_INDEX_ENABLED
+        self._impact_snapshot = False
+        self.impact_stats_as_of: Optional[str] = None
+    
+    def get_latest_data(self) -> List[BankData]:
+        """zengin-codeの最新データ（全銀行、キー順）を取得"""
+        if self._latest_data is None:
+            self._latest_data = self.zengin_client.get_all_banks()
+        return self._latest_data
+    
+    def _get_scoped_latest_data(self) -> List[BankData]:
+        """差分検出対象の銀行に絞り込んだzengin-codeデータ"""
+        latest_data = self.get_latest_data()
+        if self.bank_codes is None:
+            return latest_data
+        logger.info(f"差分検出対象を限定: {len(self.bank_codes)}銀行")
+        return [item for item in latest_data if item.swift_code in self.bank_codes]
+    
+    def _scoped_swift_codes(self) -> Optional[List[str]]:
+        return sorted(self.bank_codes) if self.bank_codes is not None else None
+    
+    def _get_impact_stats(self, bank_branch_pairs: List[tuple]) -> Dict[str, Dict[str, int]]:
+        """影響統計を取得（有効期限内のスナップショットがあれば参照し、なければDBで集計）"""
+        if self.impact_index_enabled and self._impact_snapshot is False:
+            try:
+                snapshot = ImpactIndexStore(s3, S3_BUCKET_NAME, IMPACT_INDEX_S3_PREFIX).load()
+            except Exception as e:
+                logger.warning(f"影響インデックスの読み込みに失敗（DBで集計）: {str(e)}")
+                snapshot = None
+            if snapshot and not is_fresh(snapshot, IMPACT_INDEX_MAX_AGE_HOURS):
+                logger.info(f"影響インデックスが古いためDBで集計: {snapshot['generated_at']}")
+                snapshot = None
+            self._impact_snapshot = snapshot
+            if snapshot:
+                self.impact_stats_as_of = snapshot['generated_at']
+                logger.info(f"影響インデックスを使用: {snapshot['generated_at']}時点 {len(snapshot['stats'])}キー")
+        
+        if self._impact_snapshot:
+            return lookup_impact_stats(self._impact_snapshot, bank_branch_pairs)
+        return self.db_client.get_user_bank_account_impact_stats_batch(bank_branch_pairs)
     
     def detect_differences(self) -> BankUpdateRequestData:
         """差分検出メイン処理"""
-        logger.info("差分検出を開始")
+        logger.info(f"差分検出を開始 (エンジン: {self.diff_engine}, モード: {self.diff_mode})")
         
         try:
-            # 現在のMBankデータを取得
-            current_data = self.db_client.get_mbank_data()
-            
-            # 重複チェック - すべてのレコードをグループ化
-            current_grouped = {}
-            for item in current_data:
-                key = f"{item['swift_code']}-{item['branch_code']}"
-                if key not in current_grouped:
-                    current_grouped[key] = []
-                current_grouped[key].append(item)
+            if self.diff_workers > 1 and self.diff_mode == 'digest':
+                logger.warning("digestモードでは並列差分検出を行いません")
             
-            # 重複をチェック
-            duplicates_found = []
-            for key, items in current_grouped.items():
-                if len(items) > 1:
-                    duplicates_found.append({
-                        'key': key,
-                        'swift_code': items[0]['swift_code'],
-                        'branch_code': items[0]['branch_code'],
-                        'items': items,
-                        'count': len(items)
-                    })
+            if self.diff_workers > 1 and self.diff_mode != 'digest':
+                diffs = self._detect_parallel_differences()
+            elif self.diff_engine == 'merge':
+                diffs = self._detect_merge_differences()
+            else:
+                diffs = self._detect_hash_differences()
             
-            # 重複が見つかった場合は警告を出す
-            if duplicates_found:
-                logger.error(f"重大なエラー: MBankデータに重複が見つかりました: {len(duplicates_found)}件")
-                for dup in duplicates_found[:5]:  # 最初の5件のみログ出力
-                    bank_names = [item['bank_name'] for item in dup['items']]
-                    branch_names = [item['branch_name'] for item in dup['items']]
-                    logger.error(f"重複: {dup['key']} - 件数: {dup['count']}, 銀行名: {bank_names}, 支店名: {branch_names}")
+            # 重複行の解消計画を作成し、重複キーの差分は残す行を基準にする
+            dedup_plan = self._create_dedup_plan()
+            if dedup_plan:
+                diffs = self._apply_dedup_plan(diffs, dedup_plan)
             
-            logger.info(f"MBankデータ件数: {len(current_data)} (ユニークキー数: {len(current_grouped)})")
+            # サマリーを作成
+            summary = self._create_summary(diffs, dedup_plan)
             
-            # zengin-codeから最新データを取得
-            latest_data = self.zengin_client.get_all_banks()
-            latest_dict = {f"{item.swift_code}-{item.branch_code}": item 
-                          for item in latest_data}
-            logger.info(f"zengin-codeデータ件数: {len(latest_dict)}")
+            logger.info(f"差分検出完了: {len(diffs)}件の差分を検出")
             
-            diffs = []
-            bank_codes_for_impact = []  # 影響統計が必要な銀行コードのリスト
+            return BankUpdateRequestData(
+                diffs=diffs,
+                summary=summary,
+                total_changes=len(diffs),
+                dedup_plan=dedup_plan
+            )
             
-            # 新規追加と更新を検出
-            for key, new_item in latest_dict.items():
-                if key not in current_grouped:
-                    # 新規追加
-                    diff = BankDiff(
-                        action="create",
-                        key=key,
-                        old_data=None,
-                        new_data=new_item
-                    )
+        except Exception as e:
+            logger.error(f"差分検出エラー: {str(e)}")
+            raise
+    
+    def _detect_hash_differences(self) -> List[BankDiff]:
+        """両側をキーごとのdictにまとめて差分を検出（hashエンジン）"""
+        # zengin-codeから最新データを取得
+        latest_data = self._get_scoped_latest_data()
+        latest_dict = {f"{item.swift_code}-{item.branch_code}": item 
+                      for item in latest_data}
+        logger.info(f"zengin-codeデータ件数: {len(latest_dict)}")
+        
+        # 現在のMBankデータを取得（ストリームを直接キーごとにまとめる）
+        if self.diff_mode == 'digest':
+            current_rows_iter, unchanged_keys = self._get_mbank_data_by_digest(latest_dict)
+        else:
+            current_rows_iter = self.db_client.iter_mbank_rows(swift_codes=self._scoped_swift_codes())
+            unchanged_keys = set()
+        current_rows, duplicate_rows, row_count = group_mbank_rows(current_rows_iter)
+        
+        # 重複が見つかった場合は警告を出す
+        if duplicate_rows:
+            logger.error(f"重大なエラー: MBankデータに重複が見つかりました: {len(duplicate_rows)}件")
+            for key, rows in list(duplicate_rows.items())[:5]:  # 最初の5件のみログ出力
+                bank_names = [row[1] for row in rows]
+                branch_names = [row[4] for row in rows]
+                logger.error(f"重複: {key} - 件数: {len(rows)}, 銀行名: {bank_names}, 支店名: {branch_names}")
+        
+        logger.info(f"MBankデータ件数: {row_count} (ユニークキー数: {len(current_rows)}, ダイジェスト一致: {len(unchanged_keys)})")
+        
+        diffs = []
+        bank_codes_for_impact = []  # 影響統計が必要な銀行コードのリスト
+        
+        # 新規追加と更新を検出
+        for key, new_item in latest_dict.items():
+            if key in unchanged_keys:
+                # ダイジェストが一致（DB側と完全に同一）
+                continue
+            current_row = current_rows.get(key)
+            if current_row is None:
+                # 新規追加
+                diff = BankDiff(
+                    action="create",
+                    key=key,
+                    old_data=None,
+                    new_data=new_item
+                )
+                diffs.append(diff)
+            else:
+                diff = self._build_update_diff(key, new_item, duplicate_rows.get(key) or [current_row])
+                if diff:
                     diffs.append(diff)
-                else:
-                    # 重複レコードがある場合
-                    if len(current_grouped[key]) > 1:
-                        # 重複している各レコードをzengin-codeと比較
-                        has_diff = False
-                        diff_items = []
-                        
-                        for item in current_grouped[key]:
-                            if self._is_data_different(item, new_item):
-                                has_diff = True
-                                diff_items.append(item)
-                        
-                        if has_diff:
-                            # 重複レコードの中に差分があるものが存在
-                            logger.warning(f"重複レコード内で差分を検出: {key} - 重複数: {len(current_grouped[key])}, 差分数: {len(diff_items)}")
-                            for item in diff_items:
-                                logger.debug(f"  差分レコード: {item['bank_name']}/{item['branch_name']} -> {new_item.bank_name}/{new_item.branch_name}")
-                            
-                            # 最初の差分レコードを代表として使用
-                            old_data = BankData(**diff_items[0])
-                            diff = BankDiff(
-                                action="update",
-                                key=key,
-                                old_data=old_data,
-                                new_data=new_item,
-                                total_accounts=0,
-                                active_users=0
-                            )
-                            diffs.append(diff)
-                            bank_codes_for_impact.append((new_item.swift_code, new_item.branch_code))
-                    else:
-                        # 更新チェック（重複がない場合）
-                        current_item = current_grouped[key][0]  # 単一レコード
-                        if self._is_data_different(current_item, new_item):
-                            logger.debug(f"差分検出: {key} - 現在: {current_item['bank_name']}/{current_item['branch_name']} -> 新規: {new_item.bank_name}/{new_item.branch_name}")
-                            old_data = BankData(**current_item)
-                            diff = BankDiff(
-                                action="update",
-                                key=key,
-                                old_data=old_data,
-                                new_data=new_item,
-                                total_accounts=0,  # 後で一括更新
-                                active_users=0  # 後で一括更新
-                            )
-                            diffs.append(diff)
-                            bank_codes_for_impact.append((new_item.swift_code, new_item.branch_code))
+                    bank_codes_for_impact.append((new_item.swift_code, new_item.branch_code))
+        
+        # 削除を検出（mergeエンジンと同じく (swift_code, branch_code) 順）
+        for key, current_row in sorted(current_rows.items(), key=lambda item: mbank_row_key(item[1])):
+            if key not in latest_dict:
+                diff = self._build_delete_diff(key, duplicate_rows.get(key) or [current_row])
+                diffs.append(diff)
+                bank_codes_for_impact.append((diff.old_data.swift_code, diff.old_data.branch_code))
+        
+        # 影響統計を一括取得
+        if bank_codes_for_impact:
+            logger.info(f"影響統計を一括取得: {len(bank_codes_for_impact)}件")
+            impact_stats = self._get_impact_stats(bank_codes_for_impact)
             
-            # 削除を検出
-            for key, items in current_grouped.items():
-                if key not in latest_dict:
-                    # 削除対象（重複があっても削除として扱う）
-                    old_data = BankData(**items[0])  # 最初のレコードを代表として使用
-                    diff = BankDiff(
-                        action="delete",
-                        key=key,
-                        old_data=old_data,
-                        new_data=None,
-                        total_accounts=0,  # 後で一括更新
-                        active_users=0  # 後で一括更新
-                    )
-                    diffs.append(diff)
-                    bank_codes_for_impact.append((old_data.swift_code, old_data.branch_code))
-                    if len(items) > 1:
-                        logger.warning(f"削除対象に重複レコードあり: {key} - 重複数: {len(items)}")
+            # 差分に影響統計を適用
+            for diff in diffs:
+                if diff.action in ["update", "delete"]:
+                    stats = impact_stats.get(diff.key, {"total_accounts": 0, "active_users": 0})
+                    diff.total_accounts = stats["total_accounts"]
+                    diff.active_users = stats["active_users"]
+        
+        return diffs
+    
+    def _detect_merge_differences(self) -> List[BankDiff]:
+        """マージ結合エンジンで差分を検出"""
+        return self._collect_differences(self.iter_differences())
+    
+    def _detect_parallel_differences(self) -> List[BankDiff]:
+        """swift_code の範囲ごとにワーカープロセスで取得・比較し、範囲の順に結合"""
+        latest_data = self._get_scoped_latest_data()
+        logger.info(f"zengin-codeデータ件数: {len(latest_data)}")
+        
+        partitions = partition_by_swift_code(latest_data, self.diff_workers)
+        logger.info(f"並列差分検出: {len(partitions)}プロセス (" + ", ".join(
+            f"{p.lower or ''}〜{p.upper or ''}: {len(p.items)}件" for p in partitions) + ")")
+        
+        partial_diffs = run_partitions(self._diff_partition, partitions)
+        merged = (diff for diffs in partial_diffs for diff in diffs)
+        return self._collect_differences(self._with_impact_stats(merged))
+    
+    def _diff_partition(self, partition: SwiftCodePartition) -> List[BankDiff]:
+        """ワーカープロセスで1つの範囲の差分を検出（影響統計は親プロセスで一括取得）"""
+        db_client = self.db_client.for_worker()
+        current_rows = db_client.iter_mbank_rows(ordered=True, swift_code_range=(partition.lower, partition.upper),
+                                                 swift_codes=self._scoped_swift_codes())
+        return list(self._iter_merge_diffs(partition.items, current_rows, set()))
+    
+    def _collect_differences(self, diffs: Iterable[BankDiff]) -> List[BankDiff]:
+        """キー順の差分を既存エンジンと同じ並び（新規・更新 → 削除）で返す"""
+        result = []
+        delete_diffs = []
+        for diff in diffs:
+            (delete_diffs if diff.action == "delete" else result).append(diff)
+        result.extend(delete_diffs)
+        return result
+    
+    def iter_differences(self) -> Iterator[BankDiff]:
+        """(swift_code, branch_code) 順のマージ結合で差分を逐次生成（影響統計はバッチ単位で付与）"""
+        # zengin-codeのデータはバンクコード・支店コード順に生成される
+        latest_data = self._get_scoped_latest_data()
+        logger.info(f"zengin-codeデータ件数: {len(latest_data)}")
+        
+        if self.diff_mode == 'digest':
+            latest_dict = {f"{item.swift_code}-{item.branch_code}": item for item in latest_data}
+            fetched_rows, unchanged_keys = self._get_mbank_data_by_digest(latest_dict)
+            del latest_dict
+            current_rows_iter = iter(sorted(fetched_rows, key=mbank_row_key))
+        else:
+            current_rows_iter = self.db_client.iter_mbank_rows(ordered=True, swift_codes=self._scoped_swift_codes())
+            unchanged_keys = set()
+        
+        return self._with_impact_stats(self._iter_merge_diffs(latest_data, current_rows_iter, unchanged_keys))
+    
+    def _iter_merge_diffs(self, latest_data: List[BankData], current_rows: Iterator[tuple], unchanged_keys: set) -> Iterator[BankDiff]:
+        """マージ結合の結果から差分を生成（影響統計は未設定）"""
+        row_count = 0
+        unique_keys = 0
+        duplicate_count = 0
+        joined = merge_join(
+            latest_data,
+            current_rows,
+            latest_key=lambda item: (item.swift_code, item.branch_code),
+            current_key=mbank_row_key,
+        )
+        for (swift_code, branch_code), new_item, rows in joined:
+            # MBank側のキーはhashエンジンと同じく行の値から作る（NULLは "None"）
+            key = f"{swift_code}-{branch_code}" if new_item is not None else f"{rows[0][0]}-{rows[0][3]}"
+            if rows:
+                row_count += len(rows)
+                unique_keys += 1
+                if len(rows) > 1:
+                    duplicate_count += 1
+                    if duplicate_count <= 5:  # 最初の5件のみログ出力
+                        bank_names = [row[1] for row in rows]
+                        branch_names = [row[4] for row in rows]
+                        logger.error(f"重複: {key} - 件数: {len(rows)}, 銀行名: {bank_names}, 支店名: {branch_names}")
             
-            # 影響統計を一括取得
+            if new_item is None:
+                yield self._build_delete_diff(key, rows)
+            elif key in unchanged_keys:
+                # ダイジェストが一致（DB側と完全に同一）
+                continue
+            elif not rows:
+                # 新規追加
+                yield BankDiff(
+                    action="create",
+                    key=key,
+                    old_data=None,
+                    new_data=new_item
+                )
+            else:
+                diff = self._build_update_diff(key, new_item, rows)
+                if diff:
+                    yield diff
+        
+        if duplicate_count:
+            logger.error(f"重大なエラー: MBankデータに重複が見つかりました: {duplicate_count}件")
+        logger.info(f"MBankデータ件数: {row_count} (ユニークキー数: {unique_keys}, ダイジェスト一致: {len(unchanged_keys)})")
+    
+    def _with_impact_stats(self, diffs: Iterator[BankDiff], batch_size: Optional[int] = None) -> Iterator[BankDiff]:
+        """差分に影響統計を付与しながら順に返す（更新・削除が batch_size 件たまるごとに一括取得）"""
+        batch_size = batch_size or IMPACT_STATS_BATCH_SIZE
+        pending: List[BankDiff] = []
+        bank_codes_for_impact: List[tuple] = []
+        
+        def flush():
             if bank_codes_for_impact:
                 logger.info(f"影響統計を一括取得: {len(bank_codes_for_impact)}件")
-                impact_stats = self.db_client.get_user_bank_account_impact_stats_batch(bank_codes_for_impact)
-                
-                # 差分に影響統計を適用
-                for diff in diffs:
+                impact_stats = self._get_impact_stats(bank_codes_for_impact)
+                for diff in pending:
                     if diff.action in ["update", "delete"]:
                         stats = impact_stats.get(diff.key, {"total_accounts": 0, "active_users": 0})
                         diff.total_accounts = stats["total_accounts"]
                         diff.active_users = stats["active_users"]
+            flushed = list(pending)
+            pending.clear()
+            bank_codes_for_impact.clear()
+            return flushed
+        
+        for diff in diffs:
+            pending.append(diff)
+            if diff.action in ["update", "delete"]:
+                data = diff.new_data if diff.action == "update" else diff.old_data
+                bank_codes_for_impact.append((data.swift_code, data.branch_code))
+                if len(bank_codes_for_impact) >= batch_size:
+                    yield from flush()
+        yield from flush()
+    
+    def _build_update_diff(self, key: str, new_item: BankData, rows: List[tuple]) -> Optional[BankDiff]:
+        """MBankの行（重複時は複数）とzengin-codeを比較し、差分があれば更新差分を返す"""
+        new_key = self.key_builder.from_bank_data(new_item)
+        # 重複レコードがある場合
+        if len(rows) > 1:
+            rows = self._ordered_duplicate_rows(rows)
+            # 重複している各レコードをzengin-codeと比較
+            diff_items = []
+            diff_fields = []
             
-            # サマリーを作成
-            summary = self._create_summary(diffs)
+            for row in rows:
+                item_fields = changed_fields(self._row_key(row), new_key)
+                if item_fields:
+                    diff_items.append(row)
+                    diff_fields.append(item_fields)
             
-            logger.info(f"差分検出完了: {len(diffs)}件の差分を検出")
+            if not diff_items:
+                return None
             
-            return BankUpdateRequestData(
-                diffs=diffs,
-                summary=summary,
-                total_changes=len(diffs)
-            )
+            # 重複レコードの中に差分があるものが存在
+            logger.warning(f"重複レコード内で差分を検出: {key} - 重複数: {len(rows)}, 差分数: {len(diff_items)}")
+            for row in diff_items:
+                logger.debug(f"  差分レコード: {row[1]}/{row[4]} -> {new_item.bank_name}/{new_item.branch_name}")
             
+            # 内容順で最初の差分レコードを代表として使用
+            current_row = diff_items[0]
+            item_fields = diff_fields[0]
+        else:
+            # 更新チェック（重複がない場合）
+            current_row = rows[0]
+            item_fields = changed_fields(self._row_key(current_row), new_key)
+            if not item_fields:
+                return None
+            logger.debug(f"差分検出: {key} - 現在: {current_row[1]}/{current_row[4]} -> 新規: {new_item.bank_name}/{new_item.branch_name}")
+        
+        return BankDiff(
+            action="update",
+            key=key,
+            old_data=BankData(*current_row),
+            new_data=new_item,
+            total_accounts=0,  # 後で一括更新
+            active_users=0,  # 後で一括更新
+            changed_fields=item_fields
+        )
+    
+    def _build_delete_diff(self, key: str, rows: List[tuple]) -> BankDiff:
+        """削除差分を返す（重複があっても削除として扱い、内容順で最初のレコードを代表として使用）"""
+        if len(rows) > 1:
+            logger.warning(f"削除対象に重複レコードあり: {key} - 重複数: {len(rows)}")
+            rows = self._ordered_duplicate_rows(rows)
+        return BankDiff(
+            action="delete",
+            key=key,
+            old_data=BankData(*rows[0]),
+            new_data=None,
+            total_accounts=0,  # 後で一括更新
+            active_users=0  # 後で一括更新
+        )
+    
+    @staticmethod
+    def _ordered_duplicate_rows(rows: List[tuple]) -> List[tuple]:
+        """重複レコードを内容順に並べる（代表行が取得順やエンジンによって変わらないようにする）"""
+        return sorted(rows, key=lambda row: tuple('' if value is None else value for value in row))
+    
+    def _create_dedup_plan(self) -> Optional[Dict[str, Any]]:
+        """PostgreSQL側で重複キーを検出し、解消計画を作成（重複がない場合は None）"""
+        try:
+            duplicate_rows = self.db_client.get_mbank_duplicates()
         except Exception as e:
-            logger.error(f"差分検出エラー: {str(e)}")
-            raise
+            logger.error(f"重複解消計画の作成をスキップ: {str(e)}")
+            return None
+        if not duplicate_rows:
+            return None
+        latest_dict = {f"{item.swift_code}-{item.branch_code}": item for item in self.get_latest_data()}
+        plan = build_dedup_plan(duplicate_rows, latest_dict, self.key_builder)
+        logger.warning(f"MBank重複の解消計画を作成: {plan['total_groups']}キー, 論理削除 {plan['total_delete_rows']}行")
+        return plan
     
-    def _is_data_different(self, current: Dict, new: BankData) -> bool:
-        """データが異なるかどうかを判定"""
-        fields_to_check = [
-            'bank_name', 'bank_name_kana', 'branch_name', 'branch_name_kana'
-        ]
-        suffix_sets: list[list[str]] = [["支店", "支所", "出張所"]]
-        flat_suffixes = set(sum(suffix_sets, []))
-
-        def split_suffix(name: str):
-            for s in flat_suffixes:
-                if name.endswith(s):
-                    return name[:-len(s)].strip(), s
-            return name.strip(), ''
-
-        def is_equivalent_suffix(s1: str, s2: str) -> bool:
-            if s1 == s2:
-                return True
-            for group in suffix_sets:
-                if s1 in group and s2 in group:
-                    return True
-            return False
-
-        for field in fields_to_check:
-            current_value = current.get(field)
-            new_value = getattr(new, field)
-
-            # None 正規化
-            if current_value is None:
-                current_value = ""
-            if new_value is None:
-                new_value = ""
-
-            # カナフィールドは半角カナ比較
-            if field.endswith('_kana'):
-                current_value = self.zengin_client._convert_kana_to_hankaku(str(current_value))
-                new_value = self.zengin_client._convert_kana_to_hankaku(str(new_value))
-
-            # 特殊: branch_name の suffix 同義語処理
-            if field == 'branch_name':
-                base_cur, suf_cur = split_suffix(str(current_value))
-                base_new, suf_new = split_suffix(str(new_value))
-                if base_cur != base_new:
-                    return True
-                if suf_cur == suf_new or is_equivalent_suffix(suf_cur, suf_new) or suf_cur == '' or suf_new == '':
+    def _apply_dedup_plan(self, diffs: List[BankDiff], dedup_plan: Dict[str, Any]) -> List[BankDiff]:
+        """重複キーの差分の代表行を解消計画で残す行に置き換える
+        
+        executorは解消計画を差分より先に実行するため、残す行がzengin-codeと一致する場合の更新差分は不要になる。
+        """
+        keep_rows = {}
+        for group in dedup_plan['groups']:
+            keep_row = next(row for row in group['rows'] if row['id'] == group['keep_id'])
+            keep_rows[group['key']] = BankData(**{name: keep_row[name] for name in MBANK_COLUMNS})
+        
+        result = []
+        for diff in diffs:
+            keep_data = keep_rows.get(diff.key)
+            if keep_data is None or diff.action == "create":
+                result.append(diff)
+                continue
+            diff.old_data = keep_data
+            if diff.action == "update":
+                diff.changed_fields = changed_fields(
+                    self.key_builder.from_bank_data(keep_data), self.key_builder.from_bank_data(diff.new_data)
+                )
+                if not diff.changed_fields:
+                    logger.info(f"重複解消により更新不要: {diff.key}")
                     continue
-                return True
+            result.append(diff)
+        return result
+    
+    def _get_mbank_data_by_digest(self, latest_dict: Dict[str, BankData]) -> tuple:
+        """行ダイジェストを比較し、差分・削除・重複のあるキーのみ全カラムを取得
+        
+        Returns:
+            tuple: (取得したMBankの行タプル, ダイジェストが一致したキーの集合)
+        """
+        digests_by_key: Dict[str, List[int]] = {}
+        key_pairs: Dict[str, tuple] = {}
+        for swift_code, branch_code, row_digest in self.db_client.get_mbank_digests(self._scoped_swift_codes()):
+            key = f"{swift_code}-{branch_code}"
+            digests_by_key.setdefault(key, []).append(row_digest)
+            key_pairs[key] = (swift_code, branch_code)
+        
+        unchanged_keys = set()
+        keys_to_fetch = []
+        for key, row_digests in digests_by_key.items():
+            new_item = latest_dict.get(key)
+            if new_item is not None and len(row_digests) == 1 and row_digests[0] == digest_bank_data(new_item):
+                unchanged_keys.add(key)
             else:
-                if str(current_value).strip() != str(new_value).strip():
-                    return True
-
-        return False
+                # 内容の相違・削除候補・重複はすべて全カラムで比較する
+                keys_to_fetch.append(key_pairs[key])
+        
+        logger.info(f"ダイジェスト比較: 一致 {len(unchanged_keys)}件, 全カラム取得 {len(keys_to_fetch)}件")
+        return self.db_client.get_mbank_rows_by_keys(keys_to_fetch), unchanged_keys
+    
+    def _row_key(self, row: tuple):
+        """MBankの行タプルから比較キーを生成"""
+        return self.key_builder.build(row[1], row[2], row[4], row[5])
     
-    def _create_summary(self, diffs: List[BankDiff]) -> str:
+    def _create_summary(self, diffs: List[BankDiff], dedup_plan: Optional[Dict[str, Any]] = None) -> str:
         """差分のサマリーを作成"""
         create_count = len([d for d in diffs if d.action == "create"])
         update_count = len([d for d in diffs if d.action == "update"])
@@ -613,6 +1217,8 @@ class DiffDetector:
             summary_parts.append(f"更新: {update_count}件")
         if delete_count > 0:
             summary_parts.append(f"削除: {delete_count}件")
+        if dedup_plan:
+            summary_parts.append(f"重複解消: {dedup_plan['total_groups']}キー（{dedup_plan['total_delete_rows']}行を論理削除）")
         
         if not summary_parts:
             return "変更なし"
@@ -621,94 +1227,268 @@ class DiffDetector:
         
         # 影響するアカウントがある場合は追記
         if total_affected_accounts > 0:
-            base_summary += f" (UserBankAccount影響: {total_affected_accounts}件、稼働ユーザー: {total_active_users}名)"
+            as_of = ""
+            if self.impact_stats_as_of:
+                as_of = f"、{datetime.fromisoformat(self.impact_stats_as_of).strftime('%Y-%m-%d %H:%M')} UTC時点"
+            base_summary += f" (UserBankAccount影響: {total_affected_accounts}件、稼働ユーザー: {total_active_users}名{as_of})"
         
         return base_summary
 
 
-def store_diff_data_to_s3(diff_id: str, diffs: List[BankDiff]) -> str:
-    """大きな差分データをS3に保存"""
+def store_diff_data_to_s3(diff_id: str, diffs: List[BankDiff], content_hash: Optional[str] = None) -> Dict[str, Optional[str]]:
+    """差分データを行区切りJSON（gzip）でS3にストリーミング保存（content_hash はメタデータとして記録）
+    
+    差分データには影響件数（total_accounts / active_users）が含まれ、内容ハッシュには含まれないため、
+    同じ内容ハッシュでも以前のデータは再利用せず差分ごとに保存する。
+    
+    Returns:
+        Dict: data（差分データのキー）と manifest（シャード形式のマニフェストのキー、単一ファイル形式は None）
+    """
     try:
-        # 差分データをJSON形式に変換
-        diffs_data = [asdict(diff) for diff in diffs]
-        diffs_json = json.dumps(diffs_data, ensure_ascii=False)
-        
-        # gzipで圧縮
-        compressed_data = gzip.compress(diffs_json.encode('utf-8'))
-        
-        # S3キーを生成
-        s3_key = f"diffs/{ENVIRONMENT}/{diff_id}/full_diffs.json.gz"
-        
-        # S3にアップロード
-        s3.put_object(
-            Bucket=S3_BUCKET_NAME,
-            Key=s3_key,
-            Body=compressed_data,
-            ContentType='application/json',
-            ContentEncoding='gzip',
-            Metadata={
-                'diff_id': diff_id,
-                'original_size': str(len(diffs_json)),
-                'compressed_size': str(len(compressed_data)),
-                'diff_count': str(len(diffs))
-            }
-        )
+        sharded = DIFF_ARTIFACT_LAYOUT == 'sharded'
+        prefix = f"diffs/{ENVIRONMENT}/{diff_id}/"
+        keys = artifact_keys(prefix)
+        result = {'data': keys['data'], 'manifest': keys['manifest'] if sharded else None}
         
-        logger.info(f"差分データをS3に保存: s3://{S3_BUCKET_NAME}/{s3_key}")
-        return s3_key
+        # 1件ずつ直列化してgzip圧縮しながらアップロード（差分リスト全体のJSONは作らない）
+        metadata = {
+            'diff_id': diff_id,
+            **({'content_hash': content_hash} if content_hash else {})
+        }
+        if sharded:
+            written = write_sharded_diff_artifact(s3, S3_BUCKET_NAME, prefix, diffs, metadata=metadata,
+                                                  shard_size=DIFF_ARTIFACT_SHARD_SIZE)
+            layout = f"{len(written['manifest']['shards'])}シャード"
+        else:
+            written = write_diff_artifact(s3, S3_BUCKET_NAME, result['data'], diffs, metadata=metadata)
+            layout = "単一ファイル"
+        
+        logger.info(
+            f"差分データをS3に保存: s3://{S3_BUCKET_NAME}/{result['data']} ({layout}、"
+            f"{written['original_size'] / 1024:.2f}KB → 圧縮後 {written['compressed_size'] / 1024:.2f}KB)"
+        )
+        return result
         
     except Exception as e:
         logger.error(f"S3保存エラー: {str(e)}")
         raise
 
+def get_zengin_data_version() -> Dict[str, str]:
+    """zengin-codeのsource-dataのmd5とupdated_atを取得"""
+    import zengin_code
+    data_dir = zengin_code.data_dir()
+    version = {}
+    for name in ('md5', 'updated_at'):
+        with open(os.path.join(data_dir, name), 'r', encoding='utf-8') as f:
+            version[name] = f.read().strip()
+    return version
+
+def compute_input_fingerprint(db_client: DatabaseClient) -> Dict[str, Any]:
+    """差分検出の入力（zengin-code + MBank）のフィンガープリントを計算"""
+    zengin_version = get_zengin_data_version()
+    mbank_checksum = db_client.get_mbank_checksum()
+    components = {
+        'fingerprint_version': FINGERPRINT_VERSION,
+        'branch_suffix_groups': [list(group) for group in parse_suffix_groups(os.getenv(SUFFIX_GROUPS_ENV))],
+        'zengin_md5': zengin_version['md5'],
+        'zengin_updated_at': zengin_version['updated_at'],
+        'mbank_row_count': mbank_checksum['row_count'],
+        'mbank_checksum': mbank_checksum['checksum'],
+    }
+    fingerprint = hashlib.sha256(
+        json.dumps(components, sort_keys=True).encode('utf-8')
+    ).hexdigest()
+    return {'fingerprint': fingerprint, 'components': components}
+
+def get_stored_fingerprint() -> Optional[Dict[str, Any]]:
+    """前回完了時のフィンガープリントと、その実行で作成・再利用した差分IDをDynamoDBから取得"""
+    try:
+        table = dynamodb.Table(DIFF_TABLE_NAME)
+        response = table.get_item(
+            Key={'id': FINGERPRINT_ITEM_ID, 'timestamp': FINGERPRINT_ITEM_TIMESTAMP},
+            ProjectionExpression='fingerprint, diff_id'
+        )
+        return response.get('Item')
+    except Exception as e:
+        logger.error(f"フィンガープリント取得エラー: {str(e)}")
+        return None
+
+def is_fingerprint_settled(stored: Dict[str, Any]) -> bool:
+    """保存済みフィンガープリントの差分が通知済みのまま有効か
+
+    差分なしで完了した実行（diff_id なし）は常に有効。差分がある場合は、承認待ち（Slackスレッドあり・期限内）か
+    承認・実行済みの場合のみ有効とし、却下・実行失敗・期限切れの差分は同じ入力でも差分検出からやり直して再通知する。
+    """
+    diff_id = stored.get('diff_id')
+    if not diff_id:
+        return True
+    try:
+        diff_item = DIFF_REPOSITORY.get(diff_id, attributes=('status', 'message_ts', 'ttl'), consistent=True)
+    except Exception as e:
+        logger.error(f"フィンガープリントの差分状態取得エラー: {str(e)}")
+        return False
+    if not diff_item:
+        return False
+    status = diff_item.get('status')
+    if status == 'pending':
+        now = int(datetime.now(timezone.utc).timestamp())
+        return bool(diff_item.get('message_ts')) and int(diff_item.get('ttl', now + 1)) > now
+    return status in FINGERPRINT_SETTLED_STATUSES
+
+def store_fingerprint(fingerprint: Dict[str, Any], execution_id: str, diff_id: Optional[str] = None):
+    """完了した実行のフィンガープリントをDynamoDBに保存"""
+    try:
+        table = dynamodb.Table(DIFF_TABLE_NAME)
+        item = {
+            'id': FINGERPRINT_ITEM_ID,
+            'timestamp': FINGERPRINT_ITEM_TIMESTAMP,
+            'fingerprint': fingerprint['fingerprint'],
+            'components': fingerprint['components'],
+            'execution_id': execution_id,
+            'updated_at': datetime.now(timezone.utc).isoformat(),
+            'environment': ENVIRONMENT,
+        }
+        if diff_id:
+            item['diff_id'] = diff_id
+        table.put_item(Item=item)
+        logger.info(f"フィンガープリントを保存: {fingerprint['fingerprint']}")
+    except Exception as e:
+        logger.error(f"フィンガープリント保存エラー: {str(e)}")
+
+def get_comparison_scope() -> str:
+    """比較ルールのハッシュ（変更時は銀行単位のベースラインを使わず全件比較）"""
+    return build_scope({
+        'fingerprint_version': FINGERPRINT_VERSION,
+        'normalization_rules_version': NORMALIZATION_RULES_VERSION,
+        'branch_suffix_groups': [list(group) for group in parse_suffix_groups(os.getenv(SUFFIX_GROUPS_ENV))],
+    })
+
+def plan_bank_scope(diff_detector: DiffDetector, input_fingerprint: Optional[Dict[str, Any]], force: bool) -> Optional[Dict[str, Any]]:
+    """銀行単位のフィンガープリントをベースラインと比較し、差分検出の対象銀行を設定"""
+    try:
+        store = BankFingerprintStore(s3, S3_BUCKET_NAME, BANK_FINGERPRINT_S3_PREFIX)
+        fingerprints = compute_bank_fingerprints(diff_detector.get_latest_data())
+        mbank_checksum = None
+        if input_fingerprint:
+            components = input_fingerprint['components']
+            mbank_checksum = {'row_count': components['mbank_row_count'], 'checksum': components['mbank_checksum']}
+        plan = plan_scope(
+            store.load_current(),
+            fingerprints,
+            get_comparison_scope(),
+            mbank_checksum,
+            FULL_RECONCILIATION_INTERVAL_DAYS,
+            force_full=force
+        )
+        diff_detector.bank_codes = plan['bank_codes']
+        if plan['bank_codes'] is None:
+            logger.info(f"全件比較を実行: {plan['reason']}")
+        else:
+            logger.info(f"変更のあった銀行のみ比較: {len(plan['bank_codes'])}銀行 / {len(fingerprints)}銀行")
+        plan['store'] = store
+        return plan
+    except Exception as e:
+        logger.warning(f"銀行フィンガープリント比較エラー（全件比較を実行）: {str(e)}")
+        diff_detector.bank_codes = None
+        return None
+
+def store_bank_baseline(bank_scope: Optional[Dict[str, Any]], diff_id: Optional[str] = None):
+    """銀行単位のベースラインを保存（差分ありの場合は承認待ちとして保存し、実行成功時にexecutorが昇格）"""
+    if not bank_scope:
+        return
+    try:
+        store = bank_scope['store']
+        if diff_id:
+            key = store.save_pending(diff_id, bank_scope['baseline'])
+        else:
+            key = store.save_current(bank_scope['baseline'])
+        logger.info(f"銀行フィンガープリントを保存: s3://{S3_BUCKET_NAME}/{key}")
+    except Exception as e:
+        logger.error(f"銀行フィンガープリント保存エラー: {str(e)}")
+
 def check_recent_execution() -> Optional[Dict[str, Any]]:
-    """過去5分以内の実行があるかチェック"""
+    """過去5分以内の実行があるかチェック（StatusIndex の承認待ちを時刻範囲でQuery）"""
     try:
-        from datetime import datetime, timezone, timedelta
-        
         # 5分前の時刻を計算
         five_minutes_ago = (datetime.now(timezone.utc) - timedelta(minutes=5)).isoformat()
         
-        # DynamoDBから最近の実行をチェック
-        table = dynamodb.Table(DIFF_TABLE_NAME)
-        response = table.scan(
-            FilterExpression='#status = :status AND #timestamp > :recent_time',
-            ExpressionAttributeNames={
-                '#status': 'status',
-                '#timestamp': 'timestamp'
-            },
-            ExpressionAttributeValues={
-                ':status': 'pending',
-                ':recent_time': five_minutes_ago
-            },
-            Limit=1  # 1件でも見つかれば十分
-        )
-        
-        if response.get('Items'):
-            return response['Items'][0]
-        return None
+        # DynamoDBから最近の実行をチェック（1件でも見つかれば十分）
+        recent = DIFF_REPOSITORY.query_by_status('pending', since=five_minutes_ago,
+                                                 attributes=('status', 'message_ts'), page_size=1)
+        return next(recent, None)
         
     except Exception as e:
         logger.error(f"重複実行チェックエラー: {str(e)}")
         return None
 
-def store_diff_data(update_request: BankUpdateRequestData, message_ts: str | None = None) -> str:
+def refresh_impact_index(db_client: DatabaseClient, keys: Optional[List[str]] = None) -> Dict[str, Any]:
+    """影響インデックスを更新
+
+    スナップショットがない・古い場合、または最後の全件集計（full_built_at）から IMPACT_INDEX_MAX_AGE_HOURS 時間以上
+    経過している場合は全件を再集計する。keys 指定時（差分の実行後）はそのキーのみ、
+    定期実行ではウォーターマーク（generated_at）以降に変更のあったキーのみを再集計する。
+    """
+    store = ImpactIndexStore(s3, S3_BUCKET_NAME, IMPACT_INDEX_S3_PREFIX)
+    snapshot = store.load()
+    started = datetime.now(timezone.utc)
+    if needs_full_rebuild(snapshot, IMPACT_INDEX_MAX_AGE_HOURS, now=started):
+        snapshot = build_snapshot(db_client.get_user_bank_account_impact_stats_all(), now=started)
+        mode = 'full'
+        pairs = None
+    elif keys:
+        pairs = [tuple(key.split('-', 1)) for key in keys]
+        snapshot = merge_snapshot(snapshot, db_client.get_user_bank_account_impact_stats_batch(pairs, strict=True))
+        mode = 'incremental'
+    else:
+        pairs = db_client.get_user_bank_account_keys_changed_since(changes_since(snapshot))
+        stats = db_client.get_user_bank_account_impact_stats_batch(pairs, strict=True)
+        snapshot = merge_snapshot(snapshot, stats, generated_at=started)
+        mode = 'changed'
+    s3_key = store.save(snapshot)
+    logger.info(f"影響インデックスを更新 ({mode}): s3://{S3_BUCKET_NAME}/{s3_key} {len(snapshot['stats'])}キー")
+    return {'mode': mode, 'keys': len(snapshot['stats']), 'refreshed_keys': len(pairs) if pairs is not None else None,
+            'generated_at': snapshot['generated_at']}
+
+def store_dedup_plan_to_s3(diff_id: str, dedup_plan: Dict[str, Any]) -> str:
+    """重複解消計画をS3に保存"""
+    s3_key = f"{DEDUP_PLAN_S3_PREFIX}{diff_id}.json"
+    s3.put_object(
+        Bucket=S3_BUCKET_NAME,
+        Key=s3_key,
+        Body=json.dumps(dict(dedup_plan, diff_id=diff_id), ensure_ascii=False, default=str).encode('utf-8'),
+        ContentType='application/json'
+    )
+    logger.info(f"重複解消計画をS3に保存: s3://{S3_BUCKET_NAME}/{s3_key}")
+    return s3_key
+
+def find_pending_diff_by_content_hash(content_hash: str) -> Optional[Dict[str, Any]]:
+    """同じ内容ハッシュで承認待ち（Slackスレッドあり）の差分をStatusIndexから検索"""
+    try:
+        now = int(datetime.now(timezone.utc).timestamp())
+        pending = DIFF_REPOSITORY.query_by_status(
+            'pending',
+            attributes=('message_ts', 'ttl'),
+            filter_expression=boto3.dynamodb.conditions.Attr('content_hash').eq(content_hash)
+                & boto3.dynamodb.conditions.Attr('environment').eq(ENVIRONMENT)
+        )
+        for item in pending:
+            if item.get('message_ts') and int(item.get('ttl', now + 1)) > now:
+                return item
+        return None
+    except Exception as e:
+        logger.error(f"承認待ち差分の検索エラー: {str(e)}")
+        return None
+
+def store_diff_data(update_request: BankUpdateRequestData, message_ts: str | None = None,
+                    content_hash: Optional[str] = None) -> str:
     """差分データをDynamoDBに保存"""
     try:
-        table = dynamodb.Table(DIFF_TABLE_NAME)
-        
         # 一意なIDを生成
         timestamp = datetime.now(timezone.utc).isoformat()
         diff_id = f"diff-{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')}"
         
-        # 全ての差分データをS3に保存
-        diffs_data = [asdict(diff) for diff in update_request.diffs]
-        diffs_json = json.dumps(diffs_data, ensure_ascii=False)
-        data_size = len(diffs_json.encode('utf-8'))
-        logger.info(f"差分データサイズ: {data_size / 1024:.2f}KB")
-        
         # S3に全データを保存（サイズに関わらず統一処理）
-        s3_key = store_diff_data_to_s3(diff_id, update_request.diffs)
+        artifact = store_diff_data_to_s3(diff_id, update_request.diffs, content_hash=content_hash)
         
         # DynamoDBには要約情報のみを保存（表示用）
         summary_diffs = []
@@ -731,15 +1511,31 @@ def store_diff_data(update_request: BankUpdateRequestData, message_ts: str | Non
             'summary': update_request.summary,
             'total_changes': update_request.total_changes,
             'diffs': summary_diffs,  # 表示用の要約データ
-            'diffs_s3_key': s3_key,  # S3の完全データへの参照
+            'diffs_s3_key': artifact['data'],  # S3の完全データへの参照
             'original_diff_count': len(update_request.diffs),
-            'message_ts': message_ts,
             'environment': ENVIRONMENT,
+            'content_hash': content_hash,
             'ttl': int((datetime.now(timezone.utc).timestamp() + 30 * 24 * 60 * 60))  # 30日後にTTL
         }
         
+        # MessageTsIndex はSlackスレッドがある差分だけを対象にする（None は保存しない）
+        if message_ts:
+            item['message_ts'] = message_ts
+        
+        # シャード形式の場合はマニフェスト（シャードごとの範囲・キーインデックス）への参照
+        if artifact['manifest']:
+            item['diffs_manifest_s3_key'] = artifact['manifest']
+        
+        # 重複解消計画はS3に保存し、件数と参照のみを保持
+        if update_request.dedup_plan:
+            item['dedup_plan_s3_key'] = store_dedup_plan_to_s3(diff_id, update_request.dedup_plan)
+            item['dedup_plan_summary'] = {
+                'total_groups': update_request.dedup_plan['total_groups'],
+                'total_delete_rows': update_request.dedup_plan['total_delete_rows'],
+            }
+        
         # DynamoDBに保存
-        table.put_item(Item=item)
+        DIFF_REPOSITORY.put(item)
         
         logger.info(f"差分データをDynamoDBに保存: {diff_id}")
         return diff_id
@@ -755,8 +1551,16 @@ def handler(event: Dict[str, Any], context: Any, logger, metrics) -> Dict[str, A
         import uuid
         from datetime import datetime, timezone
         execution_id = str(uuid.uuid4())[:8]
+        ENGINE_MANAGER.begin_invocation()
+        REPLICA_ENGINE_MANAGER.begin_invocation()
+        DIFF_REPOSITORY.begin_invocation()
         logger.info(f"差分処理を開始 [実行ID: {execution_id}]", event_type="function_start", event_data=event, execution_id=execution_id)
         
+        # 呼び出しごとに latest.json を確認し、公開済みの新しいバージョンに切り替える
+        global zengin_artifact_error
+        with performance_timer(logger, metrics, 'zengin_artifact_sync'):
+            zengin_artifact_error = sync_zengin_artifact()
+        
         # zengin-codeのバージョン情報をログ出力
         try:
             import zengin_code
@@ -767,6 +1571,36 @@ def handler(event: Dict[str, Any], context: Any, logger, metrics) -> Dict[str, A
         except Exception as e:
             logger.warning(f"zengin-codeバージョン情報取得エラー: {str(e)}", execution_id=execution_id)
         
+        # 影響インデックスの更新（定期実行・差分実行後）は差分検出とは別に処理する
+        if isinstance(event, dict) and event.get('trigger') == 'impact_index_refresh':
+            with performance_timer(logger, metrics, 'impact_index_refresh'):
+                refreshed = refresh_impact_index(DatabaseClient(), event.get('keys'))
+            metrics.emit_business_metric('ImpactIndexRefreshed', 1, {'Mode': refreshed['mode']})
+            return {
+                'statusCode': 200,
+                'body': json.dumps({'message': '影響インデックスを更新', **refreshed}, ensure_ascii=False)
+            }
+        
+        # zengin-codeデータアーティファクトの公開（定期実行）
+        if isinstance(event, dict) and event.get('trigger') == 'zengin_artifact_publish':
+            with performance_timer(logger, metrics, 'zengin_artifact_publish'):
+                published = publish_latest(ZENGIN_ARTIFACT_STORE, slack_client_for_update, force=bool(event.get('force')))
+            metrics.emit_business_metric('ZenginArtifactPublished', 1 if published['published'] else 0)
+            return {
+                'statusCode': 200,
+                'body': json.dumps({'message': 'zenginデータアーティファクトの公開を確認', **published}, ensure_ascii=False)
+            }
+        
+        # 最新のzenginデータを取得できていない場合は、古いデータで差分を作らないよう処理を中止する
+        if zengin_artifact_error:
+            if slack_client_for_update:
+                slack_client_for_update.send_error_notification(
+                    'zenginデータアーティファクト取得エラー',
+                    zengin_artifact_error,
+                    {'ストア': ZENGIN_ARTIFACT_STORE.describe(), '対応': '差分検出を中止しました'}
+                )
+            raise RuntimeError(f"zenginデータアーティファクトを取得できません: {zengin_artifact_error}")
+        
         # 実行ロックを確認・設定（重複実行防止）
         lock_key = f"diff-processor-lock-{datetime.now(timezone.utc).strftime('%Y-%m-%d-%H')}"
         try:
@@ -785,12 +1619,43 @@ def handler(event: Dict[str, Any], context: Any, logger, metrics) -> Dict[str, A
         except Exception as e:
             logger.warning(f"重複実行チェックエラー [実行ID: {execution_id}]: {str(e)}", execution_id=execution_id)
         
+        # 入力フィンガープリントの確認（force指定時はスキップしない）
+        db_client = DatabaseClient()
+        force = bool(event.get('force')) if isinstance(event, dict) else False
+        input_fingerprint = None
+        try:
+            with performance_timer(logger, metrics, 'input_fingerprint'):
+                input_fingerprint = compute_input_fingerprint(db_client)
+            stored_fingerprint = None if force else get_stored_fingerprint()
+            unchanged = bool(stored_fingerprint) and stored_fingerprint.get('fingerprint') == input_fingerprint['fingerprint']
+            if unchanged and not is_fingerprint_settled(stored_fingerprint):
+                logger.info(f"入力に変更はないが前回の差分が却下・失敗・期限切れのため差分検出を実行 [実行ID: {execution_id}]",
+                           diff_id=stored_fingerprint.get('diff_id'), execution_id=execution_id)
+                unchanged = False
+            if unchanged:
+                logger.info(f"入力に変更なし [実行ID: {execution_id}] - 差分検出をスキップ",
+                           fingerprint=input_fingerprint['fingerprint'], execution_id=execution_id)
+                metrics.emit_business_metric('InputFingerprintUnchanged')
+                return {
+                    'statusCode': 200,
+                    'body': json.dumps({
+                        'message': '入力に変更がないためスキップ',
+                        'fingerprint': input_fingerprint['fingerprint'],
+                        'total_changes': 0
+                    }, ensure_ascii=False)
+                }
+            if force:
+                logger.info(f"force指定のためフィンガープリント確認をスキップ [実行ID: {execution_id}]", execution_id=execution_id)
+        except Exception as e:
+            logger.warning(f"フィンガープリント計算エラー [実行ID: {execution_id}]: {str(e)}", execution_id=execution_id)
+        
         # 差分検出の実行
         with performance_timer(logger, metrics, 'diff_detection'):
-            diff_detector = DiffDetector()
+            diff_detector = DiffDetector(db_client=db_client)
+            bank_scope = plan_bank_scope(diff_detector, input_fingerprint, force) if INCREMENTAL_DIFF_ENABLED else None
             update_request = diff_detector.detect_differences()
         
-        if update_request.total_changes == 0:
+        if update_request.total_changes == 0 and not update_request.dedup_plan:
             logger.info(f"変更なし [実行ID: {execution_id}]", total_changes=0, execution_id=execution_id)
             metrics.emit_business_metric('NoChangesDetected')
             
@@ -799,6 +1664,10 @@ def handler(event: Dict[str, Any], context: Any, logger, metrics) -> Dict[str, A
             slack_client.send_no_changes_notification()
             logger.info(f"変更なし通知送信完了 [実行ID: {execution_id}]", execution_id=execution_id)
             
+            if input_fingerprint:
+                store_fingerprint(input_fingerprint, execution_id)
+            store_bank_baseline(bank_scope)
+            
             return {
                 'statusCode': 200,
                 'body': json.dumps({
@@ -807,6 +1676,27 @@ def handler(event: Dict[str, Any], context: Any, logger, metrics) -> Dict[str, A
                 }, ensure_ascii=False)
             }
         
+        # 同一内容の承認待ち差分がある場合は保存・通知せず既存の承認スレッドを使う
+        content_hash = diff_content.content_hash(update_request.diffs, update_request.dedup_plan)
+        pending_diff = find_pending_diff_by_content_hash(content_hash)
+        if pending_diff:
+            logger.info(f"同一内容の承認待ち差分あり [実行ID: {execution_id}] - 保存・通知をスキップ",
+                       diff_id=pending_diff['id'], content_hash=content_hash, execution_id=execution_id)
+            metrics.emit_business_metric('IdenticalPendingDiffReused')
+            if input_fingerprint:
+                store_fingerprint(input_fingerprint, execution_id, diff_id=pending_diff['id'])
+            return {
+                'statusCode': 200,
+                'body': json.dumps({
+                    'message': '同一内容の承認待ち差分があるため再通知をスキップ',
+                    'diff_id': pending_diff['id'],
+                    'content_hash': content_hash,
+                    'total_changes': update_request.total_changes,
+                    'summary': update_request.summary,
+                    'reused': True
+                }, ensure_ascii=False)
+            }
+        
         # Slack通知を送信 via Bot Token
         with performance_timer(logger, metrics, 'slack_notification'):
             slack_client = SlackClient()
@@ -817,7 +1707,7 @@ def handler(event: Dict[str, Any], context: Any, logger, metrics) -> Dict[str, A
         
         # 差分データをDynamoDBに保存
         with performance_timer(logger, metrics, 'dynamodb_save'):
-            diff_id = store_diff_data(update_request, message_ts=message_ts)
+            diff_id = store_diff_data(update_request, message_ts=message_ts, content_hash=content_hash)
         
         # CSV ファイルを作成してSlackに送信
         csv_upload_result = None
@@ -830,6 +1720,17 @@ def handler(event: Dict[str, Any], context: Any, logger, metrics) -> Dict[str, A
                 except Exception as e:
                     logger.error(f"CSV upload error: {str(e)}")
                     csv_upload_result = {'status': 'error', 'error': str(e)}
+            
+            # 重複解消計画を承認スレッドに添付
+            if update_request.dedup_plan:
+                try:
+                    slack_client.send_dedup_plan(update_request.dedup_plan, message_ts)
+                except Exception as e:
+                    logger.error(f"Dedup plan upload error: {str(e)}")
+        
+        if input_fingerprint:
+            store_fingerprint(input_fingerprint, execution_id, diff_id=diff_id)
+        store_bank_baseline(bank_scope, diff_id=diff_id)
         
         # ビジネスメトリクスを送信
         metrics.emit_business_metric('DiffProcessingCompleted')
@@ -871,6 +1772,21 @@ def handler(event: Dict[str, Any], context: Any, logger, metrics) -> Dict[str, A
                 'error_type': error_type
             }, ensure_ascii=False)
         }
+    
+    finally:
+        # ウォームコンテナでのエンジン・接続の再利用状況
+        for endpoint, manager in (('primary', ENGINE_MANAGER), ('replica', REPLICA_ENGINE_MANAGER)):
+            connection_stats = manager.invocation_stats()
+            if connection_stats['checkouts']:
+                logger.info("データベース接続の再利用状況", endpoint=endpoint, **connection_stats)
+                metrics.emit_business_metric('DatabaseConnectionReused', 1 if connection_stats['connection_reused'] else 0,
+                                             {'PoolMode': connection_stats['pool_mode'], 'Endpoint': endpoint})
+        # 差分テーブルの消費キャパシティ
+        capacity = DIFF_REPOSITORY.consumed_capacity()
+        if capacity['requests']:
+            logger.info("差分テーブルの消費キャパシティ", **capacity)
+            metrics.emit_count_metric('DiffTableReadCapacityUnits', capacity['read_capacity_units'])
+            metrics.emit_count_metric('DiffTableWriteCapacityUnits', capacity['write_capacity_units'])
 
 if __name__ == "__main__":
     # ローカルテスト用
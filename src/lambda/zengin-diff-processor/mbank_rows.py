@@ -0,0 +1,50 @@
+"""
+MBankの行タプルとストリーム集約
+
+サーバーサイドカーソルから受け取った行を MBANK_COLUMNS 順のタプルに変換し、
+キー（swift_code-branch_code）ごとに最初の1行だけを保持する。重複キーのみ全行を別に保持するため、
+全件のdictリストとグループ化結果を二重に持たずに差分検出へ渡せる。
+"""
+import sys
+from typing import Any, Dict, Iterable, List, Tuple
+
+# MBankの行タプルのカラム順（BankDataのフィールド順と同じ）
+MBANK_COLUMNS = ('swift_code', 'bank_name', 'bank_name_kana', 'branch_code', 'branch_name', 'branch_name_kana')
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def compact_mbank_row(row: Iterable[Any]) -> tuple:
+    """MBankの行をタプルに変換（銀行単位で重複する文字列はintern）"""
+    swift_code, bank_name, bank_name_kana, branch_code, branch_name, branch_name_kana = row
+    return (_intern(swift_code), _intern(bank_name), _intern(bank_name_kana),
+            branch_code, branch_name, branch_name_kana)
+
+
+def mbank_row_key(row: tuple) -> Tuple[str, str]:
+    """行タプルの (swift_code, branch_code)（NULLは空文字として扱い、キー順の比較で例外にならないようにする）"""
+    return ('' if row[0] is None else row[0], '' if row[3] is None else row[3])
+
+
+def group_mbank_rows(rows: Iterable[tuple]) -> Tuple[Dict[str, tuple], Dict[str, List[tuple]], int]:
+    """MBankの行ストリームをキーごとにまとめる
+
+    Returns:
+        Tuple: (キー -> 最初の行, 重複キー -> 全行, 総行数)
+    """
+    current_rows: Dict[str, tuple] = {}
+    duplicate_rows: Dict[str, List[tuple]] = {}
+    row_count = 0
+    for row in rows:
+        row_count += 1
+        key = f"{row[0]}-{row[3]}"
+        first = current_rows.get(key)
+        if first is None:
+            current_rows[key] = row
+        elif key in duplicate_rows:
+            duplicate_rows[key].append(row)
+        else:
+            duplicate_rows[key] = [first, row]
+    return current_rows, duplicate_rows, row_count
@@ -0,0 +1,64 @@
+"""
+キー順にソートされた2つの入力のマージ結合
+
+zengin-code側とMBank側をいずれも (swift_code, branch_code) の昇順で受け取り、1回の走査で
+(キー, zengin側の要素, MBank側の行のリスト) を順に返す。保持するのは現在のキーの行だけなので、
+追加のメモリは重複キーの行数分のみで済む。
+MBank側の順序は ORDER BY ... COLLATE "C"（バイト順）で揃える。UTF-8のバイト順は
+Pythonの文字列比較（コードポイント順）と一致する。キー関数はNULLを空文字に置き換えた値を返し
+（mbank_rows.mbank_row_key、SQL側は COALESCE）、None同士・文字列との比較で例外にならないようにする。
+"""
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+_END = object()
+
+
+class SortOrderError(ValueError):
+    """入力がキー順にソートされていない"""
+
+
+def _sorted_runs(items: Iterable[Any], key: Callable[[Any], tuple], label: str) -> Iterator[Tuple[tuple, List[Any]]]:
+    """同じキーが連続する要素をまとめて (キー, 要素のリスト) を返す"""
+    run_key = None
+    run: List[Any] = []
+    for item in items:
+        item_key = key(item)
+        if run and item_key == run_key:
+            run.append(item)
+            continue
+        if run:
+            if item_key < run_key:
+                raise SortOrderError(f"{label}がキー順にソートされていません: {run_key} -> {item_key}")
+            yield run_key, run
+        run_key = item_key
+        run = [item]
+    if run:
+        yield run_key, run
+
+
+def merge_join(
+    latest: Iterable[Any],
+    current: Iterable[Any],
+    latest_key: Callable[[Any], tuple],
+    current_key: Callable[[Any], tuple],
+) -> Iterator[Tuple[tuple, Optional[Any], List[Any]]]:
+    """(キー, zengin側の要素 or None, MBank側の行のリスト) をキーの昇順に返す
+
+    zengin側で同じキーが連続する場合は dict と同様に最後の要素を採用する。
+    """
+    latest_runs = _sorted_runs(latest, latest_key, 'zengin-codeデータ')
+    current_runs = _sorted_runs(current, current_key, 'MBankデータ')
+    latest_run = next(latest_runs, _END)
+    current_run = next(current_runs, _END)
+
+    while latest_run is not _END or current_run is not _END:
+        if current_run is _END or (latest_run is not _END and latest_run[0] < current_run[0]):
+            yield latest_run[0], latest_run[1][-1], []
+            latest_run = next(latest_runs, _END)
+        elif latest_run is _END or current_run[0] < latest_run[0]:
+            yield current_run[0], None, current_run[1]
+            current_run = next(current_runs, _END)
+        else:
+            yield latest_run[0], latest_run[1][-1], current_run[1]
+            latest_run = next(latest_runs, _END)
+            current_run = next(current_runs, _END)
@@ -0,0 +1,218 @@
+"""
+正規化済みzenginデータセットのキャッシュ
+
+ZenginClientの正規化結果（銀行名・支店名・半角カナ）はzengin-codeのバージョンと
+正規化ルールのバージョンが同じ限り変わらないため、以下の3層でキャッシュする。
+
+1. プロセス内グローバル変数（ウォームコンテナ）
+2. /tmp ファイル（同一コンテナの再初期化後）
+3. S3オブジェクト（任意、全コンテナで共有）
+
+保存形式は「メタデータJSON 1行 + gzip圧縮した行データ」で、メタデータに含まれる
+sha256で本体を検証してから展開する。キャッシュキーが異なるエントリは古い
+バージョンとして書き込み時に削除する（S3は複数バージョンが同時に稼働する
+ロールアウト中に互いのエントリを消さないよう、新しい順に一定数を残す）。
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger()
+
+CACHE_FORMAT_VERSION = 1
+DEFAULT_TMP_DIR = '/tmp/zengin_normalized_cache'
+CACHE_FILE_SUFFIX = '.cache'
+# S3に残すエントリ数（書き込んだエントリを含む、更新日時の新しい順）
+DEFAULT_S3_KEEP_ENTRIES = 3
+
+# プロセス内キャッシュ（キャッシュキー -> 行リスト）
+_memory_cache: Dict[str, Any] = {'key': None, 'rows': None}
+
+
+def build_cache_key(zengin_version: str, data_md5: str, rules_version: int) -> str:
+    """zengin-codeのバージョンと正規化ルールのバージョンからキャッシュキーを生成"""
+    raw_key = f"{zengin_version}-{data_md5[:12]}-r{rules_version}"
+    return re.sub(r'[^0-9A-Za-z._-]', '_', raw_key)
+
+
+def _encode(cache_key: str, rows: List[Tuple]) -> bytes:
+    """行データをメタデータ付きのバイト列に変換"""
+    body = gzip.compress(
+        json.dumps(rows, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    )
+    header = {
+        'format_version': CACHE_FORMAT_VERSION,
+        'cache_key': cache_key,
+        'row_count': len(rows),
+        'sha256': hashlib.sha256(body).hexdigest(),
+    }
+    return json.dumps(header).encode('utf-8') + b'\n' + body
+
+
+def _decode(cache_key: str, data: bytes) -> List[Tuple]:
+    """メタデータを検証して行データを復元（不整合時はValueError）"""
+    header_line, separator, body = data.partition(b'\n')
+    if not separator:
+        raise ValueError('キャッシュヘッダーがありません')
+    header = json.loads(header_line.decode('utf-8'))
+    if header.get('format_version') != CACHE_FORMAT_VERSION:
+        raise ValueError(f"未対応のキャッシュ形式: {header.get('format_version')}")
+    if header.get('cache_key') != cache_key:
+        raise ValueError(f"キャッシュキー不一致: {header.get('cache_key')}")
+    if hashlib.sha256(body).hexdigest() != header.get('sha256'):
+        raise ValueError('sha256が一致しません')
+    rows = [tuple(row) for row in json.loads(gzip.decompress(body).decode('utf-8'))]
+    if len(rows) != header.get('row_count'):
+        raise ValueError('行数が一致しません')
+    return rows
+
+
+class NormalizedDatasetCache:
+    """正規化済みデータセットの3層キャッシュ"""
+
+    def __init__(self, cache_key: str, tmp_dir: str = DEFAULT_TMP_DIR,
+                 s3_client=None, s3_bucket: Optional[str] = None, s3_prefix: Optional[str] = None,
+                 s3_keep_entries: int = DEFAULT_S3_KEEP_ENTRIES):
+        self.cache_key = cache_key
+        self.tmp_dir = tmp_dir
+        self.s3_client = s3_client
+        self.s3_bucket = s3_bucket
+        self.s3_prefix = s3_prefix.rstrip('/') + '/' if s3_prefix else None
+        self.s3_keep_entries = max(1, s3_keep_entries)
+
+    @property
+    def s3_enabled(self) -> bool:
+        return bool(self.s3_client and self.s3_bucket and self.s3_prefix)
+
+    @property
+    def tmp_path(self) -> str:
+        return os.path.join(self.tmp_dir, f"{self.cache_key}{CACHE_FILE_SUFFIX}")
+
+    @property
+    def s3_key(self) -> str:
+        return f"{self.s3_prefix}{self.cache_key}{CACHE_FILE_SUFFIX}"
+
+    def get(self) -> Tuple[Optional[List[Tuple]], Optional[str]]:
+        """キャッシュから行データを取得
+
+        Returns:
+            Tuple[Optional[List[Tuple]], Optional[str]]: (行データ, ヒットした層) 未ヒット時は (None, None)
+        """
+        if _memory_cache['key'] == self.cache_key and _memory_cache['rows'] is not None:
+            return _memory_cache['rows'], 'memory'
+
+        rows = self._get_from_tmp()
+        if rows is not None:
+            self._set_memory(rows)
+            return rows, 'tmp'
+
+        if self.s3_enabled:
+            rows = self._get_from_s3()
+            if rows is not None:
+                self._set_memory(rows)
+                self._put_to_tmp(_encode(self.cache_key, rows))
+                return rows, 's3'
+
+        return None, None
+
+    def put(self, rows: List[Tuple]):
+        """全層に行データを保存し、古いバージョンのエントリを削除"""
+        rows = [tuple(row) for row in rows]
+        self._set_memory(rows)
+        data = _encode(self.cache_key, rows)
+        self._put_to_tmp(data)
+        if self.s3_enabled:
+            self._put_to_s3(data)
+
+    def _set_memory(self, rows: List[Tuple]):
+        _memory_cache['key'] = self.cache_key
+        _memory_cache['rows'] = rows
+
+    def _get_from_tmp(self) -> Optional[List[Tuple]]:
+        if not os.path.exists(self.tmp_path):
+            return None
+        try:
+            with open(self.tmp_path, 'rb') as f:
+                return _decode(self.cache_key, f.read())
+        except Exception as e:
+            logger.warning(f"/tmpキャッシュ読み込みエラー（破棄します）: {str(e)}")
+            self._remove_tmp(self.tmp_path)
+            return None
+
+    def _put_to_tmp(self, data: bytes):
+        try:
+            os.makedirs(self.tmp_dir, exist_ok=True)
+            tmp_file = f"{self.tmp_path}.{os.getpid()}.tmp"
+            with open(tmp_file, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_file, self.tmp_path)
+            self._evict_tmp()
+        except Exception as e:
+            logger.warning(f"/tmpキャッシュ書き込みエラー: {str(e)}")
+
+    def _evict_tmp(self):
+        """現在のキャッシュキー以外のファイルを削除"""
+        current = os.path.basename(self.tmp_path)
+        for name in os.listdir(self.tmp_dir):
+            if name.endswith(CACHE_FILE_SUFFIX) and name != current:
+                self._remove_tmp(os.path.join(self.tmp_dir, name))
+                logger.info(f"古い/tmpキャッシュを削除: {name}")
+
+    @staticmethod
+    def _remove_tmp(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _get_from_s3(self) -> Optional[List[Tuple]]:
+        try:
+            response = self.s3_client.get_object(Bucket=self.s3_bucket, Key=self.s3_key)
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+        except Exception as e:
+            logger.warning(f"S3キャッシュ取得エラー: {str(e)}")
+            return None
+        try:
+            return _decode(self.cache_key, response['Body'].read())
+        except Exception as e:
+            logger.warning(f"S3キャッシュ検証エラー（再生成します）: {str(e)}")
+            return None
+
+    def _put_to_s3(self, data: bytes):
+        try:
+            self.s3_client.put_object(
+                Bucket=self.s3_bucket,
+                Key=self.s3_key,
+                Body=data,
+                ContentType='application/octet-stream',
+                Metadata={'cache_key': self.cache_key}
+            )
+            self._evict_s3()
+        except Exception as e:
+            logger.warning(f"S3キャッシュ書き込みエラー: {str(e)}")
+
+    def _evict_s3(self):
+        """同じプレフィックス配下のエントリのうち、新しい順に s3_keep_entries 件を残して削除
+
+        別バージョンのコンテナが稼働中のエントリは更新日時が新しいため残る。
+        """
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        others = []
+        for page in paginator.paginate(Bucket=self.s3_bucket, Prefix=self.s3_prefix):
+            for obj in page.get('Contents', []):
+                if obj['Key'] != self.s3_key and obj['Key'].endswith(CACHE_FILE_SUFFIX):
+                    others.append(obj)
+        others.sort(key=lambda obj: obj['LastModified'], reverse=True)
+        stale_keys = [{'Key': obj['Key']} for obj in others[self.s3_keep_entries - 1:]]
+        for i in range(0, len(stale_keys), 1000):
+            self.s3_client.delete_objects(
+                Bucket=self.s3_bucket,
+                Delete={'Objects': stale_keys[i:i + 1000], 'Quiet': True}
+            )
+        if stale_keys:
+            logger.info(f"古いS3キャッシュを削除: {len(stale_keys)}件")
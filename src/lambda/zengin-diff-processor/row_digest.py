@@ -0,0 +1,30 @@
+"""
+MBank行のダイジェスト（PostgreSQL側とPython側で同一の値を計算する）
+
+比較対象の4カラムを chr(31)（Unit Separator）で連結した文字列の md5 の先頭8バイトを
+符号付き64bit整数として扱う。NULLは空文字として連結する。
+DB側はキーとダイジェストのみを返すため、転送量とLambdaのメモリを抑えられる。
+"""
+import hashlib
+from typing import Any, Iterable
+
+DIGEST_FIELDS = ('bank_name', 'bank_name_kana', 'branch_name', 'branch_name_kana')
+SEPARATOR = '\x1f'
+
+# SELECT句で使用するSQL式（m_bankのカラムを直接参照）
+DIGEST_SQL = (
+    "('x' || substr(md5(concat_ws(chr(31), "
+    + ", ".join(f"COALESCE({field}, '')" for field in DIGEST_FIELDS)
+    + ")), 1, 16))::bit(64)::bigint"
+)
+
+
+def digest_values(values: Iterable[Any]) -> int:
+    """DIGEST_SQL と同じダイジェストを計算"""
+    joined = SEPARATOR.join('' if value is None else str(value) for value in values)
+    return int.from_bytes(hashlib.md5(joined.encode('utf-8')).digest()[:8], 'big', signed=True)
+
+
+def digest_bank_data(data: Any) -> int:
+    """BankData のダイジェストを計算"""
+    return digest_values(getattr(data, field) for field in DIGEST_FIELDS)
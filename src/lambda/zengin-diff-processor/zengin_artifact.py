@@ -0,0 +1,615 @@
+"""
+zengin-codeデータアーティファクトの公開・取得
+
+Lambdaの起動時に pip でzengin-codeを更新する代わりに、公開ジョブでPyPIの最新リリースから
+source-data を固めたアーティファクトを作成してS3に公開し、差分処理はポインタを読んで
+アーティファクトをダウンロードするだけにする。公開ジョブは差分処理Lambdaの
+``zengin_artifact_publish`` トリガー（EventBridge Schedulerで定期実行）と、このモジュールのCLIで実行する。
+
+ストア上のレイアウト::
+
+    {prefix}/versions/{version}/zengin-data.tar.gz   data/ と zengin.snapshot を含む
+    {prefix}/versions/{version}/manifest.json        data/ 配下の各ファイルのsha256とサイズ
+    {prefix}/files/{sha256[:2]}/{sha256}             ファイル単位のオブジェクト（内容アドレス）
+    {prefix}/latest.json                             最新バージョンへのポインタ
+
+Lambda側は初回のみ tar.gz を展開し、以降のバージョン更新ではマニフェストを比較して
+変更のあったファイル（主に branches/<bank>.json）だけを取得する。
+
+公開（CI/運用端末から実行）::
+
+    python3 src/lambda/zengin-diff-processor/zengin_artifact.py publish --bucket dev-zengin-diff-data
+    python3 src/lambda/zengin-diff-processor/zengin_artifact.py publish --from-pypi --local-store /tmp/store
+"""
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger()
+
+ARTIFACT_FILENAME = 'zengin-data.tar.gz'
+MANIFEST_FILENAME = 'manifest.json'
+POINTER_KEY = 'latest.json'
+COMPLETE_MARKER = '.complete'
+MANIFEST_FORMAT_VERSION = 1
+DEFAULT_LOCAL_ROOT = '/tmp/zengin_artifact'
+
+DATA_FILES = ('banks.json', 'md5', 'updated_at')
+
+PYPI_JSON_URL = 'https://pypi.org/pypi/zengin-code'
+PYPI_TIMEOUT_SECONDS = 30
+
+
+class ArtifactNotFoundError(Exception):
+    """ストアに対象のオブジェクトが存在しない"""
+
+
+class S3ArtifactStore:
+    """S3上のアーティファクトストア"""
+
+    def __init__(self, s3_client, bucket: str, prefix: str):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def get_bytes(self, key: str) -> bytes:
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=self._key(key))
+        except self.s3_client.exceptions.NoSuchKey:
+            raise ArtifactNotFoundError(key)
+        return response['Body'].read()
+
+    def put_bytes(self, key: str, data: bytes, content_type: str = 'application/octet-stream'):
+        self.s3_client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data, ContentType=content_type)
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.s3_client.head_object(Bucket=self.bucket, Key=self._key(key))
+            return True
+        except self.s3_client.exceptions.ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def describe(self) -> str:
+        return f"s3://{self.bucket}/{self.prefix}"
+
+
+class LocalArtifactStore:
+    """ローカルディレクトリをS3の代わりに使うストア（検証用）"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split('/'))
+
+    def get_bytes(self, key: str) -> bytes:
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            raise ArtifactNotFoundError(key)
+
+    def put_bytes(self, key: str, data: bytes, content_type: str = 'application/octet-stream'):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def describe(self) -> str:
+        return self.root
+
+
+def _read_text(path: str) -> str:
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read().strip()
+
+
+def artifact_version(data_dir: str) -> str:
+    """データディレクトリのupdated_atとmd5からバージョン文字列を生成"""
+    return f"{_read_text(os.path.join(data_dir, 'updated_at'))}-{_read_text(os.path.join(data_dir, 'md5'))[:12]}"
+
+
+def artifact_key(version: str) -> str:
+    return f"versions/{version}/{ARTIFACT_FILENAME}"
+
+
+def manifest_key(version: str) -> str:
+    return f"versions/{version}/{MANIFEST_FILENAME}"
+
+
+def file_key(sha256: str) -> str:
+    return f"files/{sha256[:2]}/{sha256}"
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_manifest(data_dir: str, version: str) -> Dict[str, Any]:
+    """data/ 配下の全ファイルのsha256とサイズを列挙したマニフェストを作成"""
+    files = {}
+    for root, dirs, names in os.walk(data_dir):
+        dirs.sort()
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            rel_path = 'data/' + os.path.relpath(path, data_dir).replace(os.sep, '/')
+            files[rel_path] = {'sha256': _sha256_file(path), 'size': os.path.getsize(path)}
+    return {
+        'format_version': MANIFEST_FORMAT_VERSION,
+        'version': version,
+        'files': files,
+    }
+
+
+def build_artifact(data_dir: str) -> bytes:
+    """data/ とパック済みスナップショットを tar.gz に固める"""
+    from zengin_code import snapshot as zengin_snapshot
+
+    for name in DATA_FILES + ('branches',):
+        if not os.path.exists(os.path.join(data_dir, name)):
+            raise FileNotFoundError(f"source-dataに {name} がありません: {data_dir}")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        snapshot_path = zengin_snapshot.build(data_dir, os.path.join(work_dir, zengin_snapshot.SNAPSHOT_FILENAME))
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode='w:gz') as tar:
+            tar.add(data_dir, arcname='data')
+            tar.add(snapshot_path, arcname=zengin_snapshot.SNAPSHOT_FILENAME)
+        return buffer.getvalue()
+
+
+def publish(store, data_dir: str, source_version: Optional[str] = None) -> Dict[str, Any]:
+    """アーティファクトを公開し、latest.json を更新（source_version は取得元のzengin-codeリリース）"""
+    version = artifact_version(data_dir)
+    key = artifact_key(version)
+
+    if store.exists(key):
+        # 同一バージョンは再アップロードしない
+        artifact = store.get_bytes(key)
+        logger.info(f"既存アーティファクトを再利用: {key}")
+    else:
+        artifact = build_artifact(data_dir)
+        store.put_bytes(key, artifact, content_type='application/gzip')
+        logger.info(f"アーティファクトをアップロード: {key} ({len(artifact)} bytes)")
+
+    # ファイル単位のオブジェクトとマニフェスト（差分同期用）
+    try:
+        previous_files = _read_manifest(store, read_pointer(store))['files']
+    except Exception:
+        previous_files = {}
+    known_hashes = set(entry['sha256'] for entry in previous_files.values())
+    manifest = build_manifest(data_dir, version)
+    uploaded = 0
+    for rel_path, entry in manifest['files'].items():
+        if entry['sha256'] in known_hashes:
+            continue
+        if not store.exists(file_key(entry['sha256'])):
+            with open(os.path.join(data_dir, rel_path[len('data/'):]), 'rb') as f:
+                store.put_bytes(file_key(entry['sha256']), f.read())
+            uploaded += 1
+        known_hashes.add(entry['sha256'])
+    manifest_bytes = json.dumps(manifest, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    store.put_bytes(manifest_key(version), manifest_bytes, content_type='application/json')
+    logger.info(f"マニフェストを公開: {manifest_key(version)} (ファイル数: {len(manifest['files'])}, アップロード: {uploaded})")
+
+    pointer = {
+        'version': version,
+        'key': key,
+        'sha256': hashlib.sha256(artifact).hexdigest(),
+        'size': len(artifact),
+        'manifest_key': manifest_key(version),
+        'manifest_sha256': hashlib.sha256(manifest_bytes).hexdigest(),
+        'md5': _read_text(os.path.join(data_dir, 'md5')),
+        'updated_at': _read_text(os.path.join(data_dir, 'updated_at')),
+        'published_at': datetime.now(timezone.utc).isoformat(),
+    }
+    if source_version:
+        pointer['source_version'] = source_version
+    # ポインタは最後に書き込む（読み手からは公開が原子的に見える）
+    store.put_bytes(POINTER_KEY, json.dumps(pointer, ensure_ascii=False).encode('utf-8'), content_type='application/json')
+    return pointer
+
+
+def latest_pypi_release(version: Optional[str] = None) -> Dict[str, Any]:
+    """PyPIのJSON APIからzengin-codeのリリース（バージョン・配布ファイルのURL・sha256）を取得"""
+    import urllib.request
+
+    url = f"{PYPI_JSON_URL}/{version}/json" if version else f"{PYPI_JSON_URL}/json"
+    with urllib.request.urlopen(url, timeout=PYPI_TIMEOUT_SECONDS) as response:
+        release = json.loads(response.read().decode('utf-8'))
+
+    # wheelを優先し、なければsdistを使用
+    files = sorted(release.get('urls', []), key=lambda entry: entry.get('packagetype') != 'bdist_wheel')
+    if not files:
+        raise RuntimeError(f"zengin-code {release['info']['version']} の配布ファイルがありません")
+    return {
+        'version': release['info']['version'],
+        'filename': files[0]['filename'],
+        'url': files[0]['url'],
+        'sha256': files[0]['digests']['sha256'],
+    }
+
+
+def fetch_from_pypi(work_dir: str, release: Dict[str, Any]) -> str:
+    """PyPIからzengin-codeの配布ファイルを取得し、含まれるsource-data/dataのパスを返す（公開ジョブ専用）"""
+    import urllib.request
+    import zipfile
+
+    with urllib.request.urlopen(release['url'], timeout=PYPI_TIMEOUT_SECONDS) as response:
+        data = response.read()
+    digest = hashlib.sha256(data).hexdigest()
+    if digest != release['sha256']:
+        raise ValueError(f"配布ファイルのsha256が一致しません: {release['filename']}")
+
+    extract_dir = os.path.join(work_dir, 'extract')
+    if release['filename'].endswith('.whl') or release['filename'].endswith('.zip'):
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            archive.extractall(extract_dir)
+    else:
+        _safe_extract(data, extract_dir)
+
+    for root, dirs, files in os.walk(extract_dir):
+        if root.endswith(os.path.join('source-data', 'data')) and 'banks.json' in files:
+            return root
+    raise RuntimeError(f"source-data/data が見つかりません: {release['filename']}")
+
+
+def publish_latest(store, slack_client=None, force: bool = False) -> Dict[str, Any]:
+    """PyPIの最新zengin-codeを公開（公開済みのリリースと同じ場合は何もしない）
+
+    新しいバージョンを公開した場合と、公開に失敗した場合はSlackに通知する。
+    失敗時は例外を送出する（latest.json は更新されない）。
+    """
+    try:
+        try:
+            previous = read_pointer(store)
+        except ArtifactNotFoundError:
+            previous = None
+        release = latest_pypi_release()
+        if previous and previous.get('source_version') == release['version'] and not force:
+            logger.info(f"zengin-code {release['version']} は公開済みです")
+            return {'published': False, 'version': previous['version'], 'source_version': release['version']}
+
+        with tempfile.TemporaryDirectory() as work_dir:
+            pointer = publish(store, fetch_from_pypi(work_dir, release), source_version=release['version'])
+    except Exception as e:
+        logger.error(f"zenginデータアーティファクトの公開に失敗: {str(e)}")
+        _notify_publish_failure(slack_client, str(e))
+        raise
+
+    previous_version = previous['version'] if previous else None
+    if previous_version != pointer['version']:
+        logger.info(f"zenginデータアーティファクトを公開: {previous_version} → {pointer['version']}")
+        _notify_version_update(
+            slack_client,
+            f"{previous.get('source_version', '-')} ({previous_version})" if previous else None,
+            f"{release['version']} ({pointer['version']})"
+        )
+    return {'published': True, 'version': pointer['version'], 'previous_version': previous_version,
+            'source_version': release['version']}
+
+
+def _notify_version_update(slack_client, old_version: Optional[str], new_version: str):
+    """公開したバージョンをSlackに通知"""
+    if slack_client is None or slack_client.client is None:
+        return
+    try:
+        update_type = "新規公開" if old_version is None else "更新"
+        blocks = [
+            {
+                "type": "header",
+                "text": {"type": "plain_text", "text": f"📦 zengin-codeデータ{update_type}", "emoji": True}
+            },
+            {
+                "type": "section",
+                "fields": [
+                    {"type": "mrkdwn", "text": f"*旧バージョン:*\n{old_version or 'なし'}"},
+                    {"type": "mrkdwn", "text": f"*新バージョン:*\n{new_version}"}
+                ]
+            },
+            {
+                "type": "context",
+                "elements": [
+                    {"type": "mrkdwn", "text": f"公開日時: {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')} UTC"}
+                ]
+            }
+        ]
+        slack_client.client.chat_postMessage(
+            channel=slack_client.channel_id,
+            text=f"zengin-codeデータを{new_version}に{update_type}しました",
+            blocks=blocks
+        )
+    except Exception as e:
+        logger.error(f"バージョン更新通知の送信に失敗: {str(e)}")
+
+
+def _notify_publish_failure(slack_client, error_message: str):
+    """公開失敗をSlackに通知"""
+    if slack_client is None or slack_client.client is None:
+        return
+    try:
+        blocks = [
+            {
+                "type": "header",
+                "text": {"type": "plain_text", "text": "🚨 エラー: zengin-codeデータ公開失敗", "emoji": True}
+            },
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": f"zengin-codeデータアーティファクトの公開中にエラーが発生しました:\n```{error_message[:500]}```"
+                }
+            },
+            {
+                "type": "section",
+                "text": {"type": "mrkdwn", "text": "差分処理は公開済みの前回バージョンで継続されます。"}
+            }
+        ]
+        slack_client.client.chat_postMessage(
+            channel=slack_client.channel_id,
+            text="🚨 エラー: zengin-codeデータの公開に失敗しました",
+            blocks=blocks
+        )
+    except Exception as e:
+        logger.error(f"エラー通知の送信に失敗: {str(e)}")
+
+
+def read_pointer(store) -> Dict[str, Any]:
+    return json.loads(store.get_bytes(POINTER_KEY).decode('utf-8'))
+
+
+def _safe_extract(data: bytes, target_dir: str):
+    with tarfile.open(fileobj=io.BytesIO(data), mode='r:gz') as tar:
+        base = os.path.realpath(target_dir)
+        for member in tar.getmembers():
+            member_path = os.path.realpath(os.path.join(target_dir, member.name))
+            if member_path != base and not member_path.startswith(base + os.sep):
+                raise ValueError(f"不正なパスを含むアーティファクト: {member.name}")
+            if not (member.isfile() or member.isdir()):
+                raise ValueError(f"未対応のエントリを含むアーティファクト: {member.name}")
+        tar.extractall(target_dir)
+
+
+def _read_manifest(store, pointer: Dict[str, Any]) -> Dict[str, Any]:
+    """ポインタが指すマニフェストを取得して検証"""
+    data = store.get_bytes(pointer['manifest_key'])
+    digest = hashlib.sha256(data).hexdigest()
+    if digest != pointer['manifest_sha256']:
+        raise ValueError(f"マニフェストのsha256が一致しません: {digest} != {pointer['manifest_sha256']}")
+    manifest = json.loads(data.decode('utf-8'))
+    if manifest.get('format_version') != MANIFEST_FORMAT_VERSION:
+        raise ValueError(f"未対応のマニフェスト形式: {manifest.get('format_version')}")
+    return manifest
+
+
+def _read_local_manifest(local_root: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(local_root, MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    version_dir = os.path.join(local_root, manifest.get('version', ''))
+    if not os.path.exists(os.path.join(version_dir, COMPLETE_MARKER)):
+        return None
+    return manifest
+
+
+def _swap_local_manifest(local_root: str, manifest: Dict[str, Any]):
+    """ローカルの現在マニフェストを原子的に置き換える"""
+    path = os.path.join(local_root, MANIFEST_FILENAME)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _build_local_snapshot(version_dir: str):
+    """展開したdata/からスナップショットを再生成（zengin_codeパッケージはインポートしない）"""
+    import importlib.util
+
+    snapshot_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'zengin_code', 'snapshot.py')
+    spec = importlib.util.spec_from_file_location('_zengin_snapshot_builder', snapshot_path)
+    builder = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(builder)
+    builder.build(os.path.join(version_dir, 'data'), os.path.join(version_dir, builder.SNAPSHOT_FILENAME))
+
+
+def _bank_code_of(rel_path: str) -> Optional[str]:
+    if rel_path.startswith('data/branches/') and rel_path.endswith('.json'):
+        return rel_path[len('data/branches/'):-len('.json')]
+    return None
+
+
+def _changed_banks_in_banks_json(old_path: str, new_path: str) -> List[str]:
+    """banks.json の新旧を比較して変更のあった銀行コードを返す"""
+    with open(old_path, 'r', encoding='utf-8') as f:
+        old_banks = json.load(f)
+    with open(new_path, 'r', encoding='utf-8') as f:
+        new_banks = json.load(f)
+    return [code for code in set(old_banks) | set(new_banks) if old_banks.get(code) != new_banks.get(code)]
+
+
+def _download_full(store, pointer: Dict[str, Any], staging_dir: str):
+    artifact = store.get_bytes(pointer['key'])
+    digest = hashlib.sha256(artifact).hexdigest()
+    if digest != pointer['sha256']:
+        raise ValueError(f"アーティファクトのsha256が一致しません: {digest} != {pointer['sha256']}")
+    _safe_extract(artifact, staging_dir)
+
+
+def _download_delta(store, manifest: Dict[str, Any], local_manifest: Dict[str, Any],
+                    current_dir: str, staging_dir: str) -> Dict[str, List[str]]:
+    """変更のあったファイルのみ取得し、未変更ファイルは現行ディレクトリからハードリンク"""
+    changed_files = []
+    for rel_path, entry in manifest['files'].items():
+        target = os.path.join(staging_dir, *rel_path.split('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        local_entry = local_manifest['files'].get(rel_path)
+        source = os.path.join(current_dir, *rel_path.split('/'))
+        if local_entry and local_entry['sha256'] == entry['sha256'] and os.path.exists(source):
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copy2(source, target)
+            continue
+
+        data = store.get_bytes(file_key(entry['sha256']))
+        digest = hashlib.sha256(data).hexdigest()
+        if digest != entry['sha256']:
+            raise ValueError(f"ファイルのsha256が一致しません: {rel_path}")
+        with open(target, 'wb') as f:
+            f.write(data)
+        changed_files.append(rel_path)
+
+    removed_files = sorted(set(local_manifest['files']) - set(manifest['files']))
+    return {'changed_files': changed_files, 'removed_files': removed_files}
+
+
+def _sync_delta(store, manifest: Dict[str, Any], local_manifest: Dict[str, Any],
+                local_root: str, staging_dir: str) -> Dict[str, Any]:
+    """差分同期してスナップショットを再生成し、変更内容を返す"""
+    current_dir = os.path.join(local_root, local_manifest['version'])
+    changes = _download_delta(store, manifest, local_manifest, current_dir, staging_dir)
+    changes['mode'] = 'delta'
+    changed_bank_codes = set()
+    for rel_path in changes['changed_files'] + changes['removed_files']:
+        bank_code = _bank_code_of(rel_path)
+        if bank_code:
+            changed_bank_codes.add(bank_code)
+        elif rel_path == 'data/banks.json':
+            changed_bank_codes.update(_changed_banks_in_banks_json(
+                os.path.join(current_dir, 'data', 'banks.json'),
+                os.path.join(staging_dir, 'data', 'banks.json')
+            ))
+    changes['changed_bank_codes'] = sorted(changed_bank_codes)
+    _build_local_snapshot(staging_dir)
+    return changes
+
+
+def ensure_local_artifact(store, local_root: str = DEFAULT_LOCAL_ROOT, delta: bool = True,
+                          pointer: Optional[Dict[str, Any]] = None) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
+    """最新アーティファクトを /tmp に用意し、データディレクトリ・ポインタ・変更内容を返す
+
+    同じバージョンが展開済みであれば何も取得しない。別バージョンが展開済みで
+    マニフェストがある場合は、変更のあったファイルだけを取得する（差分同期）。
+
+    変更内容は ``{'mode', 'changed_files', 'removed_files', 'changed_bank_codes'}`` で、
+    ``changed_bank_codes`` が None の場合は全銀行が対象（初回取得など）。
+    pointer を省略した場合は latest.json を読み込む。
+    """
+    pointer = pointer or read_pointer(store)
+    version_dir = os.path.join(local_root, pointer['version'])
+    data_dir = os.path.join(version_dir, 'data')
+
+    if os.path.exists(os.path.join(version_dir, COMPLETE_MARKER)):
+        return data_dir, pointer, {'mode': 'cached', 'changed_files': [], 'removed_files': [], 'changed_bank_codes': []}
+
+    os.makedirs(local_root, exist_ok=True)
+    manifest = _read_manifest(store, pointer) if pointer.get('manifest_key') else None
+    local_manifest = _read_local_manifest(local_root) if delta and manifest else None
+
+    staging_dir = tempfile.mkdtemp(prefix=f".{pointer['version']}-", dir=local_root)
+    try:
+        changes = None
+        if local_manifest:
+            try:
+                changes = _sync_delta(store, manifest, local_manifest, local_root, staging_dir)
+            except Exception as e:
+                # ファイル単位のオブジェクトが欠けている場合などは全体取得に切り替える
+                logger.warning(f"差分同期に失敗したため全体を取得します: {str(e)}")
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                staging_dir = tempfile.mkdtemp(prefix=f".{pointer['version']}-", dir=local_root)
+        if changes is None:
+            _download_full(store, pointer, staging_dir)
+            changes = {'mode': 'full', 'changed_files': [], 'removed_files': [], 'changed_bank_codes': None}
+
+        with open(os.path.join(staging_dir, COMPLETE_MARKER), 'w') as f:
+            f.write(pointer['sha256'])
+        if os.path.exists(version_dir):
+            shutil.rmtree(version_dir)
+        os.replace(staging_dir, version_dir)
+    except Exception:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    # 新しいディレクトリが揃ってからマニフェストを切り替える
+    if manifest:
+        _swap_local_manifest(local_root, manifest)
+
+    # 古いバージョンの展開ディレクトリを削除
+    for name in os.listdir(local_root):
+        path = os.path.join(local_root, name)
+        if name != pointer['version'] and not name.startswith('.') and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+    logger.info(f"zenginデータを同期 ({changes['mode']}): 変更ファイル {len(changes['changed_files'])}件, "
+                f"削除ファイル {len(changes['removed_files'])}件")
+    return data_dir, pointer, changes
+
+
+def main(argv=None):
+    here = os.path.dirname(os.path.abspath(__file__))
+    if here not in sys.path:
+        sys.path.insert(0, here)
+
+    parser = argparse.ArgumentParser(description='zengin-codeデータアーティファクトの公開')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    publish_parser = subparsers.add_parser('publish', help='アーティファクトを作成して公開')
+    source = publish_parser.add_mutually_exclusive_group()
+    source.add_argument('--data-dir', default=os.path.join(here, 'zengin_code', 'source-data', 'data'),
+                        help='公開するsource-data/dataディレクトリ（既定: 同梱データ）')
+    source.add_argument('--from-pypi', action='store_true', help='PyPIの最新zengin-codeから取得')
+    publish_parser.add_argument('--pypi-version', help='--from-pypi で取得するバージョン')
+    target = publish_parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--bucket', help='公開先S3バケット')
+    target.add_argument('--local-store', help='公開先ローカルディレクトリ（S3の代替）')
+    publish_parser.add_argument('--prefix', default=f"zengin-artifacts/{os.getenv('ENVIRONMENT', 'dev')}")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.bucket:
+        import boto3
+        store = S3ArtifactStore(boto3.client('s3'), args.bucket, args.prefix)
+    else:
+        store = LocalArtifactStore(os.path.join(args.local_store, args.prefix))
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        if args.from_pypi:
+            release = latest_pypi_release(args.pypi_version)
+            pointer = publish(store, fetch_from_pypi(work_dir, release), source_version=release['version'])
+        else:
+            pointer = publish(store, args.data_dir)
+
+    print(json.dumps(dict(pointer, store=store.describe()), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -5,17 +5,30 @@ import six
 import json
 import os
 
-from zengin_code.bank import Bank
+from zengin_code.bank import Bank, LazyBranches
 from zengin_code.branch import Branch
+from zengin_code import snapshot as _snapshot
 
 __version__ = '1.1.0'
 
+# Set to "1"/"true" to parse every branch file at import time (previous behaviour).
+EAGER_LOAD_ENV = 'ZENGIN_CODE_EAGER_LOAD'
+# Set to "0"/"false" to ignore the packed snapshot and always read the JSON tree.
+SNAPSHOT_ENV = 'ZENGIN_CODE_USE_SNAPSHOT'
+# Read source-data from this directory (banks.json, branches/, md5, updated_at)
+# instead of the bundled copy, e.g. an extracted data artifact.
+DATA_DIR_ENV = _snapshot.DATA_DIR_ENV
+
+ROW_FIELDS = ('bank_code', 'bank_name', 'bank_kana', 'branch_code', 'branch_name', 'branch_kana')
+
+
+def data_dir():
+    return _snapshot.default_paths()[0]
+
 
 def _load(*path):
     ret = None
-    here = os.path.dirname(__file__)
-    data_dir = os.path.join(here, 'source-data', 'data')
-    with open(os.path.join(data_dir, *path), 'rb') as fp:
+    with open(os.path.join(data_dir(), *path), 'rb') as fp:
         ret = fp.read()
     ret = six.text_type(ret, 'utf-8')
     return ret
@@ -26,18 +39,136 @@ def _load_json(*path):
     return json.loads(ret) if ret else None
 
 
-def load():
-    banks = _load_json('banks.json')
-    for bank_code, bank_dict in sorted(banks.items(), key=lambda x: x[0]):
+def _load_branches(bank):
+    branches = _load_json('branches', '{0}.json'.format(bank.code))
+    branches = sorted(branches.items(), key=lambda x: x[0])
+    return [(branch_code, Branch(bank, **branch_dict)) for branch_code, branch_dict in branches]
+
+
+def _snapshot_branches(bank):
+    return [(row[0], Branch(bank, *row)) for row in _active_snapshot.branch_rows(bank.code)]
+
+
+def _json_branch_records(bank_code):
+    branches = _load_json('branches', '{0}.json'.format(bank_code))
+    return [(code, branches[code]['name'], branches[code]['kana']) for code in sorted(branches)]
+
+
+def _snapshot_branch_records(bank_code):
+    return [(row[0], row[1], row[2]) for row in _active_snapshot.branch_rows(bank_code)]
+
+
+def _eager_from_env():
+    return os.getenv(EAGER_LOAD_ENV, '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _open_snapshot():
+    if os.getenv(SNAPSHOT_ENV, '').strip().lower() in ('0', 'false', 'no', 'off'):
+        return None
+    data_dir, path = _snapshot.default_paths()
+    return _snapshot.open_matching(path, data_dir)
+
+
+_active_snapshot = None
+_branch_records = _json_branch_records
+
+
+def load(eager=None):
+    """Build ``Bank.all`` from the packed snapshot, or banks.json when no valid snapshot exists.
+
+    Branch records are parsed lazily on first access to ``bank.branches``
+    unless ``eager`` is true (defaults to the ZENGIN_CODE_EAGER_LOAD env var).
+    """
+    global _active_snapshot, _branch_records
+
+    if eager is None:
+        eager = _eager_from_env()
+
+    if _active_snapshot is None:
+        _active_snapshot = _open_snapshot()
+
+    if _active_snapshot is not None:
+        bank_dicts = _active_snapshot.banks()
+        loader = _snapshot_branches
+        _branch_records = _snapshot_branch_records
+    else:
+        banks = _load_json('banks.json')
+        bank_dicts = [bank_dict for _, bank_dict in sorted(banks.items(), key=lambda x: x[0])]
+        loader = _load_branches
+        _branch_records = _json_branch_records
+
+    for bank_dict in bank_dicts:
         bank = Bank(**bank_dict)
+        bank.branches = LazyBranches(bank, loader)
+        if eager:
+            bank.branches.load()
+
+
+def preload(bank_codes):
+    """Parse the branch records of the given banks now; unknown codes are ignored.
+
+    Returns the list of bank codes that were loaded.
+    """
+    loaded = []
+    for bank_code in bank_codes:
+        bank = Bank.all.get(bank_code)
+        if bank is None:
+            continue
+        branches = bank.branches
+        if isinstance(branches, LazyBranches):
+            branches.load()
+        loaded.append(bank_code)
+    return loaded
+
+
+def iter_rows(bank_codes=None, include_empty_banks=False):
+    """Yield one flat tuple per branch, in ``ROW_FIELDS`` order.
+
+    Banks whose branches have not been loaded are read straight from the
+    snapshot/JSON without building ``Branch`` objects. With
+    ``include_empty_banks`` a bank without branches yields one row whose
+    branch fields are None.
+    """
+    banks = Bank.all
+    codes = banks.keys() if bank_codes is None else [code for code in bank_codes if code in banks]
+    for bank_code in codes:
+        bank = banks[bank_code]
+        branches = bank.branches
+        if isinstance(branches, LazyBranches) and not branches.loaded:
+            records = _branch_records(bank_code)
+        else:
+            records = [(code, branch.name, branch.kana) for code, branch in branches.items()]
+        if not records and include_empty_banks:
+            yield (bank_code, bank.name, bank.kana, None, None, None)
+            continue
+        for branch_code, branch_name, branch_kana in records:
+            yield (bank_code, bank.name, bank.kana, branch_code, branch_name, branch_kana)
+
+
+def to_columns(bank_codes=None, include_empty_banks=False):
+    """Return ``iter_rows`` as parallel lists keyed by ``ROW_FIELDS``."""
+    columns = list(zip(*iter_rows(bank_codes, include_empty_banks))) or [()] * len(ROW_FIELDS)
+    return dict((field, list(column)) for field, column in zip(ROW_FIELDS, columns))
+
+
+def reload(eager=None):
+    """Rebuild ``Bank.all`` and ``__version__`` from the current data directory.
+
+    Call after pointing ZENGIN_CODE_DATA_DIR at another data tree; ``Bank``
+    objects obtained before the reload must not be used afterwards.
+    """
+    global _active_snapshot, __version__
 
-        branches = _load_json('branches', '{0}.json'.format(bank.code))
-        branches = sorted(branches.items(), key=lambda x: x[0])
-        for branch_code, branch_dict in branches:
-            bank.branches[branch_code] = Branch(bank, **branch_dict)
+    if _active_snapshot is not None:
+        _active_snapshot.close()
+        _active_snapshot = None
+    Bank.all.clear()
+    __version__ = '{0}.{1}'.format(_BASE_VERSION, _load('updated_at').strip())
+    load(eager)
 
 
+_BASE_VERSION = __version__
 # update version
-__version__ = '{0}.{1}'.format(__version__, _load('updated_at').strip())
+__version__ = '{0}.{1}'.format(_BASE_VERSION, _load('updated_at').strip())
 # preload
 load()
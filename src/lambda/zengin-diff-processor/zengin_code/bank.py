@@ -3,7 +3,13 @@ from __future__ import division, print_function, absolute_import  # NOQA
 
 from collections import OrderedDict
 
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
 import six
+from six.moves import intern
 
 
 class BankMeta(type):
@@ -21,14 +27,72 @@ class BankMeta(type):
         return cls.banks
 
 
+class LazyBranches(MutableMapping):
+    """Branch mapping that reads its bank's branch file on first access.
+
+    ``loader(bank)`` must return ``(branch_code, Branch)`` pairs in the order
+    they should be iterated.
+    """
+
+    __slots__ = ('_bank', '_loader', '_data')
+
+    def __init__(self, bank, loader):
+        self._bank = bank
+        self._loader = loader
+        self._data = None
+
+    @property
+    def loaded(self):
+        return self._data is not None
+
+    def load(self):
+        if self._data is None:
+            self._data = dict(self._loader(self._bank))
+        return self._data
+
+    def __getitem__(self, code):
+        return self.load()[code]
+
+    def __setitem__(self, code, branch):
+        self.load()[code] = branch
+
+    def __delitem__(self, code):
+        del self.load()[code]
+
+    def __iter__(self):
+        return iter(self.load())
+
+    def __len__(self):
+        return len(self.load())
+
+    def __contains__(self, code):
+        return code in self.load()
+
+    def keys(self):
+        return self.load().keys()
+
+    def values(self):
+        return self.load().values()
+
+    def items(self):
+        return self.load().items()
+
+    def __repr__(self):
+        if self._data is None:
+            return '<LazyBranches bank={0} (not loaded)>'.format(self._bank.code)
+        return '<LazyBranches bank={0} ({1} branches)>'.format(self._bank.code, len(self._data))
+
+
 class Bank(six.with_metaclass(BankMeta)):
 
+    __slots__ = ('code', 'name', 'kana', 'hira', 'roma', 'branches')
+
     def __init__(self, code, name, kana, hira, roma):
-        self.code = code
-        self.name = name
-        self.kana = kana
-        self.hira = hira
-        self.roma = roma
+        self.code = intern(code)
+        self.name = intern(name)
+        self.kana = intern(kana)
+        self.hira = intern(hira)
+        self.roma = intern(roma)
         self.branches = OrderedDict()
         self.__class__[code] = self
 
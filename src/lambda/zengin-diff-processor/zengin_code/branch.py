@@ -1,16 +1,22 @@
 # -*- coding: utf-8 -*-
 from __future__ import division, print_function, absolute_import  # NOQA
 
+from six.moves import intern
+
 
 class Branch(object):
 
+    # Branch names repeat heavily across banks ("本店", "営業部", ...), so the
+    # strings are interned and instances carry no per-object __dict__.
+    __slots__ = ('bank', 'code', 'name', 'kana', 'hira', 'roma')
+
     def __init__(self, bank, code, name, kana, hira, roma):
         self.bank = bank
-        self.code = code
-        self.name = name
-        self.kana = kana
-        self.hira = hira
-        self.roma = roma
+        self.code = intern(code)
+        self.name = intern(name)
+        self.kana = intern(kana)
+        self.hira = intern(hira)
+        self.roma = intern(roma)
 
     def to_dict(self):
         return {
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""Packed, memory-mapped snapshot of zengin source-data.
+
+Layout (little-endian)::
+
+    header   MAGIC, format version, bank count, md5, updated_at,
+             index offset, banks record offset/length
+    banks    JSON array of [code, name, kana, hira, roma], sorted by code
+    branches one JSON array of [code, name, kana, hira, roma] per bank,
+             sorted by branch code
+    index    one (bank code, offset, length) entry per bank, sorted by code
+
+The snapshot is built from a source-data directory with
+``python zengin_code/snapshot.py`` and is only used when its md5/updated_at
+match the ``md5``/``updated_at`` files of the data directory it sits next to.
+When ``ZENGIN_CODE_DATA_DIR`` is set, both the data directory and the
+snapshot next to it are taken from there instead of the bundled copy.
+"""
+from __future__ import division, print_function, absolute_import  # NOQA
+
+import argparse
+import json
+import mmap
+import os
+import struct
+
+MAGIC = b'ZGNSNAP1'
+FORMAT_VERSION = 1
+SNAPSHOT_FILENAME = 'zengin.snapshot'
+DATA_DIR_ENV = 'ZENGIN_CODE_DATA_DIR'
+
+# magic, version, reserved, bank count, md5, updated_at, index offset, banks offset, banks length
+HEADER = struct.Struct('<8sHHI32s16sQQI')
+# bank code, branches offset, branches length
+INDEX_ENTRY = struct.Struct('<4sQI')
+
+_FIELDS = ('code', 'name', 'kana', 'hira', 'roma')
+
+
+def _dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _read_text(path):
+    with open(path, 'rb') as fp:
+        return fp.read().decode('utf-8').strip()
+
+
+def _row(record):
+    return [record[field] for field in _FIELDS]
+
+
+def build(data_dir, output):
+    """Pack ``data_dir`` (banks.json, branches/, md5, updated_at) into ``output``."""
+    md5 = _read_text(os.path.join(data_dir, 'md5'))
+    updated_at = _read_text(os.path.join(data_dir, 'updated_at'))
+
+    with open(os.path.join(data_dir, 'banks.json'), 'rb') as fp:
+        banks = json.loads(fp.read().decode('utf-8'))
+    bank_codes = sorted(banks)
+
+    banks_record = _dumps([_row(banks[code]) for code in bank_codes])
+
+    tmp_path = output + '.tmp'
+    with open(tmp_path, 'wb') as fp:
+        fp.write(b'\0' * HEADER.size)
+
+        banks_offset = fp.tell()
+        fp.write(banks_record)
+
+        index = []
+        for code in bank_codes:
+            with open(os.path.join(data_dir, 'branches', '{0}.json'.format(code)), 'rb') as branch_fp:
+                branches = json.loads(branch_fp.read().decode('utf-8'))
+            record = _dumps([_row(branches[branch_code]) for branch_code in sorted(branches)])
+            index.append((code.encode('ascii'), fp.tell(), len(record)))
+            fp.write(record)
+
+        index_offset = fp.tell()
+        for entry in index:
+            fp.write(INDEX_ENTRY.pack(*entry))
+
+        fp.seek(0)
+        fp.write(HEADER.pack(
+            MAGIC, FORMAT_VERSION, 0, len(index),
+            md5.encode('ascii'), updated_at.encode('ascii'),
+            index_offset, banks_offset, len(banks_record),
+        ))
+    os.replace(tmp_path, output)
+    return output
+
+
+class Snapshot(object):
+    """Read-only view over a snapshot file through ``mmap``."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as fp:
+            self._mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._parse_header()
+        except Exception:
+            self._mm.close()
+            raise
+
+    def _parse_header(self):
+        if len(self._mm) < HEADER.size:
+            raise ValueError('snapshot is truncated')
+        (magic, version, _, bank_count, md5, updated_at,
+         index_offset, banks_offset, banks_length) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError('unsupported snapshot format')
+        if index_offset + bank_count * INDEX_ENTRY.size > len(self._mm):
+            raise ValueError('snapshot index is truncated')
+
+        self.md5 = md5.decode('ascii').rstrip('\0')
+        self.updated_at = updated_at.decode('ascii').rstrip('\0')
+        self._banks_range = (banks_offset, banks_length)
+        self._index = {}
+        for i in range(bank_count):
+            code, offset, length = INDEX_ENTRY.unpack_from(self._mm, index_offset + i * INDEX_ENTRY.size)
+            self._index[code.decode('ascii')] = (offset, length)
+
+    def matches(self, md5, updated_at):
+        return self.md5 == md5 and self.updated_at == updated_at
+
+    def _decode(self, offset, length):
+        return json.loads(self._mm[offset:offset + length].decode('utf-8'))
+
+    def banks(self):
+        """Return bank dicts in code order."""
+        return [dict(zip(_FIELDS, row)) for row in self._decode(*self._banks_range)]
+
+    def branch_rows(self, bank_code):
+        """Return ``[code, name, kana, hira, roma]`` rows of one bank in code order."""
+        entry = self._index.get(bank_code)
+        if entry is None:
+            raise KeyError(bank_code)
+        return self._decode(*entry)
+
+    def close(self):
+        self._mm.close()
+
+
+def open_matching(path, data_dir):
+    """Open ``path`` if it exists and matches ``data_dir``'s md5/updated_at, else return None."""
+    if not os.path.exists(path):
+        return None
+    try:
+        snapshot = Snapshot(path)
+    except (OSError, ValueError):
+        return None
+    try:
+        md5 = _read_text(os.path.join(data_dir, 'md5'))
+        updated_at = _read_text(os.path.join(data_dir, 'updated_at'))
+    except (OSError, ValueError):
+        snapshot.close()
+        return None
+    if not snapshot.matches(md5, updated_at):
+        snapshot.close()
+        return None
+    return snapshot
+
+
+def default_paths():
+    data_dir = os.getenv(DATA_DIR_ENV)
+    if data_dir:
+        data_dir = os.path.abspath(data_dir)
+    else:
+        here = os.path.dirname(os.path.abspath(__file__))
+        data_dir = os.path.join(here, 'source-data', 'data')
+    return data_dir, os.path.join(os.path.dirname(data_dir), SNAPSHOT_FILENAME)
+
+
+def main(argv=None):
+    data_dir, output = default_paths()
+    parser = argparse.ArgumentParser(description='Pack zengin source-data into a memory-mapped snapshot.')
+    parser.add_argument('--data-dir', default=data_dir)
+    parser.add_argument('--output', default=output)
+    args = parser.parse_args(argv)
+
+    path = build(args.data_dir, args.output)
+    print('wrote {0} ({1} bytes)'.format(path, os.path.getsize(path)))
+
+
+if __name__ == '__main__':
+    main()
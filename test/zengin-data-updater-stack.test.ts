@@ -53,6 +53,10 @@ describe('ZenginDataUpdaterStack', () => {
             AttributeName: 'status',
             AttributeType: 'S',
           },
+          {
+            AttributeName: 'message_ts',
+            AttributeType: 'S',
+          },
         ],
         KeySchema: [
           {
@@ -67,7 +71,7 @@ describe('ZenginDataUpdaterStack', () => {
       });
     });
 
-    it('should create Global Secondary Index for status queries', () => {
+    it('should create Global Secondary Indexes for status and Slack message queries', () => {
       template.hasResourceProperties('AWS::DynamoDB::Table', {
         GlobalSecondaryIndexes: [
           {
@@ -86,6 +90,18 @@ describe('ZenginDataUpdaterStack', () => {
               ProjectionType: 'ALL',
             },
           },
+          {
+            IndexName: 'MessageTsIndex',
+            KeySchema: [
+              {
+                AttributeName: 'message_ts',
+                KeyType: 'HASH',
+              },
+            ],
+            Projection: {
+              ProjectionType: 'KEYS_ONLY',
+            },
+          },
         ],
       });
     });
@@ -100,6 +116,37 @@ describe('ZenginDataUpdaterStack', () => {
     });
   });
 
+  describe('Diff Data Bucket', () => {
+    it('should expire only diff artifacts and dedup plans', () => {
+      template.hasResourceProperties('AWS::S3::Bucket', {
+        BucketName: 'test-zengin-diff-data',
+        LifecycleConfiguration: {
+          Rules: [
+            {
+              Id: 'DeleteOldDiffs',
+              Prefix: 'diffs/',
+              ExpirationInDays: 90,
+              Status: 'Enabled',
+            },
+            {
+              Id: 'DeleteOldDedupPlans',
+              Prefix: 'dedup-plans/',
+              ExpirationInDays: 90,
+              Status: 'Enabled',
+            },
+            {
+              Id: 'DeleteNoncurrentVersions',
+              NoncurrentVersionExpiration: {
+                NoncurrentDays: 30,
+              },
+              Status: 'Enabled',
+            },
+          ],
+        },
+      });
+    });
+  });
+
   describe('Lambda Functions', () => {
     it('should create diff processor Lambda function', () => {
       template.hasResourceProperties('AWS::Lambda::Function', {
@@ -263,6 +310,36 @@ describe('ZenginDataUpdaterStack', () => {
       });
     });
 
+    it('should create impact index refresh schedule for diff processor', () => {
+      template.hasResourceProperties('AWS::Scheduler::Schedule', {
+        GroupName: 'zengin-data-updater-test',
+        ScheduleExpression: 'cron(0 */6 * * ? *)',
+        Target: {
+          Arn: expect.any(Object),
+          RoleArn: expect.any(Object),
+          Input: JSON.stringify({
+            trigger: 'impact_index_refresh',
+            source: 'eventbridge-scheduler',
+          }),
+        },
+      });
+    });
+
+    it('should create zengin artifact publish schedule for diff processor', () => {
+      template.hasResourceProperties('AWS::Scheduler::Schedule', {
+        GroupName: 'zengin-data-updater-test',
+        ScheduleExpression: 'cron(30 * * * ? *)',
+        Target: {
+          Arn: expect.any(Object),
+          RoleArn: expect.any(Object),
+          Input: JSON.stringify({
+            trigger: 'zengin_artifact_publish',
+            source: 'eventbridge-scheduler',
+          }),
+        },
+      });
+    });
+
     it('should create IAM role for scheduler execution', () => {
       template.hasResourceProperties('AWS::IAM::Role', {
         AssumeRolePolicyDocument: {
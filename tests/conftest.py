@@ -0,0 +1,52 @@
+"""
+Lambda関数のPythonテスト共通設定
+
+各Lambdaは依存パッケージと common/ を関数ディレクトリに同梱しているため、
+zengin-diff-processor のディレクトリをインポートパスに追加してテストする。
+"""
+import importlib.util
+import os
+import sys
+
+import pytest
+
+LAMBDA_DIR = os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda')
+PROCESSOR_DIR = os.path.join(LAMBDA_DIR, 'zengin-diff-processor')
+
+sys.path.insert(0, os.path.abspath(PROCESSOR_DIR))
+
+# boto3のクライアント生成に必要な設定（AWSには接続しない）
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('ENVIRONMENT', 'test')
+os.environ.setdefault('DIFF_TABLE_NAME', 'test-zengin-diffs')
+
+
+@pytest.fixture(scope='session')
+def processor_main():
+    """zengin-diff-processor の main モジュール（公開済みアーティファクトなしとして同梱データを使用）"""
+    import zengin_artifact
+
+    def no_published_artifact(store):
+        raise zengin_artifact.ArtifactNotFoundError(f"{store.prefix}/latest.json")
+
+    original = zengin_artifact.read_pointer
+    zengin_artifact.read_pointer = no_published_artifact
+    try:
+        import main
+    finally:
+        zengin_artifact.read_pointer = original
+    return main
+
+
+@pytest.fixture(scope='session')
+def load_lambda_module():
+    """他のLambda関数のモジュールをファイルから読み込む（zengin-diff-processor のモジュールと名前が衝突しないように）"""
+    def load(function_name, module_name):
+        path = os.path.join(LAMBDA_DIR, function_name, f"{module_name}.py")
+        spec = importlib.util.spec_from_file_location(f"{function_name.replace('-', '_')}_{module_name}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    return load
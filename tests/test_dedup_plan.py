@@ -0,0 +1,113 @@
+"""MBank重複行の解消計画（dedup_plan）と実行前検証（zengin-diff-executor の dedup_verification）のテスト"""
+import json
+from datetime import datetime
+
+import pytest
+
+from comparison_keys import ComparisonKeyBuilder
+from dedup_plan import build_dedup_plan
+
+
+class Bank:
+    def __init__(self, swift_code, bank_name, bank_name_kana, branch_code, branch_name, branch_name_kana):
+        self.swift_code = swift_code
+        self.bank_name = bank_name
+        self.bank_name_kana = bank_name_kana
+        self.branch_code = branch_code
+        self.branch_name = branch_name
+        self.branch_name_kana = branch_name_kana
+
+
+ZENGIN = Bank('0001', 'みずほ銀行', 'ﾐｽﾞﾎ', '001', '東京営業部', 'ﾄｳｷﾖｳ')
+
+
+def _row(row_id, branch_name, updated_at, branch_code='001'):
+    return (row_id, '0001', 'みずほ銀行', 'ﾐｽﾞﾎ', branch_code, branch_name, 'ﾄｳｷﾖｳ', updated_at)
+
+
+def _plan(rows, latest=None):
+    latest = {'0001-001': ZENGIN} if latest is None else latest
+    return build_dedup_plan(rows, latest, ComparisonKeyBuilder())
+
+
+def test_keep_row_matching_zengin_first():
+    plan = _plan([
+        _row(1, '東京支店', datetime(2024, 3, 1)),
+        _row(2, '東京営業部', datetime(2024, 1, 1)),
+        _row(3, '東京営業部', datetime(2024, 2, 1)),
+    ])
+    group = plan['groups'][0]
+    # 一致する行のうち id が最小の行
+    assert (group['keep_id'], group['delete_ids'], group['reason']) == (2, [1, 3], 'matches_zengin')
+
+
+def test_keep_row_latest_updated_when_none_matches():
+    plan = _plan([
+        _row(1, '東京支店', datetime(2024, 1, 1)),
+        _row(2, '東京本店', datetime(2024, 3, 1)),
+        _row(3, '東京出張所', None),
+    ])
+    group = plan['groups'][0]
+    assert (group['keep_id'], group['delete_ids'], group['reason']) == (2, [1, 3], 'latest_updated')
+
+
+def test_keep_row_lowest_id_when_updated_at_ties():
+    plan = _plan([
+        _row(5, '東京支店', datetime(2024, 1, 1)),
+        _row(3, '東京本店', datetime(2024, 1, 1)),
+    ], latest={})
+    group = plan['groups'][0]
+    assert (group['keep_id'], group['delete_ids'], group['reason']) == (3, [5], 'lowest_id')
+    assert plan['total_groups'] == 1 and plan['total_delete_rows'] == 1
+    assert [row['id'] for row in group['rows']] == [3, 5]
+    assert group['rows'][0]['updated_at'] == '2024-01-01T00:00:00'
+
+
+@pytest.fixture(scope='module')
+def verification(load_lambda_module):
+    return load_lambda_module('zengin-diff-executor', 'dedup_verification')
+
+
+def _current(rows, overrides=None):
+    current = {}
+    for row in rows:
+        values = {'id': row[0], 'swift_code': row[1], 'branch_code': row[4], 'updated_at': row[7], 'is_deleted': 0}
+        values.update((overrides or {}).get(row[0], {}))
+        current[row[0]] = values
+    return current
+
+
+ROWS = [
+    _row(1, '東京支店', datetime(2024, 3, 1)),
+    _row(2, '東京営業部', datetime(2024, 1, 1)),
+    _row(10, '大阪支店', datetime(2024, 1, 1), branch_code='002'),
+    _row(11, '大阪本店', datetime(2024, 2, 1), branch_code='002'),
+]
+
+
+def test_verification_accepts_unchanged_groups(verification):
+    # executorはS3に保存したJSONから計画を読み込む
+    groups = json.loads(json.dumps(_plan(ROWS)['groups']))
+    assert verification.planned_ids(groups) == [1, 2, 10, 11]
+
+    unchanged, changed = verification.split_unchanged_groups(groups, _current(ROWS))
+    assert [group['key'] for group in unchanged] == ['0001-001', '0001-002']
+    assert changed == []
+
+
+@pytest.mark.parametrize('overrides, reason', [
+    ({'updated_at': datetime(2024, 4, 1)}, 'updated_at'),
+    ({'is_deleted': 1}, '論理削除済み'),
+    ({'branch_code': '003'}, 'キー'),
+    (None, '存在しません'),
+])
+def test_verification_skips_changed_groups(verification, overrides, reason):
+    groups = json.loads(json.dumps(_plan(ROWS)['groups']))
+    current = _current(ROWS, {11: overrides or {}})
+    if overrides is None:
+        del current[11]
+
+    unchanged, changed = verification.split_unchanged_groups(groups, current)
+    assert [group['key'] for group in unchanged] == ['0001-001']
+    assert [group['key'] for group, _ in changed] == ['0001-002']
+    assert reason in changed[0][1]
@@ -0,0 +1,209 @@
+"""差分アーティファクト（common/diff_artifact）の書き込み・読み込みのテスト"""
+import gzip
+import io
+import json
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import pytest
+
+from common import diff_artifact
+
+
+class FakeS3:
+    """差分アーティファクトが使うS3 APIだけをメモリ上で実装したクライアント"""
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+        self.range_requests = []
+        self.aborted = []
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[(Bucket, Key)] = bytes(Body)
+
+    def get_object(self, Bucket, Key, Range=None):
+        body = self.objects[(Bucket, Key)]
+        if Range:
+            self.range_requests.append((Key, Range))
+            start, end = (int(value) for value in Range[len('bytes='):].split('-'))
+            body = body[start:end + 1]
+        return {'Body': io.BytesIO(body)}
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        upload_id = f"upload-{len(self.uploads) + 1}"
+        self.uploads[upload_id] = []
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.uploads[UploadId].append(Body)
+        return {'ETag': f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        assert [part['PartNumber'] for part in MultipartUpload['Parts']] == list(range(1, len(self.uploads[UploadId]) + 1))
+        self.objects[(Bucket, Key)] = b''.join(self.uploads.pop(UploadId))
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId)
+        self.aborted.append(UploadId)
+
+
+@dataclass
+class Bank:
+    swift_code: str
+    bank_name: str
+    bank_name_kana: str
+    branch_code: str
+    branch_name: str
+    branch_name_kana: str
+
+
+@dataclass
+class Diff:
+    action: str
+    key: str
+    old_data: Optional[Bank] = None
+    new_data: Optional[Bank] = None
+    total_accounts: int = 0
+    active_users: int = 0
+    changed_fields: List[str] = field(default_factory=list)
+
+
+BUCKET = 'test-zengin-diff-data'
+
+
+def _diffs(count=23):
+    diffs = []
+    for i in range(count):
+        key = f"0001-{i:03d}"
+        old = Bank('0001', 'みずほ銀行', 'ﾐｽﾞﾎ', f"{i:03d}", f"支店{i}", 'ｼﾃﾝ')
+        new = Bank('0001', 'みずほ銀行', 'ﾐｽﾞﾎ', f"{i:03d}", f"新支店{i}", 'ｼﾝｼﾃﾝ')
+        if i % 3 == 0:
+            diffs.append(Diff('create', key, new_data=new))
+        elif i % 3 == 1:
+            diffs.append(Diff('update', key, old, new, total_accounts=i, active_users=1,
+                              changed_fields=['branch_name', 'branch_name_kana']))
+        else:
+            diffs.append(Diff('delete', key, old_data=old, total_accounts=i))
+    return diffs
+
+
+def _expected_rows(diffs):
+    rows = []
+    for diff in diffs:
+        row = json.loads(json.dumps(diff.__dict__, default=lambda value: value.__dict__, ensure_ascii=False))
+        row['changed_mask'] = diff_artifact.changed_mask(row.pop('changed_fields'))
+        rows.append(row)
+    return rows
+
+
+def test_changed_mask_round_trip():
+    mask = diff_artifact.changed_mask(['branch_name', 'bank_name', 'unknown'])
+    assert diff_artifact.changed_fields(mask) == ['bank_name', 'branch_name']
+
+
+@pytest.mark.parametrize('part_size', [diff_artifact.DEFAULT_PART_SIZE, 64])
+def test_single_file_round_trip(part_size):
+    s3 = FakeS3()
+    diffs = _diffs()
+    written = diff_artifact.write_diff_artifact(s3, BUCKET, 'diffs/test/diff-1/full_diffs.ndjson.gz', diffs,
+                                                metadata={'diff_id': 'diff-1'}, part_size=part_size)
+    assert written['header']['counts'] == {'total': 23, 'create': 8, 'update': 8, 'delete': 7}
+
+    reader = diff_artifact.open_diff_artifact(s3, BUCKET, 'diffs/test/diff-1/full_diffs.ndjson.gz')
+    assert reader.total == 23
+    assert list(reader) == _expected_rows(diffs)
+
+
+def test_sharded_round_trip():
+    s3 = FakeS3()
+    diffs = _diffs()
+    prefix = 'diffs/test/diff-1/'
+    written = diff_artifact.write_sharded_diff_artifact(s3, BUCKET, prefix, diffs, shard_size=10, part_size=128)
+    keys = diff_artifact.artifact_keys(prefix)
+
+    manifest = diff_artifact.load_manifest(s3, BUCKET, keys['manifest'])
+    assert manifest == json.loads(json.dumps(written['manifest']))
+    assert [(shard['rows'], shard['min_key'], shard['max_key']) for shard in manifest['shards']] == [
+        (10, '0001-000', '0001-009'), (10, '0001-010', '0001-019'), (3, '0001-020', '0001-022'),
+    ]
+
+    expected = _expected_rows(diffs)
+    assert diff_artifact.read_shard(s3, BUCKET, manifest, 1) == expected[10:20]
+    assert list(diff_artifact.iter_sharded_rows(s3, BUCKET, manifest, max_workers=1)) == expected
+    assert list(diff_artifact.iter_sharded_rows(s3, BUCKET, manifest, max_workers=3)) == expected
+
+    # 連結したgzipメンバーは単一ファイル形式としても先頭から読める
+    reader = diff_artifact.open_diff_artifact(s3, BUCKET, keys['data'])
+    assert reader.total == 23
+    assert list(reader) == expected
+
+
+def test_find_diff_reads_only_the_matching_shard():
+    s3 = FakeS3()
+    diffs = _diffs()
+    manifest = diff_artifact.write_sharded_diff_artifact(s3, BUCKET, 'diffs/test/diff-1/', diffs, shard_size=10)['manifest']
+
+    assert diff_artifact.find_diff(s3, BUCKET, manifest, '0001-014') == _expected_rows(diffs)[14]
+    shard = manifest['shards'][1]
+    assert s3.range_requests == [(manifest['data_key'], f"bytes={shard['offset']}-{shard['offset'] + shard['length'] - 1}")]
+    assert diff_artifact.find_diff(s3, BUCKET, manifest, '9999-999') is None
+
+
+def test_read_shard_rejects_corrupted_data():
+    s3 = FakeS3()
+    manifest = diff_artifact.write_sharded_diff_artifact(s3, BUCKET, 'diffs/test/diff-1/', _diffs(), shard_size=10)['manifest']
+    key = (BUCKET, manifest['data_key'])
+    offset = manifest['shards'][0]['offset']
+    data = bytearray(s3.objects[key])
+    data[offset + 20] ^= 0xFF
+    s3.objects[key] = bytes(data)
+
+    with pytest.raises(ValueError):
+        diff_artifact.read_shard(s3, BUCKET, manifest, 0)
+
+
+def test_legacy_json_array_is_readable():
+    s3 = FakeS3()
+    legacy_rows = [
+        {'action': 'create', 'key': '0001-001', 'old_data': None, 'new_data': {'swift_code': '0001'},
+         'total_accounts': 0, 'active_users': 0},
+        {'action': 'delete', 'key': '0001-002', 'old_data': {'swift_code': '0001'}, 'new_data': None,
+         'total_accounts': 3, 'active_users': 2},
+    ]
+    s3.put_object(Bucket=BUCKET, Key='diffs/test/diff-0/full_diffs.json.gz',
+                  Body=gzip.compress(json.dumps(legacy_rows, ensure_ascii=False).encode('utf-8')))
+
+    reader = diff_artifact.open_diff_artifact(s3, BUCKET, 'diffs/test/diff-0/full_diffs.json.gz')
+    assert reader.header['schema_version'] == 0
+    assert reader.header['counts'] == {'total': 2, 'create': 1, 'update': 0, 'delete': 1}
+    assert list(reader) == legacy_rows
+
+
+def test_unknown_format_is_rejected():
+    s3 = FakeS3()
+    s3.put_object(Bucket=BUCKET, Key='diffs/test/diff-9/full_diffs.ndjson.gz',
+                  Body=gzip.compress(b'{"format": "zengin-diff-ndjson", "schema_version": 99}\n'))
+    with pytest.raises(ValueError):
+        diff_artifact.open_diff_artifact(s3, BUCKET, 'diffs/test/diff-9/full_diffs.ndjson.gz')
+
+
+def test_failed_upload_is_aborted():
+    s3 = FakeS3()
+
+    class FailingDiffs(list):
+        """ヘッダーの集計（1回目の走査）は成功し、書き込み（2回目の走査）の途中で失敗する"""
+        iterations = 0
+
+        def __iter__(self):
+            self.iterations += 1
+            for position, diff in enumerate(list.__iter__(self)):
+                if self.iterations > 1 and position == 4:
+                    raise RuntimeError('serialization failed')
+                yield diff
+
+    key = 'diffs/test/diff-2/full_diffs.ndjson.gz'
+    with pytest.raises(RuntimeError):
+        diff_artifact.write_diff_artifact(s3, BUCKET, key, FailingDiffs(_diffs(10)), part_size=16)
+    assert s3.aborted == ['upload-1'] and s3.uploads == {}
+    assert (BUCKET, key) not in s3.objects
@@ -0,0 +1,130 @@
+"""hashエンジンとmergeエンジン（merge_join）の差分検出結果が一致することのテスト"""
+from dataclasses import asdict
+from datetime import datetime
+
+import pytest
+
+import diff_content
+from mbank_rows import mbank_row_key
+from merge_join import SortOrderError, merge_join
+from row_digest import digest_values
+
+# zengin-code側（キー順）
+LATEST = [
+    ('0001', 'みずほ銀行', 'ﾐｽﾞﾎ', '001', '東京営業部', 'ﾄｳｷﾖｳ'),        # 一致
+    ('0001', 'みずほ銀行', 'ﾐｽﾞﾎ', '002', '丸の内支店', 'ﾏﾙﾉｳﾁ'),        # 更新（同じキーが連続する場合は後の要素）
+    ('0001', 'みずほ銀行', 'ﾐｽﾞﾎ', '002', '丸の内中央支店', 'ﾏﾙﾉｳﾁﾁﾕｳｵｳ'),
+    ('0001', 'みずほ銀行', 'ﾐｽﾞﾎ', '003', '本町支店', 'ﾎﾝﾏﾁ'),          # 接尾辞グループ一致（本町出張所）
+    ('0001', 'みずほ銀行', 'ﾐｽﾞﾎ', '004', '新宿支店', 'ｼﾝｼﾞﾕｸ'),        # 新規
+    ('0005', '三菱ＵＦＪ銀行', 'ﾐﾂﾋﾞｼﾕ-ｴﾌｼﾞｴｲ', '010', '青山支店', 'ｱｵﾔﾏ'),  # 重複（1行が一致）
+    ('0005', '三菱ＵＦＪ銀行', 'ﾐﾂﾋﾞｼﾕ-ｴﾌｼﾞｴｲ', '011', '渋谷支店', 'ｼﾌﾞﾔ'),  # 重複（全行が相違）
+]
+
+# MBank側（取得順。キー順ではない）
+MBANK = [
+    (9, '0009', '信託銀行', 'ｼﾝﾀｸ', '005', '大阪支店', 'ｵｵｻｶ', datetime(2024, 3, 1)),     # 削除（重複）
+    (1, '0001', 'みずほ銀行', 'ﾐｽﾞﾎ', '001', '東京営業部', 'ﾄｳｷﾖｳ', datetime(2024, 1, 1)),
+    (2, '0001', 'みずほ銀行', 'ﾐｽﾞﾎ', '002', '丸の内支店', 'ﾏﾙﾉｳﾁ', datetime(2024, 1, 1)),
+    (8, '0009', '信託銀行', 'ｼﾝﾀｸ', '001', '本店', 'ﾎﾝﾃﾝ', datetime(2024, 1, 1)),          # 削除
+    (3, '0001', 'みずほ銀行', 'ﾐｽﾞﾎ', '003', '本町出張所', 'ﾎﾝﾏﾁ', datetime(2024, 1, 1)),
+    (6, '0005', '三菱ＵＦＪ銀行', 'ﾐﾂﾋﾞｼﾕ-ｴﾌｼﾞｴｲ', '011', '渋谷駅前支店', 'ｼﾌﾞﾔｴｷﾏｴ', datetime(2024, 2, 1)),
+    (4, '0005', '三菱ＵＦＪ銀行', 'ﾐﾂﾋﾞｼﾕ-ｴﾌｼﾞｴｲ', '010', '青山支店', 'ｱｵﾔﾏ', datetime(2024, 1, 1)),
+    (7, '0002', '旧銀行', 'ｷﾕｳ', '100', '本店', 'ﾎﾝﾃﾝ', datetime(2024, 1, 1)),              # 削除
+    (10, '0009', '信託銀行', 'ｼﾝﾀｸ', '005', '大阪中央支店', 'ｵｵｻｶﾁﾕｳｵｳ', datetime(2024, 1, 1)),
+    (5, '0005', '三菱ＵＦＪ銀行', 'ﾐﾂﾋﾞｼﾕ-ｴﾌｼﾞｴｲ', '010', '青山通支店', 'ｱｵﾔﾏﾄﾞｵﾘ', datetime(2024, 2, 1)),
+    (11, '0005', '三菱ＵＦＪ銀行', 'ﾐﾂﾋﾞｼﾕ-ｴﾌｼﾞｴｲ', '011', '渋谷中央支店', 'ｼﾌﾞﾔﾁﾕｳｵｳ', datetime(2024, 1, 1)),
+    (12, None, '不明銀行', 'ﾌﾒｲ', '200', '本店', 'ﾎﾝﾃﾝ', datetime(2024, 1, 1)),                # 削除（swift_code がNULL）
+    (13, '0009', '信託銀行', 'ｼﾝﾀｸ', None, '不明支店', 'ﾌﾒｲ', datetime(2024, 1, 1)),          # 削除（branch_code がNULL）
+]
+
+
+class FakeDatabaseClient:
+    """MBankとUserBankAccountをメモリ上で返すDatabaseClient"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def _mbank_rows(self):
+        return [row[1:7] for row in self.rows]
+
+    def iter_mbank_rows(self, fetch_size=None, ordered=False, swift_code_range=None, swift_codes=None):
+        rows = self._mbank_rows()
+        if ordered:
+            # 同じキーの行は取得順を逆にして、代表行が取得順に依存しないことを確認する
+            rows = sorted(reversed(rows), key=mbank_row_key)
+        return iter(rows)
+
+    def get_mbank_digests(self, swift_codes=None):
+        return [(row[0], row[3], digest_values((row[1], row[2], row[4], row[5]))) for row in self._mbank_rows()]
+
+    def get_mbank_rows_by_keys(self, keys):
+        keys = set(keys)
+        return [row for row in self._mbank_rows() if (row[0], row[3]) in keys]
+
+    def get_mbank_duplicates(self):
+        counts = {}
+        for row in self.rows:
+            counts[(row[1], row[4])] = counts.get((row[1], row[4]), 0) + 1
+        return sorted((row for row in self.rows if counts[(row[1], row[4])] > 1), key=lambda row: (row[1], row[4], row[0]))
+
+    def get_user_bank_account_impact_stats_batch(self, bank_branch_pairs, strict=False):
+        return {f"{swift}-{branch}": {"total_accounts": 2, "active_users": 1} for swift, branch in bank_branch_pairs}
+
+
+def _detect(processor_main, engine, mode='full'):
+    detector = processor_main.DiffDetector(db_client=FakeDatabaseClient(MBANK))
+    detector.diff_engine = engine
+    detector.diff_mode = mode
+    detector.diff_workers = 1
+    detector.impact_index_enabled = False
+    detector._latest_data = [processor_main.BankData(*values) for values in LATEST]
+    return detector.detect_differences()
+
+
+def _comparable(result):
+    plan = dict(result.dedup_plan)
+    plan.pop('generated_at')
+    return [asdict(diff) for diff in result.diffs], result.summary, plan
+
+
+@pytest.mark.parametrize('mode', ['full', 'digest'])
+def test_merge_engine_matches_hash_engine(processor_main, mode):
+    hash_result = _detect(processor_main, 'hash', mode)
+    merge_result = _detect(processor_main, 'merge', mode)
+
+    assert _comparable(merge_result) == _comparable(hash_result)
+    assert (diff_content.content_hash(merge_result.diffs, merge_result.dedup_plan)
+            == diff_content.content_hash(hash_result.diffs, hash_result.dedup_plan))
+
+
+def test_engine_output(processor_main):
+    result = _detect(processor_main, 'hash')
+
+    assert [(diff.action, diff.key) for diff in result.diffs] == [
+        ('update', '0001-002'),
+        ('create', '0001-004'),
+        ('update', '0005-011'),
+        ('delete', 'None-200'),
+        ('delete', '0002-100'),
+        ('delete', '0009-None'),
+        ('delete', '0009-001'),
+        ('delete', '0009-005'),
+    ]
+    update = result.diffs[0]
+    assert update.changed_fields == ['branch_name', 'branch_name_kana']
+    assert (update.total_accounts, update.active_users) == (2, 1)
+    # 重複キーは解消計画で残す行を基準にする（0005-010 は一致する行を残すため更新不要）
+    assert result.diffs[2].old_data.branch_name == '渋谷駅前支店'
+    assert [group['keep_id'] for group in result.dedup_plan['groups']] == [4, 6, 9]
+
+
+def test_merge_join_rejects_unsorted_input():
+    with pytest.raises(SortOrderError):
+        list(merge_join([('0002',), ('0001',)], [], latest_key=lambda item: item, current_key=lambda row: row))
+
+
+def test_content_hash_ignores_order_and_impact_counts(processor_main):
+    result = _detect(processor_main, 'merge')
+    reordered = list(reversed(result.diffs))
+    reordered[0].total_accounts = 99
+    assert diff_content.content_hash(reordered, result.dedup_plan) == diff_content.content_hash(result.diffs, result.dedup_plan)
@@ -0,0 +1,149 @@
+"""差分テーブルのアクセス（common/diff_repository）のテスト"""
+import pytest
+
+from common.diff_repository import MESSAGE_TS_INDEX, STATUS_INDEX, DiffRepository
+
+ITEMS = [
+    {'id': 'diff-1', 'timestamp': '2026-01-01T00:00:00', 'status': 'pending', 'message_ts': '1700000000.000100',
+     'summary': '更新 1件', 'diffs_s3_key': 'diffs/test/diff-1/full_diffs.ndjson.gz'},
+    {'id': 'diff-2', 'timestamp': '2026-01-02T00:00:00', 'status': 'pending', 'summary': '削除 2件'},
+    {'id': 'diff-3', 'timestamp': '2026-01-03T00:00:00', 'status': 'approved', 'summary': '新規 3件'},
+]
+
+
+def _condition_values(condition):
+    """boto3の条件式から (属性名, 値) を取り出す（AND は両辺を展開）"""
+    expression = condition.get_expression()
+    if expression['operator'] == 'AND':
+        return _condition_values(expression['values'][0]) + _condition_values(expression['values'][1])
+    return [(expression['values'][0].name, expression['values'][1])]
+
+
+class FakeTable:
+    """DiffRepository が使う Table API をメモリ上で実装（呼び出しを記録）"""
+
+    def __init__(self, items):
+        self.items = [dict(item) for item in items]
+        self.calls = []
+
+    def _project(self, item, kwargs):
+        names = kwargs.get('ExpressionAttributeNames')
+        if not names:
+            return dict(item)
+        return {name: item[name] for name in names.values() if name in item}
+
+    def query(self, **kwargs):
+        self.calls.append(('query', kwargs))
+        conditions = _condition_values(kwargs['KeyConditionExpression'])
+        matched = [item for item in self.items
+                   if all(item.get(name) == value for name, value in conditions if name != 'timestamp')]
+        matched.sort(key=lambda item: item['timestamp'], reverse=not kwargs.get('ScanIndexForward', True))
+        if 'Limit' in kwargs:
+            matched = matched[:kwargs['Limit']]
+        return {'Items': [self._project(item, kwargs) for item in matched],
+                'ConsumedCapacity': {'CapacityUnits': 0.5}}
+
+    def get_item(self, Key, **kwargs):
+        self.calls.append(('get_item', dict(kwargs, Key=Key)))
+        item = next((item for item in self.items if all(item[name] == value for name, value in Key.items())), None)
+        response = {'ConsumedCapacity': {'CapacityUnits': 1.0 if kwargs.get('ConsistentRead') else 0.5}}
+        if item:
+            response['Item'] = self._project(item, kwargs)
+        return response
+
+    def put_item(self, Item, **kwargs):
+        self.calls.append(('put_item', {'Item': Item}))
+        self.items.append(dict(Item))
+        return {'ConsumedCapacity': {'CapacityUnits': 1.0}}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeNames, ExpressionAttributeValues, **kwargs):
+        self.calls.append(('update_item', {'Key': Key}))
+        item = next(item for item in self.items if all(item[name] == value for name, value in Key.items()))
+        for i, name in enumerate(ExpressionAttributeNames.values()):
+            item[name] = ExpressionAttributeValues[f":u{i}"]
+        return {'ConsumedCapacity': {'CapacityUnits': 1.0}}
+
+
+class FakeDynamoDB:
+    def __init__(self, table):
+        self.table = table
+
+    def Table(self, name):
+        return self.table
+
+
+@pytest.fixture
+def table():
+    return FakeTable(ITEMS)
+
+
+@pytest.fixture
+def repository(table):
+    return DiffRepository(FakeDynamoDB(table), 'test-zengin-diffs')
+
+
+def test_find_by_message_ts_uses_index_then_consistent_get_item(repository, table):
+    item = repository.find_by_message_ts('1700000000.000100', attributes=('status', 'summary'))
+
+    assert item == {'id': 'diff-1', 'timestamp': '2026-01-01T00:00:00', 'status': 'pending', 'summary': '更新 1件'}
+    (query_kind, query), (get_kind, get) = table.calls
+    assert query_kind == 'query' and query['IndexName'] == MESSAGE_TS_INDEX
+    # インデックスからはキーだけを取得する
+    assert sorted(query['ExpressionAttributeNames'].values()) == ['id', 'timestamp']
+    assert get_kind == 'get_item'
+    assert get['Key'] == {'id': 'diff-1', 'timestamp': '2026-01-01T00:00:00'}
+    assert get['ConsistentRead'] is True
+
+
+def test_find_by_message_ts_not_found(repository, table):
+    assert repository.find_by_message_ts('1700000000.999999') is None
+    assert [kind for kind, _ in table.calls] == ['query']
+
+
+def test_cached_attributes_are_not_read_again(repository, table):
+    repository.find_by_message_ts('1700000000.000100', attributes=('status', 'summary'))
+    table.calls.clear()
+
+    assert repository.get('diff-1', attributes=('status',))['status'] == 'pending'
+    assert table.calls == []
+    assert repository.consumed_capacity()['cache_hits'] == 1
+
+    # キャッシュにない属性はキャッシュ済みのキーで GetItem する
+    assert repository.get('diff-1', attributes=('diffs_s3_key',))['diffs_s3_key'] == 'diffs/test/diff-1/full_diffs.ndjson.gz'
+    assert [kind for kind, _ in table.calls] == ['get_item']
+
+
+def test_get_unknown_id_queries_latest_item(repository, table):
+    item = repository.get('diff-3', attributes=('status',))
+    assert item == {'id': 'diff-3', 'timestamp': '2026-01-03T00:00:00', 'status': 'approved'}
+    (kind, query), = table.calls
+    assert kind == 'query' and 'IndexName' not in query and query['ScanIndexForward'] is False
+    assert repository.get('diff-9') is None
+
+
+def test_update_uses_cached_key_and_refreshes_cache(repository, table):
+    repository.get('diff-2', attributes=('status',))
+    table.calls.clear()
+
+    assert repository.update('diff-2', {'status': 'rejected', 'rejected_by': 'U123'})
+    assert table.calls == [('update_item', {'Key': {'id': 'diff-2', 'timestamp': '2026-01-02T00:00:00'}})]
+    assert repository.get('diff-2', attributes=('status', 'rejected_by'))['status'] == 'rejected'
+    assert len(table.calls) == 1
+    assert not repository.update('diff-9', {'status': 'rejected'})
+
+
+def test_put_caches_the_whole_item(repository, table):
+    repository.put({'id': 'diff-4', 'timestamp': '2026-01-04T00:00:00', 'status': 'pending', 'summary': '更新 4件'})
+    assert repository.get('diff-4')['summary'] == '更新 4件'
+    assert [kind for kind, _ in table.calls] == ['put_item']
+
+
+def test_query_by_status_and_begin_invocation(repository, table):
+    items = list(repository.query_by_status('pending', attributes=('summary',)))
+    assert [item['id'] for item in items] == ['diff-2', 'diff-1']
+    assert table.calls[0][1]['IndexName'] == STATUS_INDEX
+
+    capacity = repository.consumed_capacity()
+    assert capacity['requests'] == 1 and capacity['read_capacity_units'] == 0.5
+    repository.begin_invocation()
+    assert repository.consumed_capacity()['requests'] == 0
@@ -0,0 +1,55 @@
+"""影響インデックス（impact_index）のテスト"""
+from datetime import datetime, timedelta, timezone
+
+from impact_index import build_snapshot, is_fresh, lookup, merge_snapshot, needs_full_rebuild
+
+BUILT_AT = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _snapshot():
+    return build_snapshot({
+        "0001-001": {"total_accounts": 3, "active_users": 2},
+        "0001-002": {"total_accounts": 1, "active_users": 1},
+        "0005-100": {"total_accounts": 0, "active_users": 0},
+    }, now=BUILT_AT)
+
+
+def test_build_snapshot_drops_zero_keys():
+    snapshot = _snapshot()
+    assert snapshot['stats'] == {"0001-001": [3, 2], "0001-002": [1, 1]}
+    assert lookup(snapshot, [("0001", "001"), ("0005", "100")]) == {
+        "0001-001": {"total_accounts": 3, "active_users": 2},
+        "0005-100": {"total_accounts": 0, "active_users": 0},
+    }
+
+
+def test_merge_snapshot_advances_watermark_but_not_full_built_at():
+    snapshot = _snapshot()
+    refreshed_at = BUILT_AT + timedelta(hours=6)
+    merged = merge_snapshot(snapshot, {
+        "0001-001": {"total_accounts": 4, "active_users": 2},
+        "0001-002": {"total_accounts": 0, "active_users": 0},
+    }, now=refreshed_at, generated_at=refreshed_at)
+
+    assert merged['stats'] == {"0001-001": [4, 2]}
+    assert merged['generated_at'] == refreshed_at.isoformat()
+    assert merged['full_built_at'] == BUILT_AT.isoformat()
+
+
+def test_watermark_refresh_does_not_postpone_full_rebuild():
+    snapshot = _snapshot()
+    for hours in (6, 12, 18, 24):
+        refreshed_at = BUILT_AT + timedelta(hours=hours)
+        assert needs_full_rebuild(snapshot, 24, now=refreshed_at) == (hours >= 24)
+        snapshot = merge_snapshot(snapshot, {}, now=refreshed_at, generated_at=refreshed_at)
+
+    # ウォーターマークは新しいため参照には使えるが、全件の再集計は必要
+    assert is_fresh(snapshot, 24, now=BUILT_AT + timedelta(hours=25))
+    assert needs_full_rebuild(snapshot, 24, now=BUILT_AT + timedelta(hours=25))
+
+
+def test_needs_full_rebuild_without_snapshot_or_full_built_at():
+    assert needs_full_rebuild(None, 24)
+    snapshot = dict(_snapshot())
+    del snapshot['full_built_at']
+    assert needs_full_rebuild(snapshot, 24, now=BUILT_AT + timedelta(hours=1))
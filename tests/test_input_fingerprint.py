@@ -0,0 +1,41 @@
+"""入力フィンガープリントによるスキップ判定（is_fingerprint_settled）のテスト"""
+from datetime import datetime, timezone
+
+import pytest
+
+NOW = int(datetime.now(timezone.utc).timestamp())
+
+
+class FakeDiffRepository:
+    def __init__(self, items):
+        self.items = items
+
+    def get(self, diff_id, attributes=None, consistent=False):
+        return self.items.get(diff_id)
+
+
+@pytest.fixture
+def settled(processor_main, monkeypatch):
+    def check(diff_item):
+        monkeypatch.setattr(processor_main, 'DIFF_REPOSITORY', FakeDiffRepository({'diff-1': diff_item} if diff_item else {}))
+        return processor_main.is_fingerprint_settled({'fingerprint': 'abc', 'diff_id': 'diff-1'})
+    return check
+
+
+def test_run_without_diff_is_settled(processor_main):
+    assert processor_main.is_fingerprint_settled({'fingerprint': 'abc'})
+
+
+@pytest.mark.parametrize('diff_item, expected', [
+    ({'status': 'pending', 'message_ts': '1700000000.000100', 'ttl': NOW + 3600}, True),
+    ({'status': 'approved'}, True),
+    ({'status': 'scheduled'}, True),
+    ({'status': 'completed'}, True),
+    ({'status': 'pending', 'message_ts': '1700000000.000100', 'ttl': NOW - 1}, False),  # 期限切れ
+    ({'status': 'pending', 'ttl': NOW + 3600}, False),  # Slackスレッドなし
+    ({'status': 'rejected'}, False),
+    ({'status': 'failed'}, False),
+    (None, False),  # TTLで削除済み
+])
+def test_fingerprint_is_settled_only_while_diff_is_live(settled, diff_item, expected):
+    assert settled(diff_item) is expected
@@ -0,0 +1,118 @@
+"""kana_normalizer のテスト
+
+str.translate による変換が、変更前の ZenginClient._convert_kana_to_hankaku（下記 legacy_convert）と
+完全に同じ出力になることを検証する。
+"""
+import random
+import unicodedata
+
+import pytest
+
+import kana_normalizer
+
+
+def legacy_convert(kana_text):
+    """変更前の実装（比較用にそのまま保持）"""
+    if not kana_text:
+        return kana_text
+
+    normalized = unicodedata.normalize('NFKC', kana_text)
+
+    kana_map = {
+        'ア': 'ｱ', 'イ': 'ｲ', 'ウ': 'ｳ', 'エ': 'ｴ', 'オ': 'ｵ',
+        'カ': 'ｶ', 'キ': 'ｷ', 'ク': 'ｸ', 'ケ': 'ｹ', 'コ': 'ｺ',
+        'サ': 'ｻ', 'シ': 'ｼ', 'ス': 'ｽ', 'セ': 'ｾ', 'ソ': 'ｿ',
+        'タ': 'ﾀ', 'チ': 'ﾁ', 'ツ': 'ﾂ', 'テ': 'ﾃ', 'ト': 'ﾄ',
+        'ナ': 'ﾅ', 'ニ': 'ﾆ', 'ヌ': 'ﾇ', 'ネ': 'ﾈ', 'ノ': 'ﾉ',
+        'ハ': 'ﾊ', 'ヒ': 'ﾋ', 'フ': 'ﾌ', 'ヘ': 'ﾍ', 'ホ': 'ﾎ',
+        'マ': 'ﾏ', 'ミ': 'ﾐ', 'ム': 'ﾑ', 'メ': 'ﾒ', 'モ': 'ﾓ',
+        'ヤ': 'ﾔ', 'ユ': 'ﾕ', 'ヨ': 'ﾖ',
+        'ラ': 'ﾗ', 'リ': 'ﾘ', 'ル': 'ﾙ', 'レ': 'ﾚ', 'ロ': 'ﾛ',
+        'ワ': 'ﾜ', 'ヲ': 'ｦ', 'ン': 'ﾝ',
+        'ァ': 'ｧ', 'ィ': 'ｨ', 'ゥ': 'ｩ', 'ェ': 'ｪ', 'ォ': 'ｫ',
+        'ッ': 'ｯ', 'ャ': 'ｬ', 'ュ': 'ｭ', 'ョ': 'ｮ',
+        'ガ': 'ｶﾞ', 'ギ': 'ｷﾞ', 'グ': 'ｸﾞ', 'ゲ': 'ｹﾞ', 'ゴ': 'ｺﾞ',
+        'ザ': 'ｻﾞ', 'ジ': 'ｼﾞ', 'ズ': 'ｽﾞ', 'ゼ': 'ｾﾞ', 'ゾ': 'ｿﾞ',
+        'ダ': 'ﾀﾞ', 'ヂ': 'ﾁﾞ', 'ヅ': 'ﾂﾞ', 'デ': 'ﾃﾞ', 'ド': 'ﾄﾞ',
+        'バ': 'ﾊﾞ', 'ビ': 'ﾋﾞ', 'ブ': 'ﾌﾞ', 'ベ': 'ﾍﾞ', 'ボ': 'ﾎﾞ',
+        'パ': 'ﾊﾟ', 'ピ': 'ﾋﾟ', 'プ': 'ﾌﾟ', 'ペ': 'ﾍﾟ', 'ポ': 'ﾎﾟ',
+        'ヴ': 'ｳﾞ',
+        '－': 'ｰ', 'ー': 'ｰ'
+    }
+
+    result = ""
+    for char in normalized:
+        result += kana_map.get(char, char)
+
+    return result
+
+
+def _assert_same(inputs):
+    expected = [legacy_convert(text) for text in inputs]
+    assert [kana_normalizer.to_hankaku(text) for text in inputs] == expected
+    assert kana_normalizer.normalize_many(inputs) == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('アイウエオ', 'ｱｲｳｴｵ'),
+    ('ミツビシユーエフジエイ', 'ﾐﾂﾋﾞｼﾕｰｴﾌｼﾞｴｲ'),
+    ('ガギグゲゴ', 'ｶﾞｷﾞｸﾞｹﾞｺﾞ'),
+    ('パピプペポ', 'ﾊﾟﾋﾟﾌﾟﾍﾟﾎﾟ'),
+    ('ヴ', 'ｳﾞ'),
+    ('ァィゥェォッャュョ', 'ｧｨｩｪｫｯｬｭｮ'),
+    ('トウキヨウ－ミナミ', 'ﾄｳｷﾖｳ-ﾐﾅﾐ'),  # 全角ハイフンはNFKCでASCIIになる
+    ('ｶﾞｷﾞ', 'ｶﾞｷﾞ'),
+    ('ABC１２３', 'ABC123'),
+    ('', ''),
+    (None, None),
+])
+def test_to_hankaku(text, expected):
+    assert kana_normalizer.to_hankaku(text) == expected
+    assert legacy_convert(text) == expected
+
+
+def test_half_width_kana_is_unchanged():
+    # NFKCで全角に戻した半角カナ・濁点付きの半角カナも元と同じ表記になる
+    _assert_same([chr(cp) for cp in range(0xFF61, 0xFFA0)] + ['ｶﾞ', 'ﾊﾟ', 'ｳﾞ', 'ｱｲｳ ｴｵ'])
+
+
+def test_full_width_katakana_block():
+    _assert_same([chr(cp) for cp in range(0x30A0, 0x3100)])
+
+
+def test_dakuten_and_handakuten_combinations():
+    bases = [chr(cp) for cp in range(0x30A1, 0x30FB)] + [chr(cp) for cp in range(0x3041, 0x3097)]
+    marks = ['゙', '゚', '゛', '゜', 'ﾞ', 'ﾟ']
+    _assert_same([base + mark for base in bases for mark in marks] + ['ヷヸヹヺ', 'ヽヾ'])
+
+
+def test_small_kana_and_long_vowel_marks():
+    _assert_same(['ァィゥェォヵヶッャュョヮ', 'ー－‐−―～', 'ｰ', 'ｷﾞｭｰ'])
+
+
+def test_ascii_and_empty_input():
+    _assert_same([None, '', ' ', 'ABC xyz 0123 ()-./', ''.join(chr(cp) for cp in range(0x20, 0x7F))])
+
+
+def test_bmp_code_points():
+    _assert_same([chr(cp) for cp in range(0x10000) if not 0xD800 <= cp <= 0xDFFF])
+
+
+def test_random_mixed_strings():
+    rng = random.Random(20250629)
+    alphabet = ([chr(cp) for cp in range(0x3041, 0x3100)] + [chr(cp) for cp in range(0xFF61, 0xFFA0)]
+                + ['゙', '゚', '－', 'ー', ' ', '(', ')', '1', 'A'])
+    _assert_same([''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 24))) for _ in range(20000)])
+
+
+def test_normalize_many_keeps_order_and_duplicates():
+    inputs = ['ガ', None, 'ガ', '', 'パ', 'ガ']
+    assert kana_normalizer.normalize_many(inputs) == ['ｶﾞ', None, 'ｶﾞ', '', 'ﾊﾟ', 'ｶﾞ']
+
+
+def test_zengin_dataset():
+    zengin_code = pytest.importorskip('zengin_code')
+    values = []
+    for _, bank_name, bank_kana, _, branch_name, branch_kana in zengin_code.iter_rows():
+        values.extend([bank_name, bank_kana, branch_name, branch_kana])
+    _assert_same(values)